@@ -0,0 +1,92 @@
+import argparse, json, os, tempfile, time, tracemalloc
+import numpy as np
+
+from construction.manage_database import add_to_graph
+from generation.handle_query import MemoryRetriever, CompactRetriever, retrieve_context, serialize_context, _combine
+from generation.rerank import PathReranker
+from utils.compact_graph import CompactGraph
+from utils.fakes import FakeLLM, FakeEmbedder
+from utils.graph import InMemoryGraph, ExpansionLimits
+from utils.prompts import CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT
+from utils.synthetic import make_graph_data
+from utils.vector_store import QUANTIZATIONS
+
+
+# ---------------- BENCHMARK ----------------
+# Formatter path (MemoryRetriever: dict records → formatter → _combine → json.dumps) vs. CompactRetriever
+# (integer ids, rendered from pre-built JSON fragments) on the same queries, after checking both yield
+# byte-identical contexts: end-to-end retrieval + prompt-context latency, and latency / peak Python
+# allocations (tracemalloc) of the part the two paths differ in, expansion through rendering.
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    modes = {
+        "default": (None, None),
+        "capped": (None, ExpansionLimits(args.max_hops, args.max_neighbors, args.supernode_fanout)),
+        "rerank": (PathReranker(max_paths=args.per_seed_limit), None),
+    }
+    for scale in args.scales:
+        graph_data = make_graph_data(base_path, scale=scale, cross_links=args.cross_links, seed=args.seed)
+        gen_model = FakeLLM(graph_data, seed=args.seed)
+        embedder = FakeEmbedder()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            graph_path = os.path.join(tmp_dir, "graph.json")
+            with open(graph_path, "w", encoding="utf-8") as graph_file:
+                json.dump(graph_data, graph_file, ensure_ascii=False)
+            graph = InMemoryGraph()
+            add_to_graph(graph, graph_path, embedder)
+        start = time.perf_counter()
+        compact = CompactGraph.from_graph(graph, args.quantization, args.rescore)
+        build_time = time.perf_counter() - start
+        retrievers = {"formatter": MemoryRetriever(graph), "compact": CompactRetriever(compact)}
+        vectors = [
+            embedder.embed(gen_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, f"image_{i}.png"))
+            for i in range(args.queries)
+        ]
+        print(f"📈 x{scale}: {len(compact)} nodes, {len(compact.dst)} rels; compact graph {compact.nbytes() / 2**20:.1f} MiB, built in {build_time*1000:.0f} ms")
+
+        for mode, (reranker, limits) in modes.items():
+            def run(retriever, vector) -> str:
+                return serialize_context(retrieve_context(retriever, vector, args.top_k, args.per_seed_limit, reranker, limits))
+            def render(retriever, seeds) -> str:
+                return serialize_context(_combine(retriever.expand_seeds(seeds, args.per_seed_limit, reranker, limits)))
+            mismatches = sum(run(retrievers["formatter"], vector) != run(retrievers["compact"], vector) for vector in vectors)
+            for name, retriever in retrievers.items():
+                seeds = [retriever.seed_search(vector, args.top_k) for vector in vectors]
+                end_to_end, expansion, allocated = [], [], []
+                for vector, query_seeds in zip(vectors, seeds):
+                    start = time.perf_counter()
+                    run(retriever, vector)
+                    end_to_end.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    render(retriever, query_seeds)
+                    expansion.append(time.perf_counter() - start)
+                tracemalloc.start()
+                for query_seeds in seeds:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    render(retriever, query_seeds)
+                    allocated.append(tracemalloc.get_traced_memory()[1] - before)
+                tracemalloc.stop()
+                print(f"   {mode:8s} {name:10s} end-to-end p50 {np.percentile(end_to_end, 50)*1000:6.3f} ms  "
+                      f"expand+render p50 {np.percentile(expansion, 50)*1000:6.3f} ms  p95 {np.percentile(expansion, 95)*1000:6.3f} ms  "
+                      f"peak alloc {np.mean(allocated)/1024:7.1f} KiB/query")
+            if mismatches:
+                print(f"   ⚠️ {mismatches}/{len(vectors)} {mode} contexts differ between the two paths")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact (integer-id) vs. formatter retrieval path: latency and allocations per query")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cross_links", type=float, default=0.2, help="Extra random Connotes edges per relation")
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--per_seed_limit", type=int, default=10)
+    parser.add_argument("--max_hops", type=int, default=4)
+    parser.add_argument("--max_neighbors", type=int, default=8)
+    parser.add_argument("--supernode_fanout", type=int, default=2)
+    parser.add_argument("--quantization", type=str, default="float", choices=QUANTIZATIONS)   # compact graph's Form vectors
+    parser.add_argument("--rescore", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,62 @@
+import argparse, json, os, tempfile
+
+from construction.extract_entities import EntityTable, extract_data, contributions_path
+from construction.manage_database import add_to_graph
+from utils.fakes import FakeLLM, FakeEmbedder
+from utils.graph import InMemoryGraph
+from utils.synthetic import make_graph_data
+from utils.tracing import tracer
+from utils.utils import load_json_file
+
+
+# ---------------- BENCHMARK ----------------
+# Ingestion work with and without the EntityTable: the per-item cost (one MERGE per entity/relation
+# mention, one embedding call per Form mention) of the accumulated extraction vs. its unique facts, on the
+# shipped extracted.json and on a FakeLLM re-extraction of fetched.json (every chunk answers with a slice
+# of the reference graph, so entities repeat across chunks as they do with a real model). Also reports
+# file sizes: the extraction file holds the merged facts only, the per-chunk contributions go to its sidecar.
+def main(args):
+    construction_dir = os.path.join(args.example_dir, "construction")
+    raw_path = os.path.join(construction_dir, "extracted.json")
+    table = EntityTable(load_json_file(raw_path))
+    _report("example extracted.json", table)
+    print(f"   file {_kb(os.path.getsize(raw_path))} → {_kb(len(_dump(table.to_data())))} deduped")
+
+    gen_model = FakeLLM(make_graph_data(os.path.join(construction_dir, "extracted.json"), scale=1, seed=args.seed), seed=args.seed)
+    tracer.enable()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dst_path = os.path.join(tmp_dir, "extracted.json")
+        table = extract_data(gen_model, os.path.join(construction_dir, "fetched.json"), dst_path, args.chunk_size)
+        _report(f"FakeLLM re-extraction of fetched.json ({len(table.chunks)} chunks)", table)
+        inline = {**table.to_data(), "entities": list(table.entities.values()), "relations": list(table.relations.values())}
+        print(f"   file {_kb(os.path.getsize(dst_path))} + {_kb(os.path.getsize(contributions_path(dst_path)))} contributions sidecar "
+              f"(contributions inline: {_kb(len(_dump(inline)))})")
+
+        n_spans = len(tracer.spans)
+        add_to_graph(InMemoryGraph(), dst_path, FakeEmbedder())
+        embed_calls = sum(span.name == "embedder.embed" for span in tracer.spans[n_spans:])
+        print(f"   add_to_graph on the deduped file: {embed_calls} embedding calls")
+
+def _report(label: str, table: EntityTable) -> None:
+    saved = table.saved()
+    per_item = table.mentions["entities"] + table.mentions["relations"] + table.mentions["forms"]
+    print(f"📈 {label}")
+    print(f"   entities  {table.mentions['entities']:6d} → {len(table.entities):6d}    relations {table.mentions['relations']:6d} → {len(table.relations):6d}")
+    print(f"   per-item ingestion calls {per_item:6d} → {per_item - sum(saved.values()):6d}  "
+          f"({saved['entities'] + saved['relations']} MERGE writes and {saved['embeddings']} embedding calls saved)")
+
+def _dump(data) -> bytes:
+    # As extract_data writes it
+    return json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8")
+
+def _kb(n_bytes: int) -> str:
+    return f"{n_bytes / 1024:.1f} KB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion calls saved by the canonical entity table")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--chunk_size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,62 @@
+import argparse, json, os, tempfile, time
+import numpy as np
+
+from construction.manage_database import add_to_graph
+from utils.fakes import FakeEmbedder
+from utils.graph import InMemoryGraph, ExpansionLimits
+from utils.synthetic import make_graph_data
+
+
+# ---------------- BENCHMARK ----------------
+# Unbounded [*1..] expansion vs. ExpansionLimits on synthetic graphs with generic hub Concepts:
+# candidate paths and expansion latency per query, plus the nodes that dominate expansion cost.
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    limits = ExpansionLimits(args.max_hops, args.max_neighbors, args.supernode_fanout)
+    for scale in args.scales:
+        graph_data = make_graph_data(base_path, scale=scale, hubs=args.hubs, hub_fanout=args.hub_fanout, seed=args.seed)
+        embedder = FakeEmbedder()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            graph_path = os.path.join(tmp_dir, "graph.json")
+            with open(graph_path, "w", encoding="utf-8") as graph_file:
+                json.dump(graph_data, graph_file, ensure_ascii=False)
+            graph = InMemoryGraph()
+            add_to_graph(graph, graph_path, embedder)
+        n_supernodes = sum(bool(node and node.get("supernode")) for node in graph.nodes)
+
+        rng = np.random.default_rng(args.seed)
+        forms = [node["id"] for node in graph.nodes if node and node["labels"][-1] == "Form"]
+        queries = [[(int(i), 1.0) for i in rng.choice(forms, args.top_k, replace=False)] for _ in range(args.queries)]
+        print(f"📈 x{scale}: {len(graph.node_index)} nodes, {len(graph.rel_index)} rels, {n_supernodes} supernodes")
+        for name, mode in [("unbounded", None), ("capped", limits)]:
+            latencies, n_paths = [], []
+            for seeds in queries:
+                start = time.perf_counter()
+                n_paths.append(len(graph.candidate_paths(seeds, mode)))
+                graph.expand(seeds, args.per_seed_limit, mode)
+                latencies.append(time.perf_counter() - start)
+            print(f"   {name:9s} p50 {np.percentile(latencies, 50)*1000:8.2f} ms  p95 {np.percentile(latencies, 95)*1000:8.2f} ms  "
+                  f"max {max(latencies)*1000:8.2f} ms  {np.mean(n_paths):8.0f} candidate paths")
+        if args.hotspots:
+            print("   🔥 expansion hotspots (share of all Form→Myth paths passing through):")
+            for spot in graph.expansion_hotspots(args.hotspots):
+                print(f"      {spot['type']:12s} {spot['name'][:32]:32s} out {spot['out_degree']:5d}  "
+                      f"{'supernode ' if spot['supernode'] else '':10s}{spot['share']:6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Degree-capped vs. unbounded path expansion")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--hubs", type=int, default=3)
+    parser.add_argument("--hub_fanout", type=float, default=0.1)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--per_seed_limit", type=int, default=10)
+    parser.add_argument("--max_hops", type=int, default=4)
+    parser.add_argument("--max_neighbors", type=int, default=8)
+    parser.add_argument("--supernode_fanout", type=int, default=2)
+    parser.add_argument("--hotspots", type=int, default=5, help="List the top N hotspot nodes (0 = skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,70 @@
+import argparse, os, random, tempfile, time
+
+from dataset.parse_emuseum import parse_emuseum_pages
+from utils.utils import load_json_file
+
+
+# ---------------- BENCHMARK ----------------
+def main(args):
+    if args.html_dir:
+        run(args.html_dir, args)
+    else:
+        # No saved pages given: synthesize eMuseum-shaped pages from fetched_emuseum.json
+        with tempfile.TemporaryDirectory() as html_dir:
+            synthesize_pages(args.fetched, html_dir, args.pages)
+            run(html_dir, args)
+
+def run(html_dir: str, args) -> None:
+    n_pages = len([name for name in os.listdir(html_dir) if name.endswith(".html")])
+    reference = None
+    for parser in _available_parsers():
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            items = parse_emuseum_pages(html_dir, workers, parser)
+            elapsed = time.perf_counter() - start
+            if reference is None:
+                reference = items
+            status = "ok" if items == reference else "MISMATCH"
+            print(f"{parser:12s} workers={workers:2d}  {n_pages} pages  {elapsed:7.2f} s  "
+                  f"{n_pages / elapsed:8.1f} pages/s  [{status}]")
+
+def synthesize_pages(fetched_path: str, html_dir: str, n_pages: int) -> None:
+    fetched = list((load_json_file(fetched_path) or {}).values())
+    rng = random.Random(0)
+    filler = "<div class='nav'>" + "<a href='#'>메뉴</a>" * 200 + "</div>"
+    for page_idx in range(1, n_pages + 1):
+        item = fetched[(page_idx - 1) % len(fetched)]
+        lines = "<br>".join(f"- {sent}" for sent in item["desc"].split(". "))
+        html = f"""<html><head><title>e뮤지엄</title></head><body>{filler}
+<input type="hidden" name="relicId" value="PS{page_idx:022d}">
+<p id="relicTitle"> {item['title']} </p>
+<ul><li><em>국적/시대</em><span>한국-{item['era']}</span></li>
+<li><em>재질</em><span>{rng.choice(['종이', '비단'])}</span></li></ul>
+<span class="float-left wc110 lh35 mt3">{lines}</span>
+{filler}</body></html>"""
+        with open(os.path.join(html_dir, f"page_{page_idx:05d}.html"), "w", encoding="utf-8") as html_file:
+            html_file.write(html)
+
+def _available_parsers() -> list[str]:
+    parsers = ["html.parser"]
+    try:
+        import lxml
+        parsers.append("lxml")
+    except ImportError:
+        pass
+    try:
+        import selectolax.lexbor
+        parsers.append("selectolax")
+    except ImportError:
+        pass
+    return parsers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="eMuseum HTML parsing benchmark")
+    parser.add_argument("--html_dir", type=str, default=None)   # e.g. ../example/dataset/html_emuseum
+    parser.add_argument("--fetched", type=str, default="../example/dataset/fetched_emuseum.json")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+    main(args)
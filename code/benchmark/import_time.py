@@ -0,0 +1,55 @@
+import argparse, json, re, subprocess, sys
+
+
+# ---------------- BENCHMARK ----------------
+MODULES = ["construction.main", "dataset.main", "generation.main", "utils.llm", "utils.registry"]
+
+IMPORT_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def main(args):
+    results = {}
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["total_ms"])
+        results[module] = best
+        status = "ok" if best["ok"] else "FAILED"
+        print(f"{module:20s} {best['total_ms']:9.1f} ms  [{status}]")
+        for name, ms in best["top"][: args.top]:
+            print(f"    {name:40s} {ms:9.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, ensure_ascii=False, indent=4)
+
+def measure(module: str) -> dict:
+    # -X importtime reports cumulative microseconds per imported package on stderr
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    total_ms, packages = 0.0, {}
+    for line in proc.stderr.splitlines():
+        if not (match := IMPORT_RE.match(line)):
+            continue
+        name, ms = match.group(4), int(match.group(2)) / 1000
+        if len(match.group(3)) <= 1:
+            total_ms += ms
+        # Heaviest third-party/root packages, wherever they were first imported from
+        if "." not in name and name != module.split(".")[0]:
+            packages[name] = max(packages.get(name, 0.0), ms)
+    return {
+        "ok": proc.returncode == 0,
+        "total_ms": total_ms,
+        "top": sorted(packages.items(), key=lambda item: item[1], reverse=True),
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entry point import-time benchmark")
+    parser.add_argument("--modules", type=str, nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,80 @@
+import argparse, json, os, sys, tempfile
+
+from construction.extract_entities import extract_data
+from utils.fakes import FakeLLM
+from utils.graph import plan_graph
+from utils.llm import BaseLLM
+from utils.synthetic import make_graph_data
+from utils.utils import load_json_file
+
+
+# ---------------- CHECK ----------------
+# Incremental re-extraction after an edit must plan the same graph as extracting the edited source from
+# scratch. Two cases: a scripted model where an entity seen in two entries loses its longest description
+# and an alias when one entry is edited, and FakeLLM over the example fetched.json with one entry edited.
+# Exits non-zero on a mismatch.
+class ScriptedLLM(BaseLLM):
+    # Answers every chunk with the extraction registered for the first marker it contains
+    def __init__(self, script: dict[str, dict]):
+        self.model = "scripted-llm"
+        self.script = script
+
+    def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
+        content = next((content for marker, content in self.script.items() if marker in user_prompt), {"entities": [], "relations": []})
+        return json.dumps(content, ensure_ascii=False)
+
+def tiger(description: str, aliases: list[str]) -> dict:
+    return {"entities": [{"type": "Form", "name": "Tiger", "aliases": aliases, "description": description}], "relations": []}
+
+SCRIPT = {
+    "Version A1": tiger("A long description that only the first version of entry A gave.", ["Striped cat"]),
+    "Version A2": tiger("Short A2.", []),
+    "Entry B": tiger("Tiger.", []),
+}
+
+def check_edit(gen_model: BaseLLM, entries: list[dict], edited: list[dict], tmp_dir: str, chunk_size: int) -> bool:
+    src_path, incremental_path, full_path = (os.path.join(tmp_dir, name) for name in ("src.json", "incremental.json", "full.json"))
+    _write(entries, src_path)
+    extract_data(gen_model, src_path, incremental_path, chunk_size, incremental=True)
+    _write(edited, src_path)
+    extract_data(gen_model, src_path, incremental_path, chunk_size, incremental=True)
+    extract_data(gen_model, src_path, full_path, chunk_size)
+    incremental, full = plan_graph(load_json_file(incremental_path)), plan_graph(load_json_file(full_path))
+    for kind, got, expected in [("nodes", incremental[0], full[0]), ("edges", incremental[1], full[1])]:
+        for key in sorted(set(got) | set(expected), key=str):
+            if got.get(key) != expected.get(key):
+                print(f"   ❗ {kind} {key}: incremental {got.get(key)} vs. full {expected.get(key)}")
+    return incremental == full
+
+def main(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        entries = [{"id": "a", "body": "Version A1 of the entry."}, {"id": "b", "body": "Entry B about the tiger."}]
+        edited = [{"id": "a", "body": "Version A2 of the entry."}, entries[1]]
+        results["scripted edit (Tiger from entries a and b, a edited)"] = check_edit(ScriptedLLM(SCRIPT), entries, edited, os.path.join(tmp_dir, "scripted") + os.sep, args.chunk_size)
+
+        construction_dir = os.path.join(args.example_dir, "construction")
+        gen_model = FakeLLM(make_graph_data(os.path.join(construction_dir, "extracted.json"), scale=1, seed=args.seed), seed=args.seed)
+        entries = load_json_file(os.path.join(construction_dir, "fetched.json"))
+        edited = [dict(entry) for entry in entries]
+        edited[0]["body"] = edited[0]["body"].replace(".", ". Edited.", 1)
+        results["FakeLLM edit of fetched.json entry 0"] = check_edit(gen_model, entries, edited, os.path.join(tmp_dir, "fake") + os.sep, args.chunk_size)
+
+    for label, same in results.items():
+        print(f"{'✅' if same else '❗'} {label}: incremental {'matches' if same else 'differs from'} full re-extraction")
+    if not all(results.values()):
+        sys.exit(1)
+
+def _write(data, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental vs. full re-extraction after an edit")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--chunk_size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,87 @@
+import argparse, os, random, tempfile, threading, time
+import numpy as np
+
+from benchmark.pipeline import _load_queries
+from generation.app import make_handler
+from generation.serving import RequestQueue, QueueFull, PROFILERS, offline_backend
+from utils.graph import ExpansionLimits
+
+
+# ---------------- BENCHMARK ----------------
+# Closed-loop load test of the demo's serving path, offline: --users simulated users each replay
+# example/generation/input.json (random order, exponential think time between requests) against one
+# RequestQueue over FakeLLM/FakeEmbedder and the in-memory example graph, once per concurrency limit.
+# Reports how end-to-end latency splits into queue wait and service time, throughput and rejections;
+# with --profile, the first admitted request of each run is captured and its file path printed.
+def main(args):
+    queries = _load_queries(os.path.join(args.example_dir, "generation", "input.json"), args.queries)
+    backend = offline_backend(args.example_dir, args.llm_latency, args.embed_latency, args.compact, args.seed)
+    limits = None if args.max_hops <= 0 else ExpansionLimits(args.max_hops, args.max_neighbors, args.supernode_fanout)
+    handler = make_handler(backend, limits)
+    print(f"📈 {args.users} users × {args.requests} requests, {len(queries)} distinct queries, "
+          f"{args.llm_latency*1000:.0f} ms per model call, think time {args.think_time*1000:.0f} ms")
+    print(f"   {'limit':>5s} {'req/s':>7s} {'rejected':>8s} {'wait p50':>9s} {'wait p95':>9s} {'svc p50':>9s} {'svc p95':>9s} {'e2e p50':>9s} {'e2e p95':>9s}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for max_concurrency in args.max_concurrency:
+            profile_dir = os.path.join(args.profile_dir or tmp_dir, f"limit_{max_concurrency}")
+            queue = RequestQueue(handler, max_concurrency, args.max_queue, profile_dir, history=args.users * args.requests)
+            rejected, profiled, lock = [0], [not args.profile], threading.Lock()
+
+            def user(u: int):
+                rng = random.Random(args.seed * 1000 + u)
+                for i in range(args.requests):
+                    time.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+                    query, image = rng.choice(queries)
+                    with lock:
+                        profile, profiled[0] = (None if profiled[0] else args.profile), True
+                    try:
+                        queue.call(query=query, image_path=image, profile=profile)
+                    except QueueFull:
+                        with lock:
+                            rejected[0] += 1
+                            profiled[0] = profiled[0] and not profile   # retry the capture on the next request
+
+            start = time.perf_counter()
+            users = [threading.Thread(target=user, args=(u,)) for u in range(args.users)]
+            for thread in users:
+                thread.start()
+            for thread in users:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            queue.shutdown()
+            _report(max_concurrency, queue, rejected[0], elapsed)
+
+def _report(max_concurrency: int, queue: RequestQueue, rejected: int, elapsed: float) -> None:
+    records = queue.records
+    wait = np.array([r["wait"] for r in records]) * 1000
+    service = np.array([r["service"] for r in records]) * 1000
+    ms = lambda values, q: f"{np.percentile(values, q):7.0f}ms" if len(values) else f"{'-':>9s}"
+    print(f"   {max_concurrency:5d} {len(records) / elapsed:7.2f} {rejected:8d} {ms(wait, 50)} {ms(wait, 95)} "
+          f"{ms(service, 50)} {ms(service, 95)} {ms(wait + service, 50)} {ms(wait + service, 95)}")
+    if errors := [r["error"] for r in records if r["error"]]:
+        print(f"         ❗ {len(errors)} failed requests, e.g. {errors[0]}")
+    for r in records:
+        if r["profile"]:
+            print(f"         🔍 request {r['id']} profiled: {r['profile']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test of the demo: queue wait vs. service time")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--users", type=int, default=16)   # simulated concurrent users
+    parser.add_argument("--requests", type=int, default=5)   # requests per user
+    parser.add_argument("--queries", type=int, default=0)   # 0 = every query in input.json
+    parser.add_argument("--think_time", type=float, default=0.2)   # mean seconds between a user's requests
+    parser.add_argument("--max_concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max_queue", type=int, default=64)
+    parser.add_argument("--llm_latency", type=float, default=0.2)
+    parser.add_argument("--embed_latency", type=float, default=0.02)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--max_hops", type=int, default=0)   # capped hop-wise expansion (opt-in); 0 = original unbounded [*1..]
+    parser.add_argument("--max_neighbors", type=int, default=8)
+    parser.add_argument("--supernode_fanout", type=int, default=2)
+    parser.add_argument("--profile", type=str, default=None, choices=PROFILERS)
+    parser.add_argument("--profile_dir", type=str, default=None)   # kept profiles; temporary if omitted
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
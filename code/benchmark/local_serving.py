@@ -0,0 +1,62 @@
+import argparse, json, time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.prompts import EXTRACT_SYSTEM_PROMPT, GENERATE_SYSTEM_PROMPT
+from utils.scheduler import BatchScheduler
+
+
+# ---------------- SIMULATED BACKEND ----------------
+# A forward pass costs a fixed overhead plus a small per-sequence increment (memory-bound decoding),
+# which is what makes batching pay off; --model swaps in a real pipeline instead.
+def simulated_batch(overhead: float, per_item: float):
+    def run_batch(requests: list[dict]) -> list[str]:
+        time.sleep(overhead + per_item * len(requests))
+        return [request["user_prompt"][::-1] for request in requests]
+    return run_batch
+
+
+# ---------------- BENCHMARK ----------------
+def main(args):
+    # Interleave the two long system prompts so prefix-aware ordering has something to group
+    requests = [(f"passage {i}", EXTRACT_SYSTEM_PROMPT if i % 2 else GENERATE_SYSTEM_PROMPT) for i in range(args.requests)]
+    results = {}
+    for max_batch_size in args.batch_sizes:
+        if args.model:
+            from utils.llm import BatchedLocalLLM
+            llm = BatchedLocalLLM(args.model, task=args.task, max_batch_size=max_batch_size, max_wait=args.max_wait)
+            scheduler = llm.scheduler
+            call = lambda request: llm.generate(request[0], request[1], max_new_tokens=args.max_new_tokens)
+        else:
+            scheduler = BatchScheduler(simulated_batch(args.overhead, args.per_item), max_batch_size, args.max_wait)
+            call = lambda request: scheduler.submit(request[0], request[1]).result()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            list(pool.map(call, requests))
+        elapsed = time.perf_counter() - start
+        scheduler.close()
+
+        results[max_batch_size] = {"wall_s": elapsed, **scheduler.metrics.report()}
+        stats = results[max_batch_size]
+        print(f"batch≤{max_batch_size:<3d} {stats['requests']:5d} req  {elapsed:7.2f}s  {stats['requests_per_s']:8.1f} req/s  "
+              f"mean batch {stats['mean_batch_size']:5.2f}  wait p50 {stats['queue_wait_p50_ms']:7.1f} ms  p95 {stats['queue_wait_p95_ms']:7.1f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the batching scheduler for local inference")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent callers")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max_wait", type=float, default=0.02)
+    parser.add_argument("--overhead", type=float, default=0.05, help="Simulated seconds per forward pass")
+    parser.add_argument("--per_item", type=float, default=0.005, help="Simulated seconds per sequence in a batch")
+    parser.add_argument("--model", type=str, default=None, help="Real model instead, e.g. sshleifer/tiny-gpt2 (CPU)")
+    parser.add_argument("--task", type=str, default="text-generation")
+    parser.add_argument("--max_new_tokens", type=int, default=16)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,157 @@
+import argparse, json, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.llm import OpenAILLM, OpenAIEmbedder
+from utils.prompts import EXTRACT_SYSTEM_PROMPT, GENERATE_SYSTEM_PROMPT
+from utils.ratelimit import budget, BudgetExceeded, estimate_tokens, IMAGE_TOKENS
+from utils.tracing import tracer
+
+
+# ---------------- MOCK SERVER ----------------
+# Minimal OpenAI-compatible endpoint with a sliding-window RPM limit: over the limit it answers 429
+# with Retry-After, otherwise it returns a canned response and the usual x-ratelimit-* headers.
+class MockOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, rpm: int = 60, latency: float = 0.05):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.rpm = rpm
+        self.latency = latency
+        self.window = deque()
+        self.lock = threading.Lock()
+        self.stats = {"ok": 0, "429": 0}
+        self.prefixes = set()  # system prompts seen so far, to mimic automatic prompt caching
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self) -> tuple[bool, int, float]:
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0] > 60:
+                self.window.popleft()
+            if len(self.window) >= self.rpm:
+                self.stats["429"] += 1
+                return False, 0, 60 - (now - self.window[0])
+            self.window.append(now)
+            self.stats["ok"] += 1
+            return True, self.rpm - len(self.window), 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        ok, remaining, retry_after = self.server.admit()
+        if not ok:
+            return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, {
+                "retry-after-ms": str(int(retry_after * 1000)),
+                "x-ratelimit-limit-requests": str(self.server.rpm),
+                "x-ratelimit-remaining-requests": "0",
+            })
+        time.sleep(self.server.latency)
+        prompt_tokens = estimate_tokens(body["messages"]) if "messages" in body else len(json.dumps(body)) // 4
+        if self.path.endswith("/embeddings"):
+            payload = {
+                "object": "list",
+                "model": body.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": [0.0] * 8}
+                    for i in range(len(body["input"]) if isinstance(body.get("input"), list) else 1)
+                ],
+                "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+            }
+        else:
+            # Like the real API: a repeated prefix of ≥1024 tokens is served from cache in 128-token steps.
+            # The prefix here is everything before the final text part (system prompt, images).
+            messages = body.get("messages", [])
+            last = messages[-1]["content"] if messages else ""
+            head = messages[:-1] + ([last[:-1]] if isinstance(last, list) else [])
+            prefix = json.dumps(head, sort_keys=True)
+            prefix_tokens = estimate_tokens(head[:1]) + IMAGE_TOKENS * prefix.count("image_url")
+            cached_tokens = prefix_tokens // 128 * 128 if prefix in self.server.prefixes and prefix_tokens >= 1024 else 0
+            self.server.prefixes.add(prefix)
+            payload = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": 1,
+                    "total_tokens": prompt_tokens + 1,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                },
+            }
+        self._send(200, payload, {
+            "x-ratelimit-limit-requests": str(self.server.rpm),
+            "x-ratelimit-remaining-requests": str(remaining),
+        })
+
+    def _send(self, status: int, payload: dict, headers: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+# ---------------- LOAD TEST ----------------
+# The defaults send more requests than the server's per-minute limit allows, so the client has to take
+# 429s, retry and learn the limit; the overflow waits for the window to slide (a little over a minute).
+def main(args):
+    server = MockOpenAIServer(rpm=args.rpm, latency=args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    tracer.enable()
+    budget.configure(args.budget_usd)
+
+    llm = OpenAILLM(model="gpt-4o-mini", api_key="mock", base_url=server.base_url)
+    embedder = OpenAIEmbedder(model="text-embedding-3-large", model_dim=8, api_key="mock", base_url=server.base_url)
+    # Start the client above the server's real limit so the limiter has to discover it
+    llm.client.limiter("gpt-4o-mini").requests.sync(per_minute=args.client_rpm)
+
+    def call(i: int) -> str:
+        try:
+            if i % 4 == 3:
+                embedder.embed(f"request {i}")
+                return "ok"
+            if args.image and i % 2:
+                return llm.generate(f"request {i}", GENERATE_SYSTEM_PROMPT, args.image)
+            return llm.generate(f"request {i}", EXTRACT_SYSTEM_PROMPT)
+        except BudgetExceeded:
+            return "budget"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        outcomes = list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"📈 {args.requests} requests in {elapsed:.2f}s ({outcomes.count('ok') / elapsed:.1f} ok/s)")
+    print(f"   server: {server.stats['ok']} served, {server.stats['429']} rejected with 429")
+    n_429, n_retries = tracer.counters["ratelimit.429"], tracer.counters["ratelimit.429"] + tracer.counters["openai.retry"]
+    print(f"   client: {n_429} × 429, {n_retries} retries, {tracer.counters['ratelimit.wait_ms'] / 1000:.1f} s waiting in the limiter (summed over threads), "
+          f"halted by budget: {outcomes.count('budget')}")
+    print(f"💰 {budget.report()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate limiter load test against a local mock OpenAI server")
+    parser.add_argument("--requests", type=int, default=80)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=60, help="Server-side limit; below --requests to provoke 429s")
+    parser.add_argument("--client_rpm", type=int, default=6000, help="Client's initial (wrong) assumption")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--budget_usd", type=float, default=None)
+    parser.add_argument("--image", type=str, default=None, help="Send every other request with this image")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,182 @@
+import argparse, json, os, subprocess, tempfile, time, tracemalloc
+from collections import defaultdict
+
+from construction.extract_entities import extract_data
+from construction.manage_database import add_to_graph
+from generation.handle_query import MemoryRetriever, retrieve_context, retrieve_motif_context, split_motifs, generate_response
+from utils.fakes import FakeLLM, FakeEmbedder
+from utils.graph import InMemoryGraph, sanitize_label
+from utils.prompts import CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT
+from utils.synthetic import make_graph_data
+from utils.tracing import tracer
+from utils.utils import load_json_file
+
+
+# ---------------- STAGES ----------------
+# Each stage runs end to end against fake models and the in-memory graph, so timings
+# reflect our own code (chunking, parsing, ingestion, expansion, formatting) only.
+STAGE_SPANS = {
+    "extraction": "extract.chunk",
+    "ingestion":  "add_to_graph",
+    "retrieval":  "retrieve_context",
+    "retrieval_motifs": "retrieve_motif_context",
+    "generation": "generate_response",
+}
+
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    graph_data = make_graph_data(base_path, scale=args.scale, seed=args.seed)
+    gen_model = FakeLLM(graph_data, latency=args.llm_latency, jitter=args.llm_jitter, malformed_rate=args.malformed_rate, seed=args.seed)
+    embedder = FakeEmbedder(latency=args.embed_latency)
+    queries = _load_queries(os.path.join(args.example_dir, "generation", "input.json"), args.queries)
+    tracer.enable()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        extracted_path = os.path.join(tmp_dir, "extracted.json")
+        results["extraction"] = _measure("extraction", lambda: extract_data(
+            gen_model, os.path.join(args.example_dir, "construction", "fetched.json"), extracted_path, args.chunk_size,
+        ))
+
+        graph_path = os.path.join(tmp_dir, "graph.json")
+        with open(graph_path, "w", encoding="utf-8") as graph_file:
+            json.dump(graph_data, graph_file, ensure_ascii=False)
+        graph = InMemoryGraph()
+        results["ingestion"] = _measure("ingestion", lambda: add_to_graph(graph, graph_path, embedder))
+
+    retriever = MemoryRetriever(graph)
+    # Motif coverage: share of caption tags whose Form made it into the retrieved context
+    coverage = defaultdict(list)
+    def run_retrieval(motifs: bool):
+        for _, image in queries:
+            caption = gen_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, image)
+            if motifs:
+                context = retrieve_motif_context(retriever, embedder, split_motifs(caption), args.top_k, args.per_seed_limit, args.per_motif_cap, args.fusion, not args.no_fast_path)
+            else:
+                context = retrieve_context(retriever, embedder.embed(caption), args.top_k, args.per_seed_limit)
+            names = {entity["name"] for entity in context["entities"]}
+            tags = split_motifs(caption)
+            coverage[motifs].append(sum(sanitize_label(tag) in names for tag in tags) / len(tags))
+    results["retrieval"] = _measure("retrieval", lambda: run_retrieval(False))
+    results["retrieval_motifs"] = _measure("retrieval_motifs", lambda: run_retrieval(True))
+    for stage, motifs in [("retrieval", False), ("retrieval_motifs", True)]:
+        results[stage]["motif_coverage"] = sum(coverage[motifs]) / max(1, len(coverage[motifs]))
+
+    def run_generation():
+        for query, image in queries:
+            generate_response(query, image, gen_model, gen_model, embedder, retriever)
+    results["generation"] = _measure("generation", run_generation)
+
+    report = {
+        "commit": _git_sha(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out_dir", "compare")},
+        "graph": {"nodes": len(graph.node_index), "rels": len(graph.rel_index), "vectors": len(graph.embeddings)},
+        "stages": results,
+    }
+    _print_report(report)
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_path = os.path.join(args.out_dir, f"{report['commit']}.json")
+    with open(out_path, "w", encoding="utf-8") as out_file:
+        json.dump(report, out_file, ensure_ascii=False, indent=4)
+    print(f"💾 Results saved to {out_path}")
+
+    if args.compare:
+        _print_comparison(load_json_file(args.compare), report)
+
+
+# ---------------- MEASUREMENT ----------------
+def _measure(stage: str, run) -> dict:
+    n_before = len(tracer.spans)
+    tracemalloc.start()
+    start = time.perf_counter()
+    run()
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations = sorted(s.duration for s in tracer.spans[n_before:] if s.name == STAGE_SPANS[stage])
+    totals = defaultdict(float)
+    for span in tracer.spans[n_before:]:
+        if span.name == STAGE_SPANS[stage]:
+            for key, value in span.attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] += value
+    return {
+        "calls": len(durations),
+        "wall_s": wall,
+        "throughput_per_s": len(durations) / wall if wall else 0.0,
+        "p50_ms": _percentile(durations, 0.50) * 1000,
+        "p95_ms": _percentile(durations, 0.95) * 1000,
+        "p99_ms": _percentile(durations, 0.99) * 1000,
+        "peak_mb": peak / 2**20,
+        "totals": dict(totals),
+    }
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def _load_queries(input_path: str, limit: int) -> list[tuple[str, str]]:
+    queries = [(query, entry["image"]) for entry in load_json_file(input_path) or [] for query in entry["query"]]
+    return queries[:limit] if limit else queries
+
+def _git_sha() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---------------- REPORTING ----------------
+METRICS = ["calls", "p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "peak_mb"]
+
+def _print_report(report: dict) -> None:
+    graph = report["graph"]
+    print(f"📈 Pipeline benchmark @ {report['commit']}  (graph: {graph['nodes']} nodes, {graph['rels']} rels)")
+    print(f"{'stage':16s} " + " ".join(f"{m:>16s}" for m in METRICS))
+    for stage, stats in report["stages"].items():
+        print(f"{stage:16s} " + " ".join(f"{stats[m]:16.2f}" for m in METRICS))
+    for stage, stats in report["stages"].items():
+        if "motif_coverage" in stats:
+            print(f"🎯 {stage}: {stats['motif_coverage']:.0%} of caption motifs reached the context")
+        totals = stats["totals"]
+        if totals.get("motifs"):
+            print(f"⚡ {stage}: alias fast path served {totals['fast_path_motifs']:.0f}/{totals['motifs']:.0f} motifs, "
+                  f"{totals['fast_path_seeds']:.0f}/{totals['seeds']:.0f} seeds; avoided {totals['embeddings_avoided']:.0f} embeddings "
+                  f"and {totals['embed_calls_avoided']:.0f} embedding calls")
+
+def _print_comparison(baseline: dict | None, report: dict) -> None:
+    if not baseline:
+        print("❗ Baseline results could not be loaded.")
+        return
+    print(f"🔁 {baseline['commit']} → {report['commit']}  (change in %, negative is faster/smaller)")
+    print(f"{'stage':16s} " + " ".join(f"{m:>16s}" for m in METRICS[1:]))
+    for stage, stats in report["stages"].items():
+        if not (old := baseline["stages"].get(stage)):
+            continue
+        deltas = [(stats[m] - old[m]) / old[m] * 100 if old[m] else 0.0 for m in METRICS[1:]]
+        print(f"{stage:16s} " + " ".join(f"{d:+15.1f}%" for d in deltas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark (fake models, in-memory graph)")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the reference graph N times")
+    parser.add_argument("--queries", type=int, default=0, help="Limit the number of queries (0 = all)")
+    parser.add_argument("--chunk_size", type=int, default=512)
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--per_seed_limit", type=int, default=10)
+    parser.add_argument("--per_motif_cap", type=int, default=2)
+    parser.add_argument("--fusion", type=str, default="rrf", choices=["rrf", "max"])
+    parser.add_argument("--no_fast_path", action="store_true", help="Vector-search every motif (skip the alias index)")
+    parser.add_argument("--llm_latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--llm_jitter", type=float, default=0.0)
+    parser.add_argument("--embed_latency", type=float, default=0.0)
+    parser.add_argument("--malformed_rate", type=float, default=0.0, help="Fraction of extraction replies to corrupt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out_dir", type=str, default="benchmark/results")   # gitignored
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results JSON to diff against")
+    args = parser.parse_args()
+    main(args)
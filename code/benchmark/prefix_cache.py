@@ -0,0 +1,46 @@
+import argparse, os, sys, time
+
+from utils.prompts import EXTRACT_SYSTEM_PROMPT, EXTRACT_USER_PROMPT
+from utils.tracing import tracer
+from utils.utils import load_json_file
+
+
+# ---------------- CHECK ----------------
+# LocalLLM's prefix cache must not change what the model says: greedy-decodes extraction prompts over the
+# example fetched.json with and without the cached system-prompt KV state and compares the text. Run it for
+# a model before turning prefix_cache on for it in utils/registry.py (the Qwen VL models keep M-RoPE
+# position state between calls, which a copied prefix cache may not line up with). Exits non-zero on a mismatch.
+def main(args):
+    from utils.llm import LocalLLM
+    llm = LocalLLM(args.model)
+    entries = load_json_file(os.path.join(args.example_dir, "construction", "fetched.json"))[:args.requests]
+    prompts = [EXTRACT_USER_PROMPT.replace("{passage}", entry["body"][:args.chars]) for entry in entries]
+    tracer.enable()
+
+    outputs, seconds = {}, {}
+    for label, prefix_cache in [("plain", None), ("cached", {})]:
+        llm.prefix_cache = prefix_cache
+        start = time.perf_counter()
+        outputs[label] = [llm.generate(prompt, EXTRACT_SYSTEM_PROMPT, max_new_tokens=args.max_new_tokens, do_sample=False) for prompt in prompts]
+        seconds[label] = time.perf_counter() - start
+
+    mismatches = [i for i, (plain, cached) in enumerate(zip(outputs["plain"], outputs["cached"])) if plain != cached]
+    hits = tracer.counters.get("prefix_cache.hit", 0)
+    print(f"📈 {args.model}: {len(prompts)} prompts, {hits} prefix cache hits, "
+          f"{seconds['plain']:.1f} s plain vs. {seconds['cached']:.1f} s cached")
+    for i in mismatches:
+        print(f"   ❗ prompt {i}: plain {outputs['plain'][i][:80]!r} vs. cached {outputs['cached'][i][:80]!r}")
+    print(f"{'❗' if mismatches else '✅'} {len(prompts) - len(mismatches)}/{len(prompts)} greedy outputs identical with the prefix cache")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Greedy outputs of LocalLLM with and without the prefix cache")
+    parser.add_argument("--model", type=str, default="Qwen/Qwen2.5-VL-7B-Instruct")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--chars", type=int, default=1500)   # passage length per prompt
+    parser.add_argument("--max_new_tokens", type=int, default=128)
+    args = parser.parse_args()
+    main(args)
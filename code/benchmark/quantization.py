@@ -0,0 +1,61 @@
+import argparse, time
+import numpy as np
+
+from utils.vector_store import VectorStore
+
+
+# ---------------- BENCHMARK ----------------
+# Matryoshka truncation × float/int8/binary storage, with and without exact float rescoring, against
+# exact full-precision search: resident index memory, search latency and recall@k per query.
+# Uses real embeddings when given (--vectors, e.g. a snapshot's embeddings.npy; queries are held-out
+# rows plus noise), else synthetic clustered vectors whose variance decays over the dimensions the way
+# Matryoshka-trained embeddings concentrate information in the leading ones.
+def main(args):
+    rng = np.random.default_rng(args.seed)
+    vectors = np.load(args.vectors, mmap_mode="r") if args.vectors else synthetic_vectors(args.n, args.dimension, args.clusters, rng)
+    n, dimension = vectors.shape
+    rows = rng.choice(n, args.queries, replace=False)
+    queries = np.asarray(vectors[np.sort(rows)], dtype=np.float32)
+    queries += args.noise * np.linalg.norm(queries, axis=1, keepdims=True) * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(dimension)
+
+    exact = VectorStore(vectors)
+    truth = [{row for row, _ in exact.search(query, args.top_k)} for query in queries]
+    print(f"📈 {n} vectors × {dimension} dims, {args.queries} queries, recall@{args.top_k} vs. exact float{dimension}")
+    for dims in [d for d in args.dims if d <= dimension]:
+        for quantization in ["float", "int8", "binary"]:
+            for rescore in ([0] if quantization == "float" else [0, *args.rescore]):
+                start = time.perf_counter()
+                store = VectorStore(vectors, quantization, rescore, dims)
+                build_time = time.perf_counter() - start
+                latencies, recalls = [], []
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    found = store.search(query, args.top_k)
+                    latencies.append(time.perf_counter() - start)
+                    recalls.append(len(expected & {row for row, _ in found}) / args.top_k)
+                label = f"{quantization}@{dims}" + (f" +rescore x{rescore}" if rescore else "")
+                print(f"   {label:22s} {store.nbytes() / 2**20:8.1f} MiB  build {build_time:6.2f} s  "
+                      f"p50 {np.percentile(latencies, 50)*1000:7.2f} ms  p95 {np.percentile(latencies, 95)*1000:7.2f} ms  recall {np.mean(recalls):6.1%}")
+
+def synthetic_vectors(n: int, dimension: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    spectrum = (np.arange(dimension) + 1.0) ** -0.5
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + rng.standard_normal((n, dimension), dtype=np.float32)
+    vectors *= spectrum.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized / truncated vector search: memory, latency and recall")
+    parser.add_argument("--vectors", type=str, default=None)   # .npy of real embeddings; synthetic if omitted
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=3072)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--dims", type=int, nargs="+", default=[3072, 1024, 256])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5)   # query perturbation, relative to the vector norm
+    parser.add_argument("--top_k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4, 16])   # candidates rescored per result
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
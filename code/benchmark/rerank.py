@@ -0,0 +1,67 @@
+import argparse, json, os, tempfile, time
+import numpy as np
+
+from construction.manage_database import add_to_graph
+from generation.handle_query import MemoryRetriever, retrieve_context, serialize_context
+from generation.rerank import PathReranker
+from utils.fakes import FakeLLM, FakeEmbedder
+from utils.graph import InMemoryGraph
+from utils.prompts import CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT
+from utils.synthetic import make_graph_data
+from utils.tracing import tracer
+
+
+# ---------------- BENCHMARK ----------------
+# Default ranking (score / length, top `per_seed_limit` paths) vs. PathReranker on the synthetic graph:
+# retrieval latency, candidate paths, and the size of the context that would be sent to gen_model.
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    tracer.enable()
+    for scale in args.scales:
+        graph_data = make_graph_data(base_path, scale=scale, cross_links=args.cross_links, seed=args.seed)
+        gen_model = FakeLLM(graph_data, seed=args.seed)
+        embedder = FakeEmbedder()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            graph_path = os.path.join(tmp_dir, "graph.json")
+            with open(graph_path, "w", encoding="utf-8") as graph_file:
+                json.dump(graph_data, graph_file, ensure_ascii=False)
+            graph = InMemoryGraph()
+            add_to_graph(graph, graph_path, embedder)
+        retriever = MemoryRetriever(graph)
+        vectors = [
+            embedder.embed(gen_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, f"image_{i}.png"))
+            for i in range(args.queries)
+        ]
+
+        modes = {
+            "default": None,
+            "rerank": PathReranker(max_paths=args.per_seed_limit, max_nodes=args.max_nodes),
+        }
+        for mode, reranker in modes.items():
+            latencies, chars, entities, relations = [], [], [], []
+            n_spans = len(tracer.spans)
+            for vector in vectors:
+                start = time.perf_counter()
+                context = retrieve_context(retriever, vector, args.top_k, args.per_seed_limit, reranker)
+                latencies.append(time.perf_counter() - start)
+                chars.append(len(serialize_context(context)))
+                entities.append(len(context["entities"]))
+                relations.append(len(context["relations"]))
+            candidates = [span.attrs.get("candidate_paths", 0) for span in tracer.spans[n_spans:] if span.name == "retrieve_context"]
+            print(f"📈 x{scale:<3d} {mode:8s} p50 {np.percentile(latencies, 50)*1000:7.2f} ms  p95 {np.percentile(latencies, 95)*1000:7.2f} ms  "
+                  f"context {np.mean(chars):8.0f} chars  {np.mean(entities):5.1f} entities  {np.mean(relations):5.1f} relations"
+                  + (f"  (from {np.mean(candidates):.0f} candidate paths)" if reranker else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Path reranking latency and context size on the synthetic graph")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cross_links", type=float, default=0.2, help="Extra random Connotes edges per relation")
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--per_seed_limit", type=int, default=10)
+    parser.add_argument("--max_nodes", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,66 @@
+import argparse, functools, json, os, tempfile, time
+
+from construction.shard_extract import extract_sharded, merge_shards, shard_paths
+from utils.fakes import FakeLLM
+from utils.graph import plan_graph
+from utils.synthetic import make_graph_data
+from utils.utils import load_json_file
+
+
+# ---------------- BENCHMARK ----------------
+# Sharded extraction with FakeLLM workers (fixed per-call latency, standing in for API round trips) over
+# a corpus split across several source files: wall time and throughput per shard count, and a check that
+# the merged output plans to the same graph whatever the shard count.
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    factory = functools.partial(FakeLLM, make_graph_data(base_path, scale=1, seed=args.seed), latency=args.latency)
+    body = load_json_file(os.path.join(args.example_dir, "construction", "fetched.json"))[0]["body"]
+    paragraphs = [p for p in body.split("\n") if p.strip()] or [body]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_paths = []
+        for f in range(args.files):
+            entries = [{"headword": f"entry{f}_{i}", "body": paragraphs[(f * args.entries + i) % len(paragraphs)] * (1 + i % 3)} for i in range(args.entries)]
+            src_paths.append(os.path.join(tmp_dir, f"fetched_{f}.json"))
+            with open(src_paths[-1], "w", encoding="utf-8") as src_file:
+                json.dump(entries, src_file, ensure_ascii=False)
+
+        graphs, times = {}, {}
+        for shards in args.shards:
+            start = time.perf_counter()
+            shard_paths = extract_sharded(factory, src_paths, os.path.join(tmp_dir, f"shards_{shards}"), shards, poll_interval=args.poll_interval)
+            merged = merge_shards(shard_paths, os.path.join(tmp_dir, f"extracted_{shards}.json"))
+            times[shards] = time.perf_counter() - start
+            graphs[shards] = plan_graph(merged)
+        print(f"📈 {args.files} files × {args.entries} entries, {args.latency*1000:.0f} ms per model call")
+        for shards in args.shards:
+            nodes, edges = graphs[shards]
+            same = (nodes, edges) == graphs[args.shards[0]]
+            print(f"   {shards:2d} shards  {times[shards]:7.2f} s  speedup {times[args.shards[0]] / times[shards]:5.2f}x  "
+                  f"{len(nodes)} nodes, {len(edges)} edges{'' if same else '  ⚠️ graph differs'}")
+
+        # Rerun after appending one entry to the first file: only the shard it hashes to should change
+        shards, shard_dir = args.shards[-1], os.path.join(tmp_dir, f"shards_{args.shards[-1]}")
+        before = [load_json_file(shard_paths(shard_dir, k)[0]) for k in range(shards)]
+        entries = load_json_file(src_paths[0])
+        entries.append({"headword": "appended", "body": paragraphs[-1]})
+        with open(src_paths[0], "w", encoding="utf-8") as src_file:
+            json.dump(entries, src_file, ensure_ascii=False)
+        start = time.perf_counter()
+        merged = merge_shards(extract_sharded(factory, src_paths, shard_dir, shards, poll_interval=args.poll_interval), os.path.join(tmp_dir, "extracted_rerun.json"))
+        rerun_time = time.perf_counter() - start
+        changed = sum(load_json_file(shard_paths(shard_dir, k)[0]) != before[k] for k in range(shards))
+        print(f"   +1 entry, {shards} shards: {changed}/{shards} shards changed, rerun {rerun_time:.2f} s vs. {times[shards]:.2f} s from scratch, "
+              f"{len(plan_graph(merged)[0])} nodes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-process extraction: throughput and merge consistency")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=20)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--poll_interval", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,66 @@
+import argparse, json, os, tempfile, time
+
+from construction.manage_database import add_to_graph
+from construction.snapshot import export_graph, restore_graph
+from utils.fakes import FakeEmbedder
+from utils.graph import InMemoryGraph
+from utils.synthetic import make_graph_data
+
+
+# ---------------- BENCHMARK ----------------
+# Bootstrapping a graph from a snapshot vs. rebuilding it from extracted.json (which re-embeds every Form).
+# Timings cover our own code and the embedded backend; `--embed_latency` simulates the embedding API.
+def main(args):
+    base_path = os.path.join(args.example_dir, "construction", "extracted.json")
+    results = []
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            graph_path = os.path.join(tmp_dir, "extracted.json")
+            with open(graph_path, "w", encoding="utf-8") as graph_file:
+                json.dump(make_graph_data(base_path, scale=scale, seed=args.seed), graph_file, ensure_ascii=False)
+
+            embedder = FakeEmbedder(dimension=args.dimension, latency=args.embed_latency)
+            graph = InMemoryGraph()
+            rebuild = _timed(lambda: add_to_graph(graph, graph_path, embedder))
+            snap_dir = os.path.join(tmp_dir, "snapshot")
+            export = _timed(lambda: export_graph(graph, snap_dir))
+            restore = _timed(lambda: restore_graph(snap_dir))
+            restored = restore_graph(snap_dir)
+            assert restored.state()[0].keys() == graph.state()[0].keys() and restored.rel_index.keys() == graph.rel_index.keys()
+
+            row = {
+                "scale": scale,
+                "nodes": len(graph.node_index),
+                "edges": len(graph.rel_index),
+                "vectors": len(graph.embeddings),
+                "rebuild_s": rebuild,
+                "export_s": export,
+                "restore_s": restore,
+                "json_mb": os.path.getsize(graph_path) / 1e6,
+                "snapshot_mb": sum(os.path.getsize(os.path.join(snap_dir, f)) for f in os.listdir(snap_dir)) / 1e6,
+            }
+            results.append(row)
+            print(f"📈 x{scale:<4d} {row['nodes']:7d} nodes {row['edges']:7d} edges  rebuild {rebuild:7.3f}s  "
+                  f"export {export:7.3f}s  restore {restore:7.3f}s  snapshot {row['snapshot_mb']:7.2f} MB (json {row['json_mb']:.2f} MB)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, ensure_ascii=False, indent=4)
+
+
+def _timed(run) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot export/restore vs. rebuild at several graph sizes")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--dimension", type=int, default=3072, help="Embedding width (text-embedding-3-large)")
+    parser.add_argument("--embed_latency", type=float, default=0.0, help="Simulated seconds per embedding call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,115 @@
+import argparse, glob, json, multiprocessing as mp, os, resource, tempfile, time
+
+from utils.utils import load_json_file, load_table_file, convert_json_to_table
+
+
+# ---------------- QUERIES ----------------
+# (name, columns, filters) applied to each artefact; filters only where the columns exist
+QUERIES = [
+    ("full",       None,             None),
+    ("projection", ["key", "title"], None),
+    ("era",        None,             [("era", "=", "조선")]),
+    ("labels",     None,             [("label_meaning", "=", True), ("label_composition", "=", True)]),
+]
+
+
+# ---------------- BENCHMARK ----------------
+def main(args):
+    paths = args.files or sorted(glob.glob(os.path.join(args.example_dir, "dataset", "*.json")))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for src_path in paths:
+            data = load_json_file(src_path)
+            if not isinstance(data, dict) or "entities" in data:
+                continue  # keyed artefacts only; extracted.json converts but has no keys to compare
+            stem = os.path.splitext(os.path.basename(src_path))[0]
+            targets = {"json": src_path}
+            for ext in ["parquet", "arrow"]:
+                targets[ext] = os.path.join(tmp_dir, f"{stem}.{ext}")
+                convert_json_to_table(src_path, targets[ext])
+
+            first = next(iter(data.values()))
+            for name, columns, filters in QUERIES:
+                if filters and any(col not in first and not col.startswith("label_") for col, _, _ in filters):
+                    continue
+                if name == "labels" and not isinstance((first.get("sentences") or [None])[0], dict):
+                    continue
+                for fmt, path in targets.items():
+                    stats = _run_isolated(fmt, path, columns, filters, args.repeat)
+                    results.append({"file": os.path.basename(src_path), "query": name, "format": fmt, **stats})
+                    print(f"{os.path.basename(src_path):40s} {name:10s} {fmt:8s} "
+                          f"{stats['rows']:6d} rows  cold {stats['cold_seconds']*1000:8.2f} ms  "
+                          f"warm {stats['seconds']*1000:8.2f} ms  rss {stats['rss_mb']:7.2f} MB")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out_file:
+            json.dump(results, out_file, ensure_ascii=False, indent=4)
+
+
+def _run_isolated(fmt: str, path: str, columns: list | None, filters: list | None, repeat: int) -> dict:
+    # Each load runs in a fresh process so peak RSS is not polluted by earlier runs
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(fmt, path, columns, filters, queue, repeat))
+    proc.start()
+    stats = queue.get()
+    proc.join()
+    return stats
+
+def _measure(fmt: str, path: str, columns: list | None, filters: list | None, queue, repeat: int) -> None:
+    if fmt != "json":
+        _warm_up()  # exclude pyarrow import and kernel initialisation from the measurement
+    rss_before = _rss_mb()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if fmt == "json":
+            result = _filter_json(load_json_file(path), columns, filters)
+            rows = len(result)
+        else:
+            result = load_table_file(path, columns=columns, filters=filters)
+            rows = result.num_rows
+        timings.append(time.perf_counter() - start)
+    queue.put({
+        "rows": rows,
+        "cold_seconds": timings[0],
+        "seconds": min(timings),
+        "rss_mb": _rss_mb() - rss_before,  # result is still referenced here
+    })
+
+def _warm_up() -> None:
+    import io, pyarrow as pa, pyarrow.parquet as pq
+    buf = io.BytesIO()
+    pq.write_table(pa.table({"x": [1]}), buf)
+    buf.seek(0)
+    pq.read_table(buf, filters=[("x", "=", 1)]).filter(pq.filters_to_expression([("x", "=", 1)]))
+
+def _filter_json(data: dict, columns: list | None, filters: list | None) -> list[dict]:
+    rows = []
+    for key, item in data.items():
+        if filters:
+            top_labels = {sent["labels"][0] for sent in item.get("sentences", []) if isinstance(sent, dict)}
+            values = {**item, **{f"label_{label}": True for label in top_labels}}
+            if not all(values.get(col, False if col.startswith("label_") else None) == val for col, _, val in filters):
+                continue
+        if columns:
+            item = {col: key if col == "key" else item.get(col) for col in columns}
+        rows.append(item)
+    return rows
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak only, KiB on Linux
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON vs Parquet/Arrow load benchmark")
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--files", type=str, nargs="*", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -1,45 +1,402 @@
-import json, re
+import hashlib, json, os, re
 from tqdm import tqdm
 from neo4j_graphrag.generation.prompts import PromptTemplate
 
+from utils.batch import BaseBatchBackend, make_request, run_batch
+from utils.graph import sanitize_label
+from utils.json_repair import JSONRepairError, parse_json, filter_valid
 from utils.llm import BaseLLM
-from utils.prompts import EXTRACT_SYSTEM_PROMPT, EXTRACT_USER_PROMPT
-from utils.utils import load_json_file
+from utils.prompts import EXTRACT_SYSTEM_PROMPT, EXTRACT_USER_PROMPT, EXTRACT_SCHEMA
+from utils.sentences import SentenceCache, split_batch, chunk_sentences
+from utils.tracing import tracer, traced
+from utils.utils import load_json_file, save_json
 
 
 # ---------------- EXTRACT ENTITIES ----------------
-def extract_data(gen_model: BaseLLM, src_path: str, dst_path: str, chunk_size: int = 512) -> None:
+# Two sidecars next to dst_path make long runs restartable: <dst>.progress.json lists the entries already
+# merged into dst_path (skipped on rerun), <dst>.failed.jsonl the chunks that never produced usable JSON.
+# Every extracted item records the chunks it came from in "sources" ("<entry id>#<chunk hash>"), and
+# <dst>.contributions.json what each of those chunks said about it (see EntityTable). With incremental=True the source file is diffed against those tags instead: items from chunks that no longer
+# exist are dropped, and only new or edited chunks go to the model.
+# Chunk outputs accumulate in an EntityTable, so dst_path holds each entity and relation once.
+@traced("extract_data")
+def extract_data(gen_model: BaseLLM, src_path: str, dst_path: str, chunk_size: int = 512, sent_cache: SentenceCache | None = None, max_attempts: int = 3, incremental: bool = False) -> "EntityTable | None":
     prompt = PromptTemplate(
         template=EXTRACT_USER_PROMPT,
         expected_inputs=["passage"],
     )
     if not (entries := load_json_file(src_path)):
         return
-    if not (data := load_json_file(dst_file)):
+    if not (data := load_extraction(dst_path)):
         data = {
             "entities": [],
             "relations": [],
         }
-    with open(dst_path, "w", encoding="utf-8") as dst_file:
-        for i, entry in enumerate(entries):
-            text = entry["body"]
-            
-            # TODO: REPLACE WITH SEMANTIC CHUNKING
-            chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
-            # END TODO
-
-            for chunk in tqdm(chunks, desc=f"🔄 Processing entry {i+1}/{len(entries)}", leave=False):
-                if len(chunk.strip()) == 0:
+    progress_path, failed_path = sidecars(dst_path)
+    if incremental:
+        # Only entries with new or edited chunks are written; the progress sidecar is not used
+        done, n_known = set(), len(data.get("chunks", []))
+        all_chunks = _chunk_entries(entries, chunk_size, sent_cache)
+        known = prune_stale(data, {tag for chunks in all_chunks for tag, _ in chunks})
+        pending_save = len(known) < n_known   # pruning alone still has to reach dst_path once
+    table = EntityTable(data)
+    if not incremental:
+        done = set(load_json_file(progress_path) or [])
+        if done:
+            print(f"⏩ Resuming: {len(done)}/{len(entries)} entries already extracted")
+
+    for i, entry in enumerate(entries):
+        if i in done:
+            continue
+        if incremental:
+            if not (chunks := [(tag, chunk) for tag, chunk in all_chunks[i] if tag not in known]):
+                continue
+        else:
+            chunks = _chunk_entries([entry], chunk_size, sent_cache, offset=i)[0]
+
+        for j, (tag, chunk) in enumerate(tqdm(chunks, desc=f"🔄 Processing entry {i+1}/{len(entries)}", leave=False)):
+            with tracer.span("extract.chunk", chars=len(chunk)) as span:
+                content, error = extract_chunk(gen_model, prompt.format(passage=chunk), max_attempts)
+                if content is None:
+                    _log_failed(failed_path, i, j, chunk, error, tag)
+                    span.set(failed=True)
+                    continue
+                table.add(content, tag)
+                span.add(entities=len(content['entities']), relations=len(content['relations']))
+            # break # Only process first chunk for now
+
+        table.save(dst_path)
+        if incremental:
+            pending_save = False
+        else:
+            done.add(i)
+            save_json(sorted(done), progress_path)
+    if incremental and pending_save:
+        table.save(dst_path)
+    table.report()
+    return table
+
+def extract_chunk(gen_model: BaseLLM, user_prompt: str, max_attempts: int = 3) -> tuple[dict | None, str | None]:
+    # Retries only this chunk. A reply is accepted once it parses into an object; items that do
+    # not match EXTRACT_SCHEMA are dropped rather than failing the whole chunk.
+    error = None
+    for attempt in range(max_attempts):
+        if attempt:
+            tracer.count("extract.retry")
+        try:
+            content = gen_model.generate_json(user_prompt, EXTRACT_SYSTEM_PROMPT, schema=EXTRACT_SCHEMA)
+        except JSONRepairError as e:
+            error = str(e)
+            continue
+        if not isinstance(content, dict):
+            error = f"Expected a JSON object, got {type(content).__name__}"
+            continue
+        return clean_extraction(content), None
+    return None, error
+
+def clean_extraction(content: dict) -> dict:
+    # Types are matched to the schema's enums ignoring case, spaces and dashes ("CONNOTES", "form",
+    # "generates myth"), so filter_valid only drops items whose type is genuinely unknown
+    entities = [e for e in content.get("entities") or [] if isinstance(e, dict)]
+    relations = [r for r in content.get("relations") or [] if isinstance(r, dict)]
+    for entity in entities:
+        entity.setdefault("aliases", [])
+        entity.setdefault("description", "")
+        _canonical_type(entity, ENTITY_TYPES)
+    for rel in relations:
+        rel.setdefault("description", "")
+        _canonical_type(rel, RELATION_TYPES)
+        if isinstance(rel.get("source_concepts"), list):
+            rel["source_concepts"] = sorted(rel["source_concepts"])
+    entities, entity_errors = filter_valid(entities, EXTRACT_SCHEMA["properties"]["entities"]["items"])
+    relations, relation_errors = filter_valid(relations, EXTRACT_SCHEMA["properties"]["relations"]["items"])
+    if n_dropped := len(entity_errors) + len(relation_errors):
+        tracer.count("extract.dropped_items", n_dropped)
+    return {"entities": entities, "relations": relations}
+
+def _type_key(value: str) -> str:
+    return re.sub(r"[\s_-]+", "_", value.strip()).casefold()
+
+ENTITY_TYPES = {_type_key(t): t for t in EXTRACT_SCHEMA["properties"]["entities"]["items"]["properties"]["type"]["enum"]}
+RELATION_TYPES = {_type_key(t): t for branch in EXTRACT_SCHEMA["properties"]["relations"]["items"]["anyOf"] for t in branch["properties"]["type"]["enum"]}
+
+def _canonical_type(item: dict, types: dict[str, str]) -> None:
+    if isinstance(item.get("type"), str) and (canonical := types.get(_type_key(item["type"]))) and canonical != item["type"]:
+        item["type"] = canonical
+        tracer.count("extract.canonical_types")
+
+
+@traced("retry_failed_chunks")
+def retry_failed_chunks(gen_model: BaseLLM, dst_path: str, max_attempts: int = 3) -> None:
+    # Re-extracts only the chunks logged in <dst>.failed.jsonl; those that fail again stay logged
+    _, failed_path = sidecars(dst_path)
+    if not os.path.exists(failed_path):
+        print("✅ No failed chunks to retry.")
+        return
+    with open(failed_path, encoding="utf-8") as failed_file:
+        failed = [json.loads(line) for line in failed_file if line.strip()]
+    table = EntityTable(load_extraction(dst_path))
+    prompt = PromptTemplate(
+        template=EXTRACT_USER_PROMPT,
+        expected_inputs=["passage"],
+    )
+    still_failed = []
+    for record in tqdm(failed, desc="🔁 Retrying failed chunks"):
+        content, error = extract_chunk(gen_model, prompt.format(passage=record["chunk"]), max_attempts)
+        if content is None:
+            still_failed.append({**record, "error": error})
+            continue
+        table.add(content, record.get("source") or _chunk_tag(str(record["entry"]), record["chunk"]))
+
+    table.save(dst_path)
+    os.remove(failed_path)
+    for record in still_failed:
+        _log_failed(failed_path, record["entry"], record["chunk_index"], record["chunk"], record["error"], record.get("source"))
+    print(f"🔁 Recovered {len(failed) - len(still_failed)}/{len(failed)} chunks")
+
+
+@traced("extract_data_batch")
+def extract_data_batch(backend: BaseBatchBackend, src_path: str, dst_path: str, chunk_size: int = 512, sent_cache: SentenceCache | None = None, work_dir: str | None = None, poll_interval: float = 30.0) -> None:
+    # Same output as extract_data, but every chunk of every entry goes out as one offline batch
+    prompt = PromptTemplate(
+        template=EXTRACT_USER_PROMPT,
+        expected_inputs=["passage"],
+    )
+    if not (entries := load_json_file(src_path)):
+        return
+    table = EntityTable(load_extraction(dst_path))
+    requests, chunks = [], {}
+    for i, entry_chunks in enumerate(_chunk_entries(entries, chunk_size, sent_cache)):
+        for j, (tag, chunk) in enumerate(entry_chunks):
+            custom_id = f"entry-{i}-chunk-{j}"
+            chunks[custom_id] = (i, j, chunk, tag)
+            requests.append(make_request(custom_id, prompt.format(passage=chunk), EXTRACT_SYSTEM_PROMPT, **backend.json_kwargs(EXTRACT_SCHEMA)))
+
+    results = run_batch(backend, requests, work_dir or os.path.join(os.path.dirname(dst_path) or ".", "batch"), poll_interval)
+    _, failed_path = sidecars(dst_path)
+    n_failed = 0
+    for request in requests:  # submission order, so the output matches extract_data
+        result = results.get(request["custom_id"], {"error": "No result returned"})
+        try:
+            if "error" in result:
+                raise JSONRepairError(result["error"])
+            content = parse_json(result["content"])
+            if not isinstance(content, dict):
+                raise JSONRepairError(f"Expected a JSON object, got {type(content).__name__}")
+        except JSONRepairError as e:
+            i, j, chunk, tag = chunks[request["custom_id"]]
+            _log_failed(failed_path, i, j, chunk, str(e), tag)
+            n_failed += 1
+            continue
+        table.add(clean_extraction(content), chunks[request["custom_id"]][3])
+    if n_failed:
+        print(f"⚠️ Warning: {n_failed}/{len(requests)} chunks failed; see {failed_path} (--retry_failed)")
+
+    table.save(dst_path)
+    table.report()
+
+
+# ---------------- PROVENANCE ----------------
+def prune_stale(data: dict, current_tags: set[str]) -> set[str]:
+    # Drops items extracted only from chunks that are gone and returns the chunk tags still covered.
+    # Surviving items are rebuilt from the contributions of their remaining chunks, so a description or
+    # alias that only an edited chunk gave goes with it. Items without "sources" predate provenance
+    # tracking and are kept as they are; items without "contributions" keep their merged fields.
+    n_before = len(data["entities"]) + len(data["relations"])
+    for key in ("entities", "relations"):
+        kept = []
+        for item in data[key]:
+            if "sources" in item:
+                item["sources"] = [tag for tag in item["sources"] if tag in current_tags]
+                if not item["sources"]:
                     continue
-                response = gen_model.generate(
-                    prompt.format(passage=chunk),
-                    EXTRACT_SYSTEM_PROMPT,
-                )
-                content = json.loads(response.content)
-                data['entities'].extend(content['entities'])
-                data['relations'].extend(content['relations'])
-                # break # Only process first chunk for now
-            
-            dst_file.seek(0)
-            json.dump(data, dst_file, ensure_ascii=False, indent=4)
-            dst_file.truncate()
\ No newline at end of file
+                if "contributions" in item:
+                    item["contributions"] = {tag: c for tag, c in item["contributions"].items() if tag in current_tags}
+                    _apply_contributions(item)
+            kept.append(item)
+        data[key] = kept
+    data["chunks"] = [tag for tag in data.get("chunks", []) if tag in current_tags]
+    n_dropped = n_before - len(data["entities"]) - len(data["relations"])
+    print(f"♻️  {len(data['chunks'])}/{len(current_tags)} chunks unchanged; dropped {n_dropped} stale items")
+    tracer.count("extract.stale_items", n_dropped)
+    return set(data["chunks"])
+
+def _chunk_entries(entries: list[dict], chunk_size: int, sent_cache: SentenceCache | None, offset: int = 0) -> list[list[tuple[str, str]]]:
+    # (tag, chunk) pairs per entry, blank chunks skipped
+    # TODO: REPLACE WITH SEMANTIC CHUNKING
+    sents_per_entry = split_batch([entry["body"] for entry in entries], sent_cache)
+    # END TODO
+    return [
+        [(_chunk_tag(entry_id(entry, offset + i), chunk), chunk) for chunk in chunk_sentences(sents, chunk_size) if chunk.strip()]
+        for i, (entry, sents) in enumerate(zip(entries, sents_per_entry))
+    ]
+
+def entry_id(entry: dict, index: int) -> str:
+    return str(entry.get("id") or entry.get("headword") or index)
+
+def _chunk_tag(entry_id: str, chunk: str) -> str:
+    return f"{entry_id}#{hashlib.sha1(chunk.encode('utf-8')).hexdigest()[:12]}"
+
+
+
+# ---------------- ENTITY TABLE ----------------
+class EntityTable:
+    # Canonical entities and relations accumulated across chunks. Entities are keyed by (type, sanitized
+    # name), the key plan_graph gives their node; relations by (type, sources, target) over the same names.
+    # Each sourced item keeps what every chunk said about it in "contributions" ({tag: {name, description,
+    # aliases}}) and its merged fields are derived from those: the longest description, the union of
+    # aliases plus any differing surface name ("tiger" next to "Tiger"), the name from the first tag. Tag
+    # order makes the result independent of chunk order, so an incremental run that drops a chunk's
+    # contribution (prune_stale) ends up where a full re-extraction would. Loading a file dedupes it.
+    # save() keeps the extraction file to the merged facts and writes the contributions, keyed by item, to
+    # <dst>.contributions.json; load_extraction() puts them back on the items.
+    def __init__(self, data: dict | None = None):
+        self.entities: dict[tuple[str, str], dict] = {}
+        self.relations: dict[tuple, dict] = {}
+        self.chunks: dict[str, None] = {}
+        self.mentions = {"entities": 0, "relations": 0, "forms": 0}
+        if data:
+            for item in data.get("entities", []):
+                self.add_entity(item)
+            for item in data.get("relations", []):
+                self.add_relation(item)
+            self.chunks.update(dict.fromkeys(data.get("chunks", [])))
+
+    def add(self, content: dict, tag: str) -> None:
+        # One chunk's cleaned extraction, all of it sourced to `tag`
+        for item in content["entities"]:
+            self.add_entity({**item, "sources": [tag], "contributions": {tag: _contribution(item)}})
+        for item in content["relations"]:
+            self.add_relation({**item, "sources": [tag], "contributions": {tag: _contribution(item)}})
+        self.chunks[tag] = None
+
+    def add_entity(self, entity: dict) -> None:
+        self.mentions["entities"] += 1
+        self.mentions["forms"] += entity["type"] == "Form"
+        self._merge(self.entities, _entity_key(entity), entity)
+
+    def add_relation(self, rel: dict) -> None:
+        self.mentions["relations"] += 1
+        self._merge(self.relations, _relation_key(rel), rel)
+
+    def _merge(self, items: dict, key: tuple, item: dict) -> None:
+        if key not in items:
+            items[key] = {**item, "aliases": sorted(set(item.get("aliases") or []))} if "name" in item else dict(item)
+            if "contributions" in item:
+                _apply_contributions(items[key])
+            return
+        merged = items[key]
+        if "contributions" in merged and "contributions" in item:
+            contributions = dict(merged["contributions"])
+            for tag, c in item["contributions"].items():
+                contributions[tag] = _merge_contribution(contributions[tag], c) if tag in contributions else c
+            merged["contributions"] = contributions
+            _apply_contributions(merged)
+            return
+        # Legacy items (no per-chunk record): merge the fields directly; without "sources" it is never pruned
+        if "name" in merged:
+            merged["aliases"] = sorted(set(merged["aliases"]) | set(item.get("aliases") or []) | ({item["name"]} - {merged["name"]}))
+        merged["description"] = _best_description(merged.get("description"), item.get("description"))
+        if "sources" in merged and "sources" in item:
+            merged["sources"] = sorted(set(merged["sources"]) | set(item["sources"]))
+        else:
+            merged.pop("sources", None)
+        merged.pop("contributions", None)
+
+    def to_data(self) -> dict:
+        strip = lambda item: {k: v for k, v in item.items() if k != "contributions"}
+        data = {"entities": [strip(e) for e in self.entities.values()], "relations": [strip(r) for r in self.relations.values()]}
+        if self.chunks:
+            data["chunks"] = list(self.chunks)
+        return data
+
+    def contributions(self) -> dict:
+        return {
+            kind: {_item_id(key): item["contributions"] for key, item in items.items() if "contributions" in item}
+            for kind, items in (("entities", self.entities), ("relations", self.relations))
+        }
+
+    def save(self, dst_path: str) -> None:
+        # Contributions first: a run interrupted in between leaves extra records, which load_extraction ignores
+        save_json(self.contributions(), contributions_path(dst_path))
+        save_json(self.to_data(), dst_path)
+
+    def saved(self) -> dict:
+        # Items a per-item writer would have sent beyond the unique ones (one MERGE per entity/relation
+        # mention, one embedding call per Form mention)
+        return {
+            "entities": self.mentions["entities"] - len(self.entities),
+            "relations": self.mentions["relations"] - len(self.relations),
+            "embeddings": self.mentions["forms"] - sum(key[0] == "Form" for key in self.entities),
+        }
+
+    def report(self) -> None:
+        saved = self.saved()
+        print(f"🧮 {self.mentions['entities']} entity / {self.mentions['relations']} relation mentions → "
+              f"{len(self.entities)} / {len(self.relations)} unique ({saved['entities'] + saved['relations']} writes, {saved['embeddings']} embeddings saved)")
+        tracer.count("extract.merged_items", saved["entities"] + saved["relations"])
+
+def load_extraction(dst_path: str) -> dict | None:
+    # An extraction file with the contributions from its sidecar attached to their items
+    if not (data := load_json_file(dst_path)):
+        return data
+    contributions = load_json_file(contributions_path(dst_path)) or {}
+    for kind, key in (("entities", _entity_key), ("relations", _relation_key)):
+        records = contributions.get(kind) or {}
+        for item in data.get(kind, []):
+            if "sources" in item and (record := records.get(_item_id(key(item)))) is not None:
+                item["contributions"] = record
+    return data
+
+def _entity_key(entity: dict) -> tuple[str, str]:
+    return (entity["type"], sanitize_label(entity["name"]))
+
+def _relation_key(rel: dict) -> tuple:
+    sources = tuple(sorted(sanitize_label(name) for name in rel.get("source_concepts") or [rel.get("source", "")]))
+    return (rel["type"].upper().replace(" ", "_"), sources, sanitize_label(rel["target"]))
+
+def _contribution(item: dict) -> dict:
+    # What one chunk said about an entity (name, description, aliases) or a relation (description)
+    if "name" in item:
+        return {"name": item["name"], "description": item.get("description") or "", "aliases": sorted(set(item.get("aliases") or []))}
+    return {"description": item.get("description") or ""}
+
+def _merge_contribution(current: dict, new: dict) -> dict:
+    # The same chunk mentioning an item twice
+    merged = {**current, "description": _best_description(current["description"], new["description"])}
+    if "name" in current:
+        merged["aliases"] = sorted(set(current["aliases"]) | set(new["aliases"]) | ({new["name"]} - {current["name"]}))
+    return merged
+
+def _apply_contributions(item: dict) -> None:
+    # Merged fields from the chunks still contributing, in tag order so ties resolve the same in every run
+    contributions = [item["contributions"][tag] for tag in sorted(item["contributions"])]
+    item["sources"] = sorted(item["contributions"])
+    item["description"] = ""
+    for c in contributions:
+        item["description"] = _best_description(item["description"], c["description"])
+    if "name" in item:
+        item["name"] = contributions[0]["name"]
+        aliases = {alias for c in contributions for alias in c["aliases"]} | {c["name"] for c in contributions}
+        item["aliases"] = sorted(aliases - {item["name"]})
+
+def _best_description(current: str | None, new: str | None) -> str:
+    # The longer one: chunk-level descriptions are short, so length tracks how much the model knew
+    return max(current or "", new or "", key=len)
+
+def _item_id(key: tuple) -> str:
+    # An entity/relation key as a JSON object key in the contributions sidecar
+    return json.dumps(key, ensure_ascii=False)
+
+
+# ---------------- UTILS ----------------
+def sidecars(dst_path: str) -> tuple[str, str]:
+    return f"{dst_path}.progress.json", f"{dst_path}.failed.jsonl"
+
+def contributions_path(dst_path: str) -> str:
+    return f"{dst_path}.contributions.json"
+
+def _log_failed(failed_path: str, entry: int, chunk_index: int, chunk: str, error: str | None, source: str | None = None) -> None:
+    tracer.count("extract.failed_chunks")
+    with open(failed_path, "a", encoding="utf-8") as failed_file:
+        failed_file.write(json.dumps({"entry": entry, "chunk_index": chunk_index, "chunk": chunk, "error": error, "source": source}, ensure_ascii=False) + "\n")
@@ -1,10 +1,10 @@
-import argparse, os
+import argparse, os, sys
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 
-from construction.extract_entities import extract_data
-from construction.manage_database import clear_database, add_to_database
-from utils.llm import OpenAILLM, LocalLLM, OpenAIEmbedder
+from utils.ratelimit import budget, BudgetExceeded
+from utils.registry import registry, GEN_MODELS, EMBED_MODELS
+from utils.tracing import tracer, finish_trace
 
 
 # ---------------- NEO4J SETUP ----------------
@@ -16,27 +16,74 @@ INDEX = "Index"
 
 # ---------------- MAIN ----------------
 def main(args):
-    if args.extract == "y":
-        match args.model:
-            case "gpt-4o-mini" | "gpt-4o":
-                gen_model = OpenAILLM(model=args.model, api_key=os.getenv("OPENAI_API_KEY"))
-            case "qwen2.5-vl":
-                gen_model = LocalLLM(model="Qwen/Qwen2.5-VL-7B-Instruct")
-            case "qwen3-vl":
-                gen_model = LocalLLM(model="Qwen/Qwen3-VL-8B-Instruct")
-        extract_data(gen_model, args.src, args.dst)
-    
-    if args.clear == "y":
-        clear_database(driver)
+    # Stage modules are imported per flag so each run only pays for what it uses
+    if args.retry_failed:
+        from construction.extract_entities import retry_failed_chunks
+        gen_model = registry.get(args.model)
+        if args.shards:
+            # Every shard logs its own failures; the retried shards are merged into --dst again
+            from construction.shard_extract import shard_paths, merge_shards
+            paths = [dst_path for _, dst_path in (shard_paths(args.shard_dir, k) for k in range(args.shards)) if os.path.exists(dst_path)]
+            for dst_path in paths:
+                retry_failed_chunks(gen_model, dst_path)
+            if not args.extract:
+                merge_shards(paths, args.dst)
+        else:
+            retry_failed_chunks(gen_model, args.dst)
+
+    if args.extract:
+        if args.batch:
+            from construction.extract_entities import extract_data_batch
+            from utils.batch import make_batch_backend
+            backend = make_batch_backend(args.batch, args.model, args.batch_dir)
+            extract_data_batch(backend, args.src[0], args.dst, work_dir=args.batch_dir, poll_interval=args.poll_interval)
+        elif args.shards:
+            from construction.shard_extract import extract_sharded, merge_shards, ShardsFailed
+            try:
+                shard_paths = extract_sharded(args.model, args.src, args.shard_dir, args.shards, args.workers, device=args.shard_device)
+            except ShardsFailed as e:
+                # No merge, and no upsert of an incomplete extraction (--incremental would delete the missing facts)
+                print(f"❗ {e}; {args.dst} left unchanged, rerun to retry.")
+                return 1
+            merge_shards(shard_paths, args.dst)
+        elif len(args.src) > 1:
+            print("❗ Several --src files need --shards.")
+            return 1
+        else:
+            from construction.extract_entities import extract_data
+            gen_model = registry.get(args.model)
+            extract_data(gen_model, args.src[0], args.dst, incremental=args.incremental)
     
-    if args.upsert == "y":
+    if args.clear or args.upsert or args.restore or args.snapshot or args.hotspots:
+        from construction.manage_database import clear_database, add_to_database
         driver = GraphDatabase.driver(URI, auth=AUTH)
-        embedder = OpenAIEmbedder(
-            model="text-embedding-3-large",
-            model_dim=3072,
-            api_key=os.getenv("OPENAI_API_KEY"),
-        )
-        add_to_database(driver, args.dst, embedder, INDEX)
+
+        if args.clear or args.restore:
+            # The last applied plan no longer describes the database (see add_to_database)
+            from construction.manage_database import applied_plan_path
+            if os.path.exists(applied_path := applied_plan_path(args.dst)):
+                os.remove(applied_path)
+
+        if args.clear:
+            clear_database(driver)
+
+        if args.restore:
+            from construction.snapshot import restore_database
+            restore_database(driver, args.restore, INDEX)
+
+        if args.upsert:
+            embedder = registry.get(args.embed_model)
+            add_to_database(driver, args.dst, embedder, INDEX, incremental=args.incremental)
+
+        if args.snapshot:
+            from construction.snapshot import export_database
+            export_database(driver, args.snapshot)
+
+        if args.hotspots:
+            from construction.manage_database import expansion_hotspots
+            print("🔥 Nodes that dominate expansion cost (share of Form→Myth paths passing through):")
+            for spot in expansion_hotspots(driver, args.max_hops, args.hotspots):
+                print(f"   {spot['type']:12s} {spot['name']:40s} out {spot['out_degree'] or 0:5d}  {'supernode ' if spot['supernode'] else '':10s}{spot['share']:6.1%}")
 
         driver.close()
 
@@ -46,8 +93,35 @@ if __name__ == "__main__":
     parser.add_argument("--extract", action="store_true")
     parser.add_argument("--clear", action="store_true")
     parser.add_argument("--upsert", action="store_true")
-    parser.add_argument("--model", type=str, default="gpt-4o-mini", choices=["gpt-4o-mini", "gpt-4o", "qwen2.5", "qwen3"])
-    parser.add_argument("--src", type=str, default="../example/construction/fetched.json")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini", choices=GEN_MODELS)
+    parser.add_argument("--embed_model", type=str, default="text-embedding-3-large", choices=EMBED_MODELS)   # changing it needs --clear (index size, stored vectors)
+    parser.add_argument("--src", type=str, nargs="+", default=["../example/construction/fetched.json"])
+    parser.add_argument("--shards", type=int, default=0)   # extract every --src file in N worker processes, then merge into --dst
+    parser.add_argument("--workers", type=int, default=None)   # worker processes (default: one per shard)
+    parser.add_argument("--shard_dir", type=str, default="../example/construction/shards")
+    parser.add_argument("--shard_device", type=str, default="auto", choices=["auto", "cpu"])   # cpu: local models on CPU, threads split between workers
     parser.add_argument("--dst", type=str, default="../example/construction/extracted.json")
+    parser.add_argument("--snapshot", type=str, default=None)   # export the graph + Form embeddings to this directory
+    parser.add_argument("--restore", type=str, default=None)    # bulk-load a snapshot directory (use with --clear)
+    parser.add_argument("--hotspots", type=int, default=0)   # list the top N nodes that retrieval expansion passes through
+    parser.add_argument("--max_hops", type=int, default=4)
+    parser.add_argument("--incremental", action="store_true")    # extract/upsert only what changed in --src since the last run (Neo4j side untested)
+    parser.add_argument("--retry_failed", action="store_true")   # re-extract only chunks in <dst>.failed.jsonl (with --shards: every shard's, then re-merge)
+    parser.add_argument("--batch", type=str, default=None, choices=["openai", "local"])   # offline batch extraction
+    parser.add_argument("--batch_dir", type=str, default="../example/construction/batch")
+    parser.add_argument("--poll_interval", type=float, default=30.0)
+    parser.add_argument("--trace", type=str, default=None)     # .json (Chrome trace) or .jsonl
+    parser.add_argument("--budget_usd", type=float, default=None)   # halt once OpenAI spend reaches this
+    parser.add_argument("--budget_tokens", type=int, default=None)
     args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    if args.trace:
+        tracer.enable()
+    budget.configure(args.budget_usd, args.budget_tokens)
+    exit_code = 0
+    try:
+        exit_code = main(args) or 0
+    except BudgetExceeded as e:
+        print(f"🛑 {e}")
+    print(f"💰 {budget.report()}")
+    finish_trace(args.trace)
+    sys.exit(exit_code)
\ No newline at end of file
@@ -1,4 +1,4 @@
-import asyncio, re
+import asyncio
 from tqdm import tqdm
 from neo4j import Driver
 from neo4j_graphrag.indexes import create_vector_index, upsert_vectors
@@ -8,51 +8,113 @@ from neo4j_graphrag.experimental.components.resolver import (
     FuzzyMatchResolver,
 )
 
+from utils.graph import InMemoryGraph, NODE_TYPES, SUPERNODE_QUANTILE, SUPERNODE_MIN_DEGREE, plan_graph, diff_graph, diff_summary, supernode_threshold
 from utils.llm import BaseEmbedder
-from utils.utils import load_json_file
+from utils.tracing import tracer, traced
+from utils.utils import load_json_file, save_json
 
 
 # ---------------- ADD ENTITIES TO DB ----------------
-def add_to_database(driver: Driver, dst_path: str, embedder: BaseEmbedder, index_name: str) -> None:
+# Both writers turn the extraction file into its desired graph state (plan_graph) and write only the
+# difference from what the graph already holds (diff_graph). A plain upsert diffs against an empty graph
+# and deletes or overwrites nothing: existing nodes/edges keep their description, and aliases/sources are
+# unioned, as when loading several extraction files into one graph. incremental=True diffs against the
+# stored graph and replaces properties, so facts whose source chunks were edited or removed are deleted
+# and only Forms whose name/aliases changed are re-embedded.
+# "The stored graph" is the plan last applied from this file, kept in <dst>.applied.json: entity
+# resolution rewrites the Neo4j graph after every write, so diffing against it would re-add merged-away
+# nodes on every run. Only without that file (first run) is the live graph read instead. Delete the file
+# whenever the database changes behind its back; --clear and --restore do so.
+# NOTE: the incremental Neo4j path (read_graph_state, remove_*, the applied plan) has only been exercised
+# against the in-memory graph, never against a live Neo4j instance.
+WRITE_BATCH = 1000
+
+@traced("add_to_database")
+def add_to_database(driver: Driver, dst_path: str, embedder: BaseEmbedder, index_name: str, incremental: bool = False) -> None:
     if not (data := load_json_file(dst_path)):
         return
     
     ensure_vector_index(driver, embedder.get_dimension(), index_name)
-    form_ids: list[str] = []
-    form_embs: list[list[float]] = []
+    with tracer.span("ingest.diff", incremental=incremental):
+        desired = plan_graph(data)
+        current = ({}, {})
+        if incremental:
+            current = load_applied_plan(dst_path) or read_graph_state(driver)
+        diff = diff_graph(current, desired, remove=incremental)
+    print(f"🧮 Graph diff: {diff_summary(diff)}")
     
     with driver.session() as session:
-        # Upsert nodes
-        for entity in tqdm(data["entities"], total=len(data["entities"]), desc="⬆️  Upserting entities"):
-            node_id = session.execute_write(create_node, entity)
-            if node_id and entity["type"] == "Form":
-                embed_text = entity['name']
-                if entity.get("aliases"):
-                    embed_text += ". " + ". ".join(entity['aliases'])
-                # embed_text += ". " + entity['description']
-                form_ids.append(node_id)
-                form_embs.append(embedder.embed_query(embed_text))
+        with tracer.span("ingest.remove", edges=len(diff["remove_edges"]), nodes=len(diff["remove_nodes"])):
+            session.execute_write(remove_edges, diff["remove_edges"])
+            session.execute_write(remove_nodes, diff["remove_nodes"])
+        with tracer.span("ingest.nodes", nodes=len(diff["upsert_nodes"])):
+            session.execute_write(upsert_nodes, diff["upsert_nodes"], incremental)
         
-        # Batch upsert vectors for Forms
-        if form_ids:
-            upsert_vectors(
-                driver=driver,
-                ids=form_ids,
-                embedding_property="embedding",
-                embeddings=form_embs,
-                entity_type=EntityType.NODE,
-            )
+        # Batch upsert vectors for new or renamed Forms
+        if diff["embed_nodes"]:
+            with tracer.span("ingest.vectors", vectors=len(diff["embed_nodes"])):
+                form_embs = [embedder.embed(node["embed_text"]) for node in tqdm(diff["embed_nodes"], desc="⬆️  Embedding forms")]
+                form_ids = session.execute_read(form_element_ids, [node["name"] for node in diff["embed_nodes"]])
+                upsert_vectors(
+                    driver=driver,
+                    ids=form_ids,
+                    embedding_property="embedding",
+                    embeddings=form_embs,
+                    entity_type=EntityType.NODE,
+                )
+                session.execute_write(set_embed_hashes, diff["embed_nodes"])
         
-        # Upsert edges
-        for rel in tqdm(data["relations"], total=len(data["relations"]), desc="⬆️  Upserting relationships"):
-            joint_node_id = session.execute_write(create_edges, rel)
+        with tracer.span("ingest.edges", edges=len(diff["upsert_edges"])):
+            session.execute_write(upsert_edges, diff["upsert_edges"], incremental)
     
-    print("🔍 Resolving duplicate entities...")
-    asyncio.run(resolve_duplicates(driver))
+    if incremental and not diff["upsert_nodes"]:
+        print("⏩ No new or changed entities; skipping entity resolution.")
+    else:
+        print("🔍 Resolving duplicate entities...")
+        with tracer.span("ingest.resolve"):
+            asyncio.run(resolve_duplicates(driver))
     
+    with tracer.span("ingest.degree_stats"):
+        compute_degree_stats(driver)
+    save_applied_plan(desired, dst_path)
     print("✅ Database population complete.")
 
 
+@traced("add_to_graph")
+def add_to_graph(graph: InMemoryGraph, dst_path: str, embedder: BaseEmbedder, incremental: bool = False) -> None:
+    # Same ingestion as add_to_database, into the embedded graph (benchmarks, offline demos)
+    if not (data := load_json_file(dst_path)):
+        return
+    with tracer.span("ingest.diff", incremental=incremental):
+        diff = diff_graph(graph.state() if incremental else ({}, {}), plan_graph(data), remove=incremental)
+    with tracer.span("ingest.nodes", nodes=len(diff["upsert_nodes"])):
+        graph.apply({**diff, "upsert_edges": []}, replace=incremental)
+    with tracer.span("ingest.vectors", vectors=len(diff["embed_nodes"])):
+        graph.set_embeddings(
+            [graph.node_index[(node["type"], node["name"])] for node in diff["embed_nodes"]],
+            [embedder.embed(node["embed_text"]) for node in diff["embed_nodes"]],
+            [node["embed_hash"] for node in diff["embed_nodes"]],
+        )
+    with tracer.span("ingest.edges", edges=len(diff["upsert_edges"])):
+        graph.apply({"upsert_nodes": [], "upsert_edges": diff["upsert_edges"], "remove_edges": [], "remove_nodes": []}, replace=incremental)
+    with tracer.span("ingest.degree_stats"):
+        graph.compute_degree_stats()
+
+
+# ---------------- APPLIED PLAN ----------------
+def applied_plan_path(dst_path: str) -> str:
+    return f"{dst_path}.applied.json"
+
+def save_applied_plan(plan: tuple[dict, dict], dst_path: str) -> None:
+    nodes, edges = plan
+    save_json({"nodes": list(nodes.values()), "edges": [[list(key), edge] for key, edge in edges.items()]}, applied_plan_path(dst_path))
+
+def load_applied_plan(dst_path: str) -> tuple[dict, dict] | None:
+    if not (data := load_json_file(applied_plan_path(dst_path))):
+        return None
+    return {(n["type"], n["name"]): n for n in data["nodes"]}, {tuple(key): edge for key, edge in data["edges"]}
+
+
 # ---------------- NEO4J OPERATIONS ----------------
 def ensure_vector_index(driver: Driver, embed_dim: int, index_name: str) -> None:
     create_vector_index(
@@ -64,95 +126,108 @@ def ensure_vector_index(driver: Driver, embed_dim: int, index_name: str) -> None
         similarity_fn="cosine",
     )
 
-def create_node(tx, entity: dict) -> str | None:
-    entity_type = entity["type"]
-    if entity_type not in {"Form", "Concept", "Myth", "JointConcept"}:
-        raise ValueError(f"Unsupported entity type: {entity_type}")
-    
-    query = f"""
-    MERGE (n:{entity_type} {{name: $name}})
-    ON CREATE SET n.description = $description
-    ON MATCH  SET n.description = coalesce(n.description, $description)
-    RETURN elementId(n) AS eid
-    """
-    rec = tx.run(
-        query, 
-        name=sanitize_label(entity["name"]),
-        description=entity["description"],
-    ).single()
-    
-    return rec["eid"]
+def read_graph_state(driver: Driver) -> tuple[dict, dict]:
+    # The stored graph in plan_graph's layout; labels outside NODE_TYPES are ignored
+    nodes, edges = {}, {}
+    with driver.session() as session:
+        for rec in session.run("""
+        MATCH (n) WHERE any(label IN labels(n) WHERE label IN $types)
+        RETURN [label IN labels(n) WHERE label IN $types][0] AS type, n.name AS name,
+               n.description AS description, n.aliases AS aliases, n.sources AS sources, n.embed_hash AS embed_hash
+        """, types=sorted(NODE_TYPES)):
+            nodes[(rec["type"], rec["name"])] = dict(rec)
+        for rec in session.run("""
+        MATCH (a)-[r]->(b)
+        WHERE any(label IN labels(a) WHERE label IN $types) AND any(label IN labels(b) WHERE label IN $types)
+        RETURN [label IN labels(a) WHERE label IN $types][0] AS source_type, a.name AS source, type(r) AS rel_type,
+               [label IN labels(b) WHERE label IN $types][0] AS target_type, b.name AS target,
+               r.description AS description, r.sources AS sources
+        """, types=sorted(NODE_TYPES)):
+            key = (rec["source_type"], rec["source"], rec["rel_type"], rec["target_type"], rec["target"])
+            edges[key] = {"description": rec["description"], "sources": rec["sources"]}
+    return nodes, edges
 
-def create_edges(tx, rel: dict) -> str | None:
-    def run_query(source: str, source_type: str, target: str, target_type: str, rel_type: str) -> None:
-        query = f"""
-        MATCH (a:{source_type} {{name: $source}})
-        MATCH (b:{target_type} {{name: $target}})
+def upsert_nodes(tx, nodes: list[dict], replace: bool = False) -> None:
+    # replace=False keeps an existing description and unions aliases/sources (see above)
+    for label, rows in _group(nodes, lambda n: n["type"]).items():
+        _run_batched(tx, f"""
+        UNWIND $rows AS row
+        MERGE (n:{label} {{name: row.name}})
+        {_set_clause("n", ["aliases", "sources"], replace)}
+        """, [{"name": n["name"], "description": n["description"], "aliases": n["aliases"], "sources": n["sources"]} for n in rows])
+
+def upsert_edges(tx, edges: list[tuple[tuple, dict]], replace: bool = False) -> None:
+    for (source_type, rel_type, target_type), rows in _group(edges, lambda e: (e[0][0], e[0][2], e[0][3])).items():
+        _run_batched(tx, f"""
+        UNWIND $rows AS row
+        MATCH (a:{source_type} {{name: row.source}})
+        MATCH (b:{target_type} {{name: row.target}})
         MERGE (a)-[r:{rel_type}]->(b)
-        ON CREATE SET r.description = $description
-        ON MATCH  SET r.description = coalesce(r.description, $description)
-        RETURN count(a) AS a_count, count(b) AS b_count
-        """
-        result = tx.run(
-            query,
-            source=source,
-            target=target,
-            description=rel.get("description"),
-        ).single()
-        if result["a_count"] == 0 or result["b_count"] == 0:
-            print(f"⚠️ Warning: could not create edge {source}-[{rel_type}]->{target}")
-    
-    rel_type = rel["type"].upper().replace(" ", "_")
-    node_id = None
-
-    if rel_type == "CONNOTES":
-        # Create edge from Form to Concept
-        run_query(
-            source=sanitize_label(rel["source"]),
-            source_type="Form",
-            target=sanitize_label(rel["target"]),
-            target_type="Concept",
-            rel_type=rel_type,
-        )
-    elif rel_type == "GENERATES_MYTH":
-        if len(rel["source_concepts"]) == 1:
-            # Create edge from Concept to Myth
-            run_query(
-                source=sanitize_label(rel["source_concepts"][0]),
-                source_type="Concept",
-                target=sanitize_label(rel["target"]),
-                target_type="Myth",
-                rel_type=rel_type,
-            )
-        else:
-            # Create intermediate JointConcept node
-            joint_concept = {
-                "type": "JointConcept",
-                "name": "+".join(sorted(rel["source_concepts"])),
-                "description": f"Joint form of concepts: {', '.join(rel['source_concepts'])}",
-            }
-            node_id = create_node(tx, joint_concept)
-            # Create edges from Concepts to JointConcept
-            for source in rel["source_concepts"]:
-                run_query(
-                    source=sanitize_label(source),
-                    source_type="Concept",
-                    target=joint_concept["name"],
-                    target_type="JointConcept",
-                    rel_type="PART_OF",
-                )
-            # Create edge from JointConcept to Myth
-            run_query(
-                source=joint_concept["name"],
-                source_type="JointConcept",
-                target=sanitize_label(rel["target"]),
-                target_type="Myth",
-                rel_type=rel_type,
-            )
-    else:
-        raise ValueError(f"Unsupported relationship type: {rel_type}")
-    
-    return node_id
+        {_set_clause("r", ["sources"], replace)}
+        """, [{"source": key[1], "target": key[4], "description": edge["description"], "sources": edge["sources"]} for key, edge in rows])
+
+def remove_edges(tx, keys: list[tuple]) -> None:
+    for (source_type, rel_type, target_type), rows in _group(keys, lambda k: (k[0], k[2], k[3])).items():
+        _run_batched(tx, f"""
+        UNWIND $rows AS row
+        MATCH (:{source_type} {{name: row.source}})-[r:{rel_type}]->(:{target_type} {{name: row.target}})
+        DELETE r
+        """, [{"source": key[1], "target": key[4]} for key in rows])
+
+def remove_nodes(tx, keys: list[tuple[str, str]]) -> None:
+    for label, rows in _group(keys, lambda k: k[0]).items():
+        _run_batched(tx, f"""
+        UNWIND $rows AS row
+        MATCH (n:{label} {{name: row.name}})
+        DETACH DELETE n
+        """, [{"name": key[1]} for key in rows])
+
+def form_element_ids(tx, names: list[str]) -> list[str]:
+    ids = {rec["name"]: rec["eid"] for rec in tx.run("""
+    UNWIND $names AS name
+    MATCH (n:Form {name: name})
+    RETURN name, elementId(n) AS eid
+    """, names=names)}
+    return [ids[name] for name in names]
+
+def set_embed_hashes(tx, nodes: list[dict]) -> None:
+    _run_batched(tx, """
+    UNWIND $rows AS row
+    MATCH (n:Form {name: row.name})
+    SET n.embed_hash = row.embed_hash
+    """, [{"name": n["name"], "embed_hash": n["embed_hash"]} for n in nodes])
+
+def compute_degree_stats(driver: Driver, quantile: float = SUPERNODE_QUANTILE, min_degree: int = SUPERNODE_MIN_DEGREE) -> int:
+    # Stores out_degree/in_degree/supernode on every node for capped expansion (see ExpansionLimits)
+    with driver.session() as session:
+        out_degrees = session.run("""
+        MATCH (n) WHERE any(label IN labels(n) WHERE label IN $types)
+        SET n.out_degree = COUNT { (n)-->() }, n.in_degree = COUNT { (n)<--() }
+        RETURN n.out_degree AS out_degree
+        """, types=sorted(NODE_TYPES)).value()
+        threshold = supernode_threshold(out_degrees, quantile, min_degree)
+        n_supernodes = session.run("""
+        MATCH (n) WHERE any(label IN labels(n) WHERE label IN $types)
+        SET n.supernode = n.out_degree >= $threshold
+        RETURN count(CASE WHEN n.supernode THEN 1 END) AS supernodes
+        """, types=sorted(NODE_TYPES), threshold=threshold).single()["supernodes"]
+    print(f"📊 Degree stats stored; {n_supernodes} supernodes (out-degree ≥ {threshold})")
+    return threshold
+
+def expansion_hotspots(driver: Driver, max_hops: int = 4, top_n: int = 20) -> list[dict]:
+    # Nodes that the most Form→Myth paths (up to max_hops) pass through; full enumeration, run offline
+    with driver.session() as session:
+        return [dict(rec) for rec in session.run(f"""
+        MATCH p = (:Form)-[*1..{int(max_hops)}]->(:Myth)
+        WITH count(p) AS total, collect(p) AS paths
+        UNWIND paths AS p
+        UNWIND nodes(p)[1..-1] AS n
+        WITH total, n, count(*) AS through
+        ORDER BY through DESC LIMIT $top_n
+        RETURN [label IN labels(n) WHERE label IN $types][0] AS type, n.name AS name,
+               n.out_degree AS out_degree, coalesce(n.supernode, false) AS supernode,
+               through AS paths, toFloat(through) / total AS share
+        """, top_n=top_n, types=sorted(NODE_TYPES))]
 
 async def resolve_duplicates(driver: Driver) -> None:
     if not apoc_available(driver):
@@ -162,7 +237,7 @@ async def resolve_duplicates(driver: Driver) -> None:
     exact = SinglePropertyExactMatchResolver(driver=driver)
     await exact.run()
     # Fuzzy match by label and name
-    for label in ["Form", "Concept", "Myth", "JointConcept"]:
+    for label in NODE_TYPES:
         fuzzy = FuzzyMatchResolver(
             driver=driver,
             filter_query=f"WHERE entity:`{label}`",
@@ -187,18 +262,30 @@ def clear_database(driver: Driver) -> None:
 
 
 # ---------------- UTILS ----------------
-def sanitize_label(raw: str) -> str:
-    tokens = re.split(r'[^A-Za-z0-9]+', raw)
-    tokens = [t for t in tokens if t]
-    label = ''.join(t[:1].upper() + t[1:] for t in tokens)
-    if not label or not label[0].isalpha():
-        label = "Entity" + label  # ensure starts with a letter
-    return label
-
 def apoc_available(driver: Driver) -> bool:
     with driver.session() as session:
         try:
             rec = session.run("RETURN apoc.version() AS v").single()
             return rec and rec["v"]
         except Exception:
-            return False
\ No newline at end of file
+            return False
+
+def _set_clause(var: str, lists: list[str], replace: bool) -> str:
+    # SET for description + list properties; replace=False keeps a stored description and unions the lists
+    if replace:
+        props = [f"{var}.description = row.description"] + [f"{var}.{prop} = row.{prop}" for prop in lists]
+    else:
+        props = [f"{var}.description = coalesce({var}.description, row.description)"] + [
+            f"{var}.{prop} = coalesce({var}.{prop}, []) + [x IN row.{prop} WHERE NOT x IN coalesce({var}.{prop}, [])]" for prop in lists
+        ]
+    return "SET " + ", ".join(props)
+
+def _group(items: list, key) -> dict:
+    groups: dict = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+def _run_batched(tx, query: str, rows: list[dict]) -> None:
+    for start in range(0, len(rows), WRITE_BATCH):
+        tx.run(query, rows=rows[start : start + WRITE_BATCH]).consume()
@@ -0,0 +1,148 @@
+import hashlib, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable
+
+from construction.extract_entities import EntityTable, extract_data, load_extraction, contributions_path, entry_id, sidecars
+from utils.ratelimit import budget
+from utils.tracing import traced
+from utils.utils import load_json_file, save_json
+
+
+# ---------------- SHARDED EXTRACTION ----------------
+# Entries from every source file are dealt into `shards` shards by a stable hash of their id, so adding or
+# editing an entry only touches the shard it hashes to, and each shard is extracted by its own worker
+# process with its own model instance:
+#   <shard_dir>/shard_<k>.src.json     the shard's entries; "id" is set to "<file stem>:<index>" when missing,
+#                                      so chunk tags stay unique across files
+#   <shard_dir>/shard_<k>.json         extract_data output, with its .contributions.json / .progress.json /
+#                                      .failed.jsonl sidecars
+# Shards run extract_data(incremental=True): reruns resume from the chunk tags already in each shard
+# output, and a shard whose entries changed only re-extracts new or edited chunks. Workers are
+# spawned (not forked), and each gets 1/workers of the OpenAI rate limits and USD/token budgets, since every
+# process runs its own limiter. merge_shards() then builds the single extraction file for add_to_database.
+# If any shard fails, extract_sharded raises ShardsFailed once every shard has finished, so nothing gets
+# merged from partial results; the finished shards are kept and a rerun picks up the rest.
+class ShardsFailed(RuntimeError):
+    pass
+
+def shard_paths(shard_dir: str, shard: int) -> tuple[str, str]:
+    return os.path.join(shard_dir, f"shard_{shard}.src.json"), os.path.join(shard_dir, f"shard_{shard}.json")
+
+def plan_shards(src_paths: list[str], shards: int) -> list[list[dict]]:
+    planned = [[] for _ in range(shards)]
+    for src_path in src_paths:
+        stem = os.path.splitext(os.path.basename(src_path))[0]
+        for i, entry in enumerate(load_json_file(src_path) or []):
+            entry = {**entry, "id": f"{stem}:{entry_id(entry, i)}"} if not entry.get("id") else entry
+            planned[int(hashlib.sha1(str(entry["id"]).encode("utf-8")).hexdigest()[:8], 16) % shards].append(entry)
+    return planned
+
+@traced("extract_sharded")
+def extract_sharded(model: str | Callable, src_paths: list[str], shard_dir: str, shards: int = 4, workers: int | None = None, chunk_size: int = 512, device: str = "auto", poll_interval: float = 5.0) -> list[str]:
+    # `model` is a registry name, or a picklable zero-argument factory (e.g. functools.partial(FakeLLM, ...)).
+    # device="cpu" hides GPUs from the workers and splits CPU threads between them (LocalLLM on CPU).
+    # Returns the shard output paths; raises ShardsFailed if any shard failed.
+    os.makedirs(shard_dir, exist_ok=True)
+    workers = workers or shards
+    paths = []
+    for k, entries in enumerate(plan_shards(src_paths, shards)):
+        src_path, dst_path = shard_paths(shard_dir, k)
+        if load_json_file(src_path) != entries:
+            save_json(entries, src_path)
+        if not entries:
+            for path in (dst_path, contributions_path(dst_path)):
+                if os.path.exists(path):
+                    os.remove(path)   # extract_data skips an empty source, so nothing would prune it
+        if os.path.exists(progress_path := sidecars(dst_path)[0]):
+            os.remove(progress_path)   # rewritten by this run; only feeds the progress line
+        paths.append((src_path, dst_path, len(entries)))
+    print(f"🧩 {sum(n for *_, n in paths)} entries from {len(src_paths)} files in {shards} shards, {workers} worker processes")
+
+    threads = max(1, (os.cpu_count() or 1) // workers) if device == "cpu" else None
+    worker_usd = budget.max_usd / workers if budget.max_usd is not None else None
+    worker_tokens = budget.max_tokens // workers if budget.max_tokens is not None else None
+    start = time.perf_counter()
+    stats, failed = [], {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(_extract_shard, model, k, src_path, dst_path, chunk_size, device, threads, workers, worker_usd, worker_tokens): k
+            for k, (src_path, dst_path, _) in enumerate(paths)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    stats.append(future.result())
+                except Exception as e:
+                    failed[futures[future]] = f"{type(e).__name__}: {e}"
+                    print(f"❗ Shard {futures[future]} failed: {failed[futures[future]]}")
+            if pending:
+                print(_progress_line(paths, time.perf_counter() - start))
+    _report(sorted(stats, key=lambda s: s["shard"]), time.perf_counter() - start)
+    if failed:
+        raise ShardsFailed(f"{len(failed)}/{shards} shards failed ({', '.join(f'#{k} {error}' for k, error in sorted(failed.items()))})")
+    return [dst_path for _, dst_path, _ in paths]
+
+def _extract_shard(model: str | Callable, shard: int, src_path: str, dst_path: str, chunk_size: int, device: str, threads: int | None, workers: int, max_usd: float | None, max_tokens: int | None) -> dict:
+    # Runs in a fresh worker process: environment first, so it applies before torch is imported
+    if device == "cpu":
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    if threads:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    from utils import ratelimit
+    from utils.registry import registry
+    from utils.tracing import tracer
+    ratelimit.LIMITS = {name: (rpm / workers, tpm / workers) for name, (rpm, tpm) in ratelimit.LIMITS.items()}
+    ratelimit.budget.configure(max_usd, max_tokens)
+    tracer.enable()
+
+    start = time.perf_counter()
+    extract_data(registry.get(model) if isinstance(model, str) else model(), src_path, dst_path, chunk_size, incremental=True)
+    chunks = [span for span in tracer.spans if span.name == "extract.chunk"]
+    return {
+        "shard": shard,
+        "entries": len(load_json_file(src_path) or []),
+        "chunks": len(chunks),
+        "failed": sum(bool(span.attrs.get("failed")) for span in chunks),
+        "chars": sum(span.attrs.get("chars", 0) for span in chunks),
+        "seconds": time.perf_counter() - start,
+        "tokens": ratelimit.budget.used_tokens,
+        "usd": ratelimit.budget.spent_usd,
+    }
+
+def _progress_line(paths: list[tuple[str, str, int]], elapsed: float) -> str:
+    # Entries done per shard, read from the progress sidecars the workers keep up to date
+    done = [len(load_json_file(sidecars(dst_path)[0]) or []) for _, dst_path, _ in paths]
+    shards = "  ".join(f"#{k} {n}/{total}" for k, (n, (*_, total)) in enumerate(zip(done, paths)))
+    return f"⏳ {sum(done)}/{sum(total for *_, total in paths)} entries ({sum(done) / elapsed * 60:.1f}/min)  {shards}"
+
+def _report(stats: list[dict], elapsed: float) -> None:
+    print(f"{'shard':>6s} {'entries':>8s} {'chunks':>7s} {'failed':>7s} {'seconds':>8s} {'chunks/s':>9s} {'chars/s':>9s} {'tokens':>9s} {'usd':>8s}")
+    for s in stats:
+        print(f"{s['shard']:6d} {s['entries']:8d} {s['chunks']:7d} {s['failed']:7d} {s['seconds']:8.1f} "
+              f"{s['chunks'] / max(s['seconds'], 1e-9):9.2f} {s['chars'] / max(s['seconds'], 1e-9):9.0f} {s['tokens']:9d} {s['usd']:8.4f}")
+    chunks = sum(s["chunks"] for s in stats)
+    print(f"{'all':>6s} {sum(s['entries'] for s in stats):8d} {chunks:7d} {sum(s['failed'] for s in stats):7d} {elapsed:8.1f} "
+          f"{chunks / max(elapsed, 1e-9):9.2f} {sum(s['chars'] for s in stats) / max(elapsed, 1e-9):9.0f} "
+          f"{sum(s['tokens'] for s in stats):9d} {sum(s['usd'] for s in stats):8.4f}")
+
+
+# ---------------- MERGE ----------------
+@traced("merge_shards")
+def merge_shards(shard_paths: list[str], dst_path: str) -> dict:
+    # One extraction file from the shard outputs, through the same EntityTable as a single-process run,
+    # so entities extracted in several shards collapse onto their canonical (type, name) entry
+    table = EntityTable()
+    for shard_path in shard_paths:
+        shard = EntityTable(load_extraction(shard_path))
+        for entity in shard.entities.values():
+            table.add_entity(entity)
+        for rel in shard.relations.values():
+            table.add_relation(rel)
+        table.chunks.update(shard.chunks)
+    table.save(dst_path)
+    merged = table.to_data()
+    print(f"🔗 Merged {len(shard_paths)} shards into {dst_path}: {table.mentions['entities']} → {len(table.entities)} entities, "
+          f"{table.mentions['relations']} → {len(table.relations)} relations")
+    return merged
@@ -0,0 +1,148 @@
+import json, os
+import numpy as np
+from neo4j import Driver
+from neo4j_graphrag.indexes import upsert_vectors
+from neo4j_graphrag.types import EntityType
+
+from construction.manage_database import (
+    ensure_vector_index, read_graph_state, upsert_nodes, upsert_edges, form_element_ids, set_embed_hashes, compute_degree_stats,
+)
+from utils.graph import InMemoryGraph, EdgeKey
+from utils.tracing import tracer, traced
+from utils.utils import load_table_file, write_table_file, _import_pyarrow
+
+
+# ---------------- SNAPSHOT FORMAT ----------------
+# A snapshot is a directory:
+#   nodes.arrow       type, name, description, aliases, sources, embed_hash, embedding_row (-1 = none)
+#   edges.arrow       source_row, type, target_row, description, sources (rows index nodes.arrow)
+#   embeddings.npy    float32 [n_embedded, dim], row i = Form with embedding_row i
+#   manifest.json     counts, dimension, format version
+# Arrow IPC is written uncompressed so restores can memory-map it; the matrix loads with np.load(mmap_mode="r").
+SNAPSHOT_VERSION = 1
+
+@traced("write_snapshot")
+def write_snapshot(state: tuple[dict, dict], embeddings: dict[tuple[str, str], list[float]], snap_dir: str) -> dict:
+    pa, _ = _import_pyarrow()
+    nodes, edges = state
+    os.makedirs(snap_dir, exist_ok=True)
+
+    keys = list(nodes)
+    rows = {key: i for i, key in enumerate(keys)}
+    embedded = [key for key in keys if key in embeddings]
+    embedding_rows = {key: i for i, key in enumerate(embedded)}
+    matrix = np.asarray([embeddings[key] for key in embedded], dtype=np.float32).reshape(len(embedded), -1)
+
+    write_table_file(pa.table({
+        "type":          [key[0] for key in keys],
+        "name":          [key[1] for key in keys],
+        "description":   [nodes[key].get("description") for key in keys],
+        "aliases":       pa.array([list(nodes[key].get("aliases") or []) for key in keys], pa.list_(pa.string())),
+        "sources":       pa.array([list(nodes[key].get("sources") or []) for key in keys], pa.list_(pa.string())),
+        "embed_hash":    pa.array([nodes[key].get("embed_hash") for key in keys], pa.string()),
+        "embedding_row": pa.array([embedding_rows.get(key, -1) for key in keys], pa.int32()),
+    }), os.path.join(snap_dir, "nodes.arrow"))
+    write_table_file(pa.table({
+        "source_row":  pa.array([rows[key[:2]] for key in edges], pa.int32()),
+        "type":        [key[2] for key in edges],
+        "target_row":  pa.array([rows[key[3:]] for key in edges], pa.int32()),
+        "description": pa.array([edge.get("description") for edge in edges.values()], pa.string()),
+        "sources":     pa.array([list(edge.get("sources") or []) for edge in edges.values()], pa.list_(pa.string())),
+    }), os.path.join(snap_dir, "edges.arrow"))
+    np.save(os.path.join(snap_dir, "embeddings.npy"), matrix)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "nodes": len(keys),
+        "edges": len(edges),
+        "embeddings": len(embedded),
+        "dimension": int(matrix.shape[1]) if len(embedded) else 0,
+    }
+    with open(os.path.join(snap_dir, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+    print(f"📦 Snapshot written to {snap_dir}: {manifest['nodes']} nodes, {manifest['edges']} edges, {manifest['embeddings']} vectors")
+    return manifest
+
+@traced("read_snapshot")
+def read_snapshot(snap_dir: str) -> tuple[tuple[dict, dict], dict[tuple[str, str], int], np.ndarray, dict]:
+    # Returns (state in plan_graph layout, {node key: embedding row}, embedding matrix, manifest)
+    with open(os.path.join(snap_dir, "manifest.json"), encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest["version"] != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest['version']}")
+    node_table = load_table_file(os.path.join(snap_dir, "nodes.arrow")).to_pydict()
+    edge_table = load_table_file(os.path.join(snap_dir, "edges.arrow")).to_pydict()
+    matrix = np.load(os.path.join(snap_dir, "embeddings.npy"), mmap_mode="r")
+
+    keys = list(zip(node_table["type"], node_table["name"]))
+    nodes = {
+        key: {"type": key[0], "name": key[1], "description": description, "aliases": aliases, "sources": sources, "embed_hash": embed_hash}
+        for key, description, aliases, sources, embed_hash in zip(
+            keys, node_table["description"], node_table["aliases"], node_table["sources"], node_table["embed_hash"],
+        )
+    }
+    edges: dict[EdgeKey, dict] = {
+        (*keys[source], rel_type, *keys[target]): {"description": description, "sources": sources}
+        for source, rel_type, target, description, sources in zip(
+            edge_table["source_row"], edge_table["type"], edge_table["target_row"], edge_table["description"], edge_table["sources"],
+        )
+    }
+    embedding_rows = {key: row for key, row in zip(keys, node_table["embedding_row"]) if row >= 0}
+    return (nodes, edges), embedding_rows, matrix, manifest
+
+
+# ---------------- NEO4J ----------------
+def export_database(driver: Driver, snap_dir: str) -> dict:
+    with tracer.span("snapshot.read_neo4j"):
+        state = read_graph_state(driver)
+        with driver.session() as session:
+            embeddings = {
+                ("Form", rec["name"]): rec["embedding"]
+                for rec in session.run("MATCH (n:Form) WHERE n.embedding IS NOT NULL RETURN n.name AS name, n.embedding AS embedding")
+            }
+    return write_snapshot(state, embeddings, snap_dir)
+
+@traced("restore_database")
+def restore_database(driver: Driver, snap_dir: str, index_name: str) -> None:
+    # Bulk load into an empty database: batched UNWIND writes, stored vectors instead of embedding calls
+    (nodes, edges), embedding_rows, matrix, manifest = read_snapshot(snap_dir)
+    if manifest["dimension"]:
+        ensure_vector_index(driver, manifest["dimension"], index_name)
+    forms = [nodes[key] for key in embedding_rows]
+    with driver.session() as session:
+        with tracer.span("ingest.nodes", nodes=len(nodes)):
+            session.execute_write(upsert_nodes, list(nodes.values()))
+        if forms:
+            with tracer.span("ingest.vectors", vectors=len(forms)):
+                upsert_vectors(
+                    driver=driver,
+                    ids=session.execute_read(form_element_ids, [node["name"] for node in forms]),
+                    embedding_property="embedding",
+                    embeddings=matrix[list(embedding_rows.values())].tolist(),
+                    entity_type=EntityType.NODE,
+                )
+                session.execute_write(set_embed_hashes, [node for node in forms if node["embed_hash"]])
+        with tracer.span("ingest.edges", edges=len(edges)):
+            session.execute_write(upsert_edges, list(edges.items()))
+    compute_degree_stats(driver)
+    print(f"✅ Restored {manifest['nodes']} nodes, {manifest['edges']} edges, {manifest['embeddings']} vectors.")
+
+
+# ---------------- IN-MEMORY GRAPH ----------------
+def export_graph(graph: InMemoryGraph, snap_dir: str) -> dict:
+    nodes, edges = graph.state()
+    embeddings = {key: graph.embeddings[graph.node_index[key]] for key in nodes if graph.node_index[key] in graph.embeddings}
+    return write_snapshot((nodes, edges), embeddings, snap_dir)
+
+@traced("restore_graph")
+def restore_graph(snap_dir: str) -> InMemoryGraph:
+    (nodes, edges), embedding_rows, matrix, _ = read_snapshot(snap_dir)
+    graph = InMemoryGraph()
+    graph.apply({"upsert_nodes": list(nodes.values()), "upsert_edges": list(edges.items()), "remove_edges": [], "remove_nodes": []})
+    graph.set_embeddings(
+        [graph.node_index[key] for key in embedding_rows],
+        np.asarray(matrix[list(embedding_rows.values())]),
+        [nodes[key]["embed_hash"] for key in embedding_rows],
+    )
+    graph.compute_degree_stats()
+    return graph
@@ -1,7 +1,10 @@
 python -m dataset.main \
     --create \
     --save_dir ../example/dataset/
+# --stream \
+# --batch_size 64 \
+# --require_labels meaning composition \
 # --encykorea \
 # --heritage \
 # --emuseum \
-# --encykorea_file ../example/encykorea_artworks.csv
\ No newline at end of file
+# --encykorea_file ../example/encykorea_artworks.csv
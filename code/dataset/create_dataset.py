@@ -1,24 +1,28 @@
-import json, nltk, re
+import json
+from typing import Callable, Iterable, Iterator
 from tqdm import tqdm
 
+from dataset.prefilter import PrefilterEngine
 from utils.llm import BaseClassifier
-from utils.utils import load_json_file
+from utils.sentences import SentenceCache, split_batch
+from utils.utils import load_json_file, iter_json_items
 
 
 # ---------------- CREATE DATASET ----------------
-def create_dataset(src_paths: list[str], dst_path: str, classifier: BaseClassifier) -> None:
+def create_dataset(src_paths: list[str], dst_path: str, classifier: BaseClassifier, prefilter: PrefilterEngine | None = None, sent_cache: SentenceCache | None = None) -> None:
+    prefilter = prefilter or PrefilterEngine()
     idx = 1
+    if not (dataset := load_json_file(dst_path)):
+        dataset = {}
     for src_path in src_paths:
         if not (fetched := load_json_file(src_path)):
             print(f"❗ File {src_path} is not valid JSON.")
             continue
-        if not (dataset := load_json_file(dst_path)):
-            dataset = {}
 
         for key, item in tqdm(fetched.items(), total=len(fetched), desc=f"Creating dataset from {src_path}"):
             if not(sents := item.get("sentences")):
-                sents = nltk.sent_tokenize(item.get("desc"))
-            sents_new = _get_sents_analyzed(sents, classifier)
+                sents = split_batch([item.get("desc")], sent_cache)[0]
+            sents_new = _get_sents_analyzed(sents, classifier, prefilter)
             if not sents_new:
                 continue
             dataset[idx] = {
@@ -29,8 +33,97 @@ def create_dataset(src_paths: list[str], dst_path: str, classifier: BaseClassifi
             }
             idx += 1
 
-        with open(dst_path, "w", encoding="utf-8") as dst_file:
-            json.dump(dataset, dst_file, ensure_ascii=False, indent=4)
+    with open(dst_path, "w", encoding="utf-8") as dst_file:
+        json.dump(dataset, dst_file, ensure_ascii=False, indent=4)
+    print(f"🧹 {prefilter.report()}")
+
+
+# ---------------- STREAM DATASET ----------------
+Stage = Callable[[Iterable[dict]], Iterator[dict]]
+
+def stream_dataset(src_paths: list[str], dst_path: str, classifier: BaseClassifier, batch_size: int = 64, stages: list[Stage] | None = None, prefilter: PrefilterEngine | None = None, sent_cache: SentenceCache | None = None) -> None:
+    # read → split → prefilter+classify → [stages] → JSONL, holding at most one batch in memory
+    prefilter = prefilter or PrefilterEngine()
+    records = read_records(src_paths)
+    records = split_records(records, sent_cache, batch_size)
+    records = classify_records(records, classifier, batch_size, prefilter)
+    for stage in stages or []:
+        records = stage(records)
+
+    with open(dst_path, "w", encoding="utf-8") as dst_file:
+        for idx, record in enumerate(tqdm(records, desc="Streaming dataset", unit="item"), 1):
+            dst_file.write(json.dumps({"id": idx, **record}, ensure_ascii=False) + "\n")
+    print(f"🧹 {prefilter.report()}")
+
+def read_records(src_paths: list[str]) -> Iterator[dict]:
+    for src_path in src_paths:
+        try:
+            for key, item in iter_json_items(src_path):
+                yield {"source": src_path, "key": key, **item}
+        except (OSError, ValueError) as e:
+            print(f"❗ File {src_path} could not be streamed: {e}")
+
+def split_records(records: Iterable[dict], sent_cache: SentenceCache | None = None, batch_size: int = 64) -> Iterator[dict]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from _split_batch(batch, sent_cache)
+            batch = []
+    if batch:
+        yield from _split_batch(batch, sent_cache)
+
+def classify_records(records: Iterable[dict], classifier: BaseClassifier, batch_size: int = 64, prefilter: PrefilterEngine | None = None) -> Iterator[dict]:
+    # Groups items until their sentences fill one classifier batch
+    prefilter = prefilter or PrefilterEngine()
+    batch, n_sents = [], 0
+    for record in records:
+        batch.append(record)
+        n_sents += len(record["sentences"])
+        if n_sents >= batch_size:
+            yield from _classify_batch(batch, classifier, prefilter)
+            batch, n_sents = [], 0
+    if batch:
+        yield from _classify_batch(batch, classifier, prefilter)
+
+def filter_by_labels(required: tuple[str, ...] = ("meaning", "composition")) -> Stage:
+    # Keeps items where every required label is the top label of at least one sentence
+    required = tuple(required)
+    def stage(records: Iterable[dict]) -> Iterator[dict]:
+        for record in records:
+            if has_labels(record, required):
+                yield record
+    return stage
+
+def has_labels(item: dict, required: tuple[str, ...]) -> bool:
+    top_labels = {sent["labels"][0] for sent in item["sentences"] if sent.get("labels")}
+    return all(label in top_labels for label in required)
+
+def _split_batch(batch: list[dict], sent_cache: SentenceCache | None) -> list[dict]:
+    todo = [record for record in batch if not record.get("sentences")]
+    for record, sents in zip(todo, split_batch([record.get("desc") for record in todo], sent_cache)):
+        record["sentences"] = sents
+    return batch
+
+def _classify_batch(batch: list[dict], classifier: BaseClassifier, prefilter: PrefilterEngine) -> Iterator[dict]:
+    flat = [sent for record in batch for sent in record["sentences"]]
+    keep = iter(prefilter.filter(flat))
+    kept = [[sent for sent in record["sentences"] if next(keep)] for record in batch]
+    flat = [sent for sents in kept for sent in sents]
+    results = _classify(flat, classifier) if flat else []
+
+    offset = 0
+    for record, sents in zip(batch, kept):
+        sents_new = results[offset : offset + len(sents)]
+        offset += len(sents)
+        if not sents_new:
+            continue
+        yield {
+            "title":     record.get("title"),
+            "image":     record.get("image"),
+            "era":       record.get("era"),
+            "sentences": sents_new,
+        }
 
 
 # ---------------- CLASSIFY SENTENCES ----------------
@@ -42,22 +135,15 @@ candidate_labels = [
     "physical metadata",            # x
 ]
 
-META_RE = re.compile(r"(제목|작품명|작가|소장|전시|출처|제작연도|연도|기증)", re.IGNORECASE)
-SIZE_RE = re.compile(r"(센티|cm|밀리|가로|세로|높이|길이|크기)", re.IGNORECASE)
-
-def _is_obvious_non_symbolic(sent: str, min_chars: int=12, min_tokens: int=3) -> bool:
-    # if len(re.findall(r'[가-힣]', sent)) < min_chars:
-    #     return True
-    if len(sent.split()) < min_tokens:
-        return True
-    if META_RE.search(sent): return True
-    if SIZE_RE.search(sent): return True
-    return False
+def _get_sents_analyzed(sents: str | list[str], classifier: BaseClassifier, prefilter: PrefilterEngine) -> list[str]:
+    sents = [sent for sent, keep in zip(sents, prefilter.filter(sents)) if keep]
+    return _classify(sents, classifier)
 
-def _get_sents_analyzed(sents: str | list[str], classifier: BaseClassifier) -> list[str]:
-    sents = [sent for sent in sents if not _is_obvious_non_symbolic(sent)]
+def _classify(sents: list[str], classifier: BaseClassifier) -> list[dict]:
     template = "This text is about {} of an artwork."
     results = classifier.classify(sents, candidate_labels, template)
+    if isinstance(results, dict):  # pipeline unwraps single-sequence inputs
+        results = [results]
 
     good_sents = []
     for result in results:
@@ -69,4 +155,4 @@ def _get_sents_analyzed(sents: str | list[str], classifier: BaseClassifier) -> l
             "labels": simple_labels,
             "scores": [round(score, 10) for score in result["scores"]],
         })
-    return good_sents
\ No newline at end of file
+    return good_sents
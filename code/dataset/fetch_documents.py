@@ -1,11 +1,13 @@
 import json, os, requests, time, pandas as pd
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from dataset.parse_emuseum import parse_emuseum_pages
+from utils.tracing import tracer, traced
 from utils.utils import load_json_file
 
 
 # ---------------- FETCH FROM ENCYKOREA ----------------
+@traced("fetch.encykorea")
 def fetch_from_encykorea(labels_path: str, save_dir: str, api_key: str, endpoint_url: str) -> None:
     if labels_path.endswith(".csv"):
         df = pd.read_csv(labels_path, header=None, dtype=str, encoding="utf-8")
@@ -34,7 +36,9 @@ def fetch_from_encykorea(labels_path: str, save_dir: str, api_key: str, endpoint
         )
         if eid is None:
             continue
-        response = requests.get(url=endpoint_url+eid, headers=headers, timeout=30)
+        with tracer.span("fetch.request") as span:
+            response = requests.get(url=endpoint_url+eid, headers=headers, timeout=30)
+            span.add(bytes=len(response.content))
         data = response.json()
         
         if not (article := data.get("article")):
@@ -57,6 +61,7 @@ def fetch_from_encykorea(labels_path: str, save_dir: str, api_key: str, endpoint
 
 
 # ---------------- FETCH FROM HERITAGE ----------------
+@traced("fetch.heritage")
 def fetch_from_heritage(save_dir: str, search_url: str, detail_url: str) -> None:
     ccbaKdcd = ""  # TODO
     page_unit = 10000
@@ -128,58 +133,15 @@ def fetch_from_heritage(save_dir: str, search_url: str, detail_url: str) -> None
 
 
 # ---------------- FETCH FROM EMUSEUM ----------------
-def fetch_from_emuseum(save_dir: str, webpage_url: str, endpoint_url: str, api_key: str) -> None:
-    # --- Fetch items ---
-    total = 1836
-    page_idx = 0
-    items = {}
-    pbar1 = tqdm(total=total, desc="Fetching relic ids")
+@traced("fetch.emuseum")
+def fetch_from_emuseum(save_dir: str, webpage_url: str, endpoint_url: str, api_key: str, workers: int | None = None) -> None:
+    # --- Spool relic pages (network only) ---
+    html_dir = os.path.join(save_dir, "html_emuseum")
+    spool_emuseum_pages(html_dir, webpage_url)
 
-    while page_idx <= total:
-        pbar1.update(1)
-        page_idx += 1
-        web_params = {
-            "pageNum":    page_idx,                             # 페이지 번호
-            "sort":       "relicId",                            # 소장품 번호 순
-            "detailFlag": "true",                               # 
-            "facet3Lv1":  "PS06001",                            # 국가 코드 ("한국")
-            "facet5Lv1":  "PS09009",                            # 용도 분류 코드 ("문화예술")
-            "facet5Lv2":  "PS09009003",                         # 용도 분류 코드 ("서화")
-            "facet5Lv3":  "PS09009003002",                      # 용도 분류 코드 ("회화")
-            "facet5Lv4":  "PS09009003002002",                   # 용도 분류 코드 ("민화")
-        }
-        if not (soup := fetch_html(webpage_url, web_params)):
-            break
-        
-        if (tag := soup.find("input", {"name": "relicId"})):
-            relic_id = tag["value"]
-        else:
-            continue
+    # --- Parse relic pages (process pool) ---
+    items = parse_emuseum_pages(html_dir, workers)
 
-        if (desc_tag := soup.find("span", class_="float-left wc110 lh35 mt3")):
-            desc_raw = desc_tag.get_text(separator="\n", strip=True)
-            desc = ". ".join([line.lstrip("- ").strip(". ") for line in desc_raw.split("\n")]) + "."
-        else:
-            continue
-
-        if (tit_tag := soup.find("p", id="relicTitle")):
-            title = tit_tag.get_text(strip=True)
-        else:
-            title = None
-
-        if (era_tag := soup.find("em", string="국적/시대")):
-            era_raw = era_tag.find_next("span").get_text(strip=True)
-            era = era_raw.split("-")[-1].strip()
-        else:
-            era = None
-        
-        items[relic_id] ={
-            "title": title,
-            "era":   era,
-            "desc":  desc,
-        }
-    pbar1.close()
-    
     # --- Fetch images ---
     img_dir = os.path.join(save_dir, "images_emuseum")
     if not os.path.exists(img_dir):
@@ -241,6 +203,34 @@ def fetch_from_emuseum(save_dir: str, webpage_url: str, endpoint_url: str, api_k
         json.dump(fetched, dst_file, ensure_ascii=False, indent=4)
 
 
+@traced("fetch.spool_emuseum")
+def spool_emuseum_pages(html_dir: str, webpage_url: str, total: int = 1836) -> None:
+    # Raw pages are written as-is so parsing can run separately (and reruns skip finished pages)
+    if not os.path.exists(html_dir):
+        os.makedirs(html_dir)
+
+    for page_idx in tqdm(range(1, total + 1), desc="Fetching relic pages"):
+        page_path = os.path.join(html_dir, f"page_{page_idx:05d}.html")
+        if os.path.exists(page_path):
+            continue
+        web_params = {
+            "pageNum":    page_idx,                             # 페이지 번호
+            "sort":       "relicId",                            # 소장품 번호 순
+            "detailFlag": "true",                               # 
+            "facet3Lv1":  "PS06001",                            # 국가 코드 ("한국")
+            "facet5Lv1":  "PS09009",                            # 용도 분류 코드 ("문화예술")
+            "facet5Lv2":  "PS09009003",                         # 용도 분류 코드 ("서화")
+            "facet5Lv3":  "PS09009003002",                      # 용도 분류 코드 ("회화")
+            "facet5Lv4":  "PS09009003002002",                   # 용도 분류 코드 ("민화")
+        }
+        if not (html := fetch_text(webpage_url, web_params)):
+            break
+        # Write to a temp name first so an interrupted run never leaves a partial page behind
+        with open(page_path + ".part", "w", encoding="utf-8") as html_file:
+            html_file.write(html)
+        os.replace(page_path + ".part", page_path)
+
+
 # ---------------- UTILS ----------------
 def get_eid_from_row(row: list, include: list[str] = [], exclude: list[str] = []) -> str:
     url = str(row[1])
@@ -256,7 +246,9 @@ def fetch_json(url: str, params: dict, max_attempts: int=5, delay: float=1.0) ->
     headers = {"Accept": "application/json"}
     for attempt in range(1, max_attempts + 1):
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=30)
+            with tracer.span("fetch.request") as span:
+                response = requests.get(url, params=params, headers=headers, timeout=30)
+                span.add(bytes=len(response.content))
             # --- Try parsing JSON ---
             try:
                 data = response.json()
@@ -272,19 +264,15 @@ def fetch_json(url: str, params: dict, max_attempts: int=5, delay: float=1.0) ->
 
     raise RuntimeError("Failed to fetch valid JSON after multiple attempts")
 
-def fetch_html(url: str, params: dict, max_attempts: int=5, delay: float=1.0) -> dict | None:
+def fetch_text(url: str, params: dict, max_attempts: int=5, delay: float=1.0) -> str | None:
     for attempt in range(1, max_attempts + 1):
         try:
-            response = requests.get(url, params=params, timeout=30)
-            # --- Try parsing HTML ---
-            try:
-                soup = BeautifulSoup(response.text, "html.parser")
-            except ValueError:
-                print(f"[WARN] HTML parse failure (attempt {attempt}/{max_attempts})")
-                time.sleep(delay)
-                continue
+            with tracer.span("fetch.request") as span:
+                response = requests.get(url, params=params, timeout=30)
+                span.add(bytes=len(response.content))
+            response.raise_for_status()
             # --- Success ---
-            return soup
+            return response.text
         except Exception as e:
             print(f"[ERROR] Request failed (attempt {attempt}/{max_attempts}): {e}")
             time.sleep(delay)
@@ -294,7 +282,9 @@ def fetch_html(url: str, params: dict, max_attempts: int=5, delay: float=1.0) ->
 def download_img(url: str, save_dir: dict, save_name: str, max_attempts: int=5, delay: float=1.0) -> str | None:
     for attempt in range(1, max_attempts + 1):
         try:
-            response = requests.get(url, timeout=30)
+            with tracer.span("fetch.image") as span:
+                response = requests.get(url, timeout=30)
+                span.add(bytes=len(response.content))
             path = os.path.join(save_dir, f"{save_name}.jpg")
             with open(path, "wb") as f:
                 f.write(response.content)
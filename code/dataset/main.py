@@ -1,9 +1,8 @@
 import argparse, os
 from dotenv import load_dotenv
 
-from dataset.fetch_documents import fetch_from_encykorea, fetch_from_heritage, fetch_from_emuseum
-from dataset.create_dataset import create_dataset
-from utils.llm import LocalClassifier
+from utils.registry import registry
+from utils.tracing import tracer, finish_trace
 
 
 # ---------------- MAIN ----------------
@@ -12,6 +11,7 @@ def main(args):
 
     # --- FETCH DATA FROM SOURCES ---
     if args.encykorea or args.heritage or args.emuseum:  # or args.folkency
+        from dataset.fetch_documents import fetch_from_encykorea, fetch_from_heritage, fetch_from_emuseum
         if args.encykorea:
             print("🔄 Fetching data from EncyKorea...")
             fetch_from_encykorea(
@@ -34,36 +34,77 @@ def main(args):
                 os.getenv("EMUSEUM_WEBPAGE_URL"),
                 os.getenv("DATA_ENDPOINT_SEARCH"),
                 os.getenv("DATA_API_KEY"),
+                args.workers,
             )
         print("✅ Data fetching complete.")
     
     # --- CREATE DATASET FROM FETCHED DATA ---
     if args.create:
+        from dataset.create_dataset import create_dataset, stream_dataset, filter_by_labels
+        from dataset.prefilter import PrefilterEngine
+        from utils.sentences import SentenceCache
+
         file_paths = []
         for filename in os.listdir(args.save_dir):
-            if filename.startswith("fetched_emuseum") and filename.endswith(".json"):
+            if filename.startswith("fetched_emuseum") and filename.endswith((".json", ".jsonl")):
                 file_path = os.path.join(args.save_dir, filename)
                 file_paths.append(file_path)
         if not file_paths:
             print("No JSON file starting with 'fetched_' found.")
             return
         
-        # classifier = LocalClassifier(model="joeddav/xlm-roberta-large-xnli")
-        classifier = LocalClassifier(model="MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7")
-        save_path = os.path.join(args.save_dir, "dataset.json")
+        # classifier = registry.lazy("xlm-roberta-xnli")
+        classifier = registry.lazy("mdeberta-xnli")
+
+        prefilter = PrefilterEngine(min_tokens=args.min_tokens, min_chars=args.min_chars, dedupe=args.dedupe)
+
+        sent_cache = SentenceCache(args.sent_cache or os.path.join(args.save_dir, "sentences.cache"))
 
         print("🔄 Parsing fetched data to create dataset...")
-        create_dataset(file_paths, save_path, classifier)
+        with sent_cache:
+            if args.stream:
+                save_path = os.path.join(args.save_dir, "dataset.jsonl")
+                stages = [filter_by_labels(args.require_labels)] if args.require_labels else []
+                stream_dataset(file_paths, save_path, classifier, args.batch_size, stages, prefilter, sent_cache)
+            else:
+                save_path = os.path.join(args.save_dir, "dataset.json")
+                create_dataset(file_paths, save_path, classifier, prefilter, sent_cache)
+        print(f"✂️  Sentence cache: {sent_cache.hits} hits, {sent_cache.misses} misses")
         print("✅ Dataset created.")
 
+    # --- CONVERT JSON ARTEFACTS TO COLUMNAR STORAGE ---
+    if args.convert:
+        from utils.utils import convert_json_to_table
+        for filename in sorted(os.listdir(args.save_dir)):
+            if filename.startswith(("fetched_", "dataset")) and filename.endswith(".json"):
+                src_path = os.path.join(args.save_dir, filename)
+                dst_path = os.path.splitext(src_path)[0] + f".{args.table_format}"
+                convert_json_to_table(src_path, dst_path)
+                print(f"🔄 Converted {src_path} → {dst_path}")
+        print("✅ Conversion complete.")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Data Fetching from Open Sources")
     parser.add_argument("--encykorea", action="store_true")
     parser.add_argument("--heritage", action="store_true")
     parser.add_argument("--emuseum", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)   # eMuseum page parsing processes
     parser.add_argument("--create", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--sent_cache", type=str, default=None)  # defaults to <save_dir>/sentences.cache
+    parser.add_argument("--min_tokens", type=int, default=3)
+    parser.add_argument("--min_chars", type=int, default=0)      # minimum Hangul characters
+    parser.add_argument("--dedupe", action="store_true")         # MinHash near-duplicate removal
+    parser.add_argument("--require_labels", type=str, nargs="*", default=None)   # e.g. meaning composition
+    parser.add_argument("--convert", action="store_true")
+    parser.add_argument("--table_format", type=str, default="parquet", choices=["parquet", "arrow"])
     parser.add_argument("--save_dir", type=str, default="../example/dataset/")
     parser.add_argument("--encykorea_file", type=str, default=None)  # For EncyKorea only
+    parser.add_argument("--trace", type=str, default=None)     # .json (Chrome trace) or .jsonl
     args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    if args.trace:
+        tracer.enable()
+    main(args)
+    finish_trace(args.trace)
\ No newline at end of file
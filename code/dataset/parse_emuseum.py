@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+
+# ---------------- PARSE SPOOLED PAGES ----------------
+def parse_emuseum_pages(html_dir: str, workers: int | None = None, parser: str | None = None) -> dict:
+    # Parses spooled eMuseum pages in a process pool; later pages win on duplicate relicIds,
+    # matching the order in which the crawl used to fill `items`.
+    parser = parser or pick_parser()
+    paths = sorted(os.path.join(html_dir, name) for name in os.listdir(html_dir) if name.endswith(".html"))
+    items = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(parse_emuseum_file, paths, [parser] * len(paths), chunksize=16)
+        for result in tqdm(results, total=len(paths), desc=f"Parsing relic pages ({parser})"):
+            if result is None:
+                continue
+            relic_id, item = result
+            items[relic_id] = item
+    return items
+
+def parse_emuseum_file(path: str, parser: str = "html.parser") -> tuple[str, dict] | None:
+    with open(path, "r", encoding="utf-8") as html_file:
+        return parse_emuseum_page(html_file.read(), parser)
+
+def parse_emuseum_page(html: str, parser: str = "html.parser") -> tuple[str, dict] | None:
+    if parser == "selectolax":
+        fields = _extract_selectolax(html)
+    else:
+        fields = _extract_bs4(html, parser)
+    if fields is None:
+        return None
+
+    relic_id, desc_raw, title, era_raw = fields
+    lines = [line for line in desc_raw.split("\n") if line]
+    desc = ". ".join([line.lstrip("- ").strip(". ") for line in lines]) + "."
+    era = era_raw.split("-")[-1].strip() if era_raw is not None else None
+    return relic_id, {
+        "title": title,
+        "era":   era,
+        "desc":  desc,
+    }
+
+def pick_parser() -> str:
+    # Fastest available backend: selectolax (lexbor) > BeautifulSoup+lxml > BeautifulSoup+html.parser
+    try:
+        import selectolax.lexbor
+        return "selectolax"
+    except ImportError:
+        pass
+    try:
+        import lxml
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+# ---------------- EXTRACTION RULES ----------------
+# Each backend returns (relicId, raw description text, title, raw era text) or None
+
+def _extract_bs4(html: str, parser: str) -> tuple | None:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, parser)
+
+    if not (tag := soup.find("input", {"name": "relicId"})):
+        return None
+    if not (desc_tag := soup.find("span", class_="float-left wc110 lh35 mt3")):
+        return None
+    tit_tag = soup.find("p", id="relicTitle")
+    era_tag = soup.find("em", string="국적/시대")
+    era_span = era_tag.find_next("span") if era_tag else None
+
+    return (
+        tag["value"],
+        desc_tag.get_text(separator="\n", strip=True),
+        tit_tag.get_text(strip=True) if tit_tag else None,
+        era_span.get_text(strip=True) if era_span else None,
+    )
+
+def _extract_selectolax(html: str) -> tuple | None:
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(html)
+
+    if not (tag := tree.css_first('input[name="relicId"]')):
+        return None
+    if not (desc_tag := tree.css_first('span[class="float-left wc110 lh35 mt3"]')):
+        return None
+    tit_tag = tree.css_first("p#relicTitle")
+
+    # Same semantics as bs4's find_next: first <span> after the label in document order
+    era_span, seen_label = None, False
+    for node in tree.root.traverse():
+        if not seen_label:
+            seen_label = node.tag == "em" and node.text() == "국적/시대"
+        elif node.tag == "span":
+            era_span = node
+            break
+
+    return (
+        tag.attributes.get("value"),
+        desc_tag.text(separator="\n", strip=True),
+        tit_tag.text(strip=True) if tit_tag else None,
+        era_span.text(strip=True) if era_span else None,
+    )
@@ -0,0 +1,119 @@
+import re, zlib
+import numpy as np
+from collections import Counter
+
+
+# ---------------- RULES ----------------
+META_TERMS = ["제목", "작품명", "작가", "소장", "전시", "출처", "제작연도", "연도", "기증"]
+SIZE_TERMS = ["센티", "cm", "밀리", "가로", "세로", "높이", "길이", "크기"]
+
+HANGUL_RE = re.compile(r"[가-힣]")
+_PRIME = (1 << 31) - 1
+_SEP = "\x00"
+
+
+# ---------------- PREFILTER ENGINE ----------------
+class PrefilterEngine:
+    # Drops sentences that are obviously not worth sending to the NLI classifier.
+    # Rules run over a whole batch at once: one combined keyword regex over the joined batch,
+    # array length thresholds, and MinHash/LSH near-duplicate detection across artworks.
+    def __init__(
+        self,
+        rules: dict[str, list[str]] | None = None,
+        min_tokens: int = 3,
+        min_chars: int = 0,
+        dedupe: bool = False,
+        dedupe_threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 0,
+    ):
+        self.rules = rules or {"meta": META_TERMS, "size": SIZE_TERMS}
+        self.reasons = ["min_tokens", "min_chars", *self.rules, "duplicate"]
+        # Single alternation (longest terms first) with one named group per rule
+        self.pattern = re.compile("|".join(
+            f"(?P<{name}>{'|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True))})"
+            for name, terms in self.rules.items()
+        ), re.IGNORECASE)
+        self.min_tokens = min_tokens
+        self.min_chars = min_chars
+
+        self.dedupe = dedupe
+        self.dedupe_threshold = dedupe_threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.perm_b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.buckets: dict[tuple[int, bytes], int] = {}
+        self.signatures: list[np.ndarray] = []
+
+        self.stats = Counter()
+
+    def filter(self, sents: list[str]) -> list[bool]:
+        # Returns a keep-mask aligned with `sents`
+        n = len(sents)
+        if n == 0:
+            return []
+        reason = np.zeros(n, dtype=np.int8)  # 0 = keep, else 1 + index into self.reasons
+
+        tokens = np.fromiter((len(sent.split()) for sent in sents), dtype=np.int32, count=n)
+        reason[tokens < self.min_tokens] = 1
+        if self.min_chars:
+            chars = np.fromiter((len(HANGUL_RE.findall(sent)) for sent in sents), dtype=np.int32, count=n)
+            reason[(reason == 0) & (chars < self.min_chars)] = 2
+
+        # One regex pass over the whole batch; match offsets map back to sentences
+        joined = _SEP.join(sents)
+        starts = np.cumsum([0] + [len(sent) + 1 for sent in sents[:-1]])
+        codes = {name: 3 + i for i, name in enumerate(self.rules)}
+        for match in self.pattern.finditer(joined):
+            idx = np.searchsorted(starts, match.start(), side="right") - 1
+            if reason[idx] == 0:
+                reason[idx] = codes[match.lastgroup]
+
+        if self.dedupe and (survivors := np.flatnonzero(reason == 0)).size:
+            sigs = self._signatures([sents[i] for i in survivors])
+            for idx, sig in zip(survivors, sigs):
+                if self._is_duplicate(sig):
+                    reason[idx] = len(self.reasons)
+
+        self.stats["seen"] += n
+        self.stats["kept"] += int((reason == 0).sum())
+        for code, count in zip(*np.unique(reason[reason > 0], return_counts=True)):
+            self.stats[self.reasons[code - 1]] += int(count)
+        return (reason == 0).tolist()
+
+    def report(self) -> str:
+        seen, kept = self.stats["seen"], self.stats["kept"]
+        skipped = seen - kept
+        detail = ", ".join(f"{name} {self.stats[name]}" for name in self.reasons if self.stats[name])
+        share = skipped / seen * 100 if seen else 0.0
+        return f"Prefilter skipped {skipped}/{seen} sentences ({share:.1f}%){f' [{detail}]' if detail else ''}; {kept} sent to classifier"
+
+    # --- MinHash / LSH ---
+    def _signatures(self, sents: list[str]) -> np.ndarray:
+        hashes, counts = [], []
+        k = self.shingle_size
+        for sent in sents:
+            text = " ".join(sent.split())
+            grams = {text[j : j + k] for j in range(max(1, len(text) - k + 1))}
+            hashes.extend(zlib.crc32(gram.encode("utf-8")) for gram in grams)
+            counts.append(len(grams))
+        h = np.asarray(hashes, dtype=np.uint64)
+        hashed = (self.perm_a[:, None] * h[None, :] + self.perm_b[:, None]) % _PRIME
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        return np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+
+    def _is_duplicate(self, sig: np.ndarray) -> bool:
+        keys = [(b, sig[b * self.rows : (b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+        for cand in {self.buckets[key] for key in keys if key in self.buckets}:
+            if np.mean(self.signatures[cand] == sig) >= self.dedupe_threshold:
+                return True
+        sid = len(self.signatures)
+        self.signatures.append(sig)
+        for key in keys:
+            self.buckets.setdefault(key, sid)
+        return False
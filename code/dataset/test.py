@@ -1,36 +1,21 @@
 import json
 
+from dataset.create_dataset import filter_by_labels
+from utils.utils import iter_json_items
+
 def main():
     src_path = "../example/dataset/dataset_emuseum_0F_664.json"
-    with open(src_path, "r", encoding="utf-8") as src_file:
-        data = json.load(src_file)
-    
-    new_data = {}
-    idx = 1
-    
-    for key, item in data.items():
-        flags = [False, False, False]
-        for sentence in item["sentences"]:
-            if sentence["labels"][0] == "meaning":
-                flags[0] = True
-            elif sentence["labels"][0] == "composition":
-                flags[1] = True
-            # elif sentence["labels"][0] == "technique":
-            #     flags[1] = True
-            elif sentence["labels"][0] == "context":
-                flags[2] = True
-        if not flags[0]:
-            continue
-        if not flags[1]:
-            continue
-        # if not flags[2]:
-        #     continue
-        new_data[idx] = item
-        idx += 1
-    
+    items = (item for _, item in iter_json_items(src_path))
+
+    # Top labels required across an item's sentences
+    stage = filter_by_labels(("meaning", "composition"))  # + "context", "technique"
+
+    # Same output as before: a JSON object keyed by index; only the kept items are held in memory
+    new_data = {idx: item for idx, item in enumerate(stage(items), 1)}
+
     dst_path = "../example/dataset/dataset_emuseum.json"
     with open(dst_path, "w", encoding="utf-8") as dst_file:
         json.dump(new_data, dst_file, ensure_ascii=False, indent=4)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
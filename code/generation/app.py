@@ -0,0 +1,123 @@
+import argparse, json, os, time
+
+from generation.handle_query import generate_response, serialize_context
+from generation.serving import RequestQueue, QueueFull, PROFILERS, offline_backend
+from utils.graph import ExpansionLimits
+from utils.registry import registry, GEN_MODELS, EMBED_MODELS
+from utils.tracing import tracer, finish_trace
+
+
+# ---------------- DEMO ----------------
+# Gradio front end for generate_response. Every request goes through one RequestQueue: at most
+# --max_concurrency generations run at once and at most --max_queue wait, the rest are turned away with
+# an error instead of stacking up behind slow model calls. Gradio's own queue is left unbounded so that
+# ours is the one that decides. "Profile" captures the request with --profile into --profile_dir.
+# --offline serves FakeLLM/FakeEmbedder over the example graph in memory (no Neo4j, no API keys).
+def build_backend(args) -> dict:
+    if args.offline:
+        return offline_backend(args.example_dir, args.llm_latency, args.embed_latency, args.compact)
+    from dotenv import load_dotenv
+    from neo4j import GraphDatabase
+    from generation.handle_query import create_retriever
+    load_dotenv()
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+    return {
+        "cap_model": registry.lazy(args.cap_model),
+        "gen_model": registry.lazy(args.model),
+        "embedder": registry.lazy(args.embed_model),
+        "retriever": create_retriever(driver, "Index"),
+    }
+
+def build_demo(queue: RequestQueue, profiler: str | None):
+    gr = _import_gradio()
+
+    def answer(image_path: str, query: str, with_retrieval: bool, profile: bool):
+        if not image_path or not query:
+            raise gr.Error("An image and a question are both required.")
+        start = time.perf_counter()
+        try:
+            future = queue.submit(image_path=image_path, query=query, with_retrieval=with_retrieval, profile=profiler if profile else None)
+        except QueueFull:
+            raise gr.Error("The server is busy, please try again shortly.")
+        response, caption, context_graph = future.result()
+        record = future.record
+        timings = {
+            "total_s": round(time.perf_counter() - start, 3),
+            "queue_stats": {k: round(v, 3) if isinstance(v, float) else v for k, v in queue.stats().items()},
+        }
+        if profile and record.get("profile"):
+            timings["profile"] = record["profile"]
+        return response, caption, serialize_context(context_graph) if context_graph else "", json.dumps(timings, indent=2)
+
+    with gr.Blocks(title="SemioticRAG") as demo:
+        gr.Markdown("# SemioticRAG\nAsk about the symbolism in a Korean folk painting.")
+        with gr.Row():
+            with gr.Column():
+                image = gr.Image(type="filepath", label="Painting")
+                query = gr.Textbox(label="Question", lines=2)
+                with_retrieval = gr.Checkbox(value=True, label="Retrieve from the knowledge graph")
+                profile = gr.Checkbox(value=False, label=f"Profile this request ({profiler})", visible=profiler is not None)
+                submit = gr.Button("Ask", variant="primary")
+            with gr.Column():
+                response = gr.Textbox(label="Answer", lines=10)
+                caption = gr.Textbox(label="Caption")
+                context = gr.Code(label="Retrieved context", language="json")
+                timings = gr.Code(label="Timings", language="json")
+        submit.click(answer, [image, query, with_retrieval, profile], [response, caption, context, timings])
+    return demo
+
+def make_handler(backend: dict, limits: ExpansionLimits | None):
+    def handle(query: str, image_path: str, with_retrieval: bool = True):
+        retriever = backend["retriever"] if with_retrieval else None
+        return generate_response(query, image_path, backend["cap_model"], backend["gen_model"], backend["embedder"], retriever, limits=limits)
+    return handle
+
+
+# ---------------- MAIN ----------------
+def main(args):
+    limits = None if args.max_hops <= 0 else ExpansionLimits(args.max_hops, args.max_neighbors, args.supernode_fanout)
+    queue = RequestQueue(make_handler(build_backend(args), limits), args.max_concurrency, args.max_queue, args.profile_dir, args.history)
+    demo = build_demo(queue, args.profile)
+    demo.queue(default_concurrency_limit=None, max_size=None)
+    try:
+        demo.launch(server_name=args.host, server_port=args.port)
+    finally:
+        queue.shutdown()
+        print(f"📈 {queue.stats()}")
+
+
+# ---------------- UTILS ----------------
+def _import_gradio():
+    try:
+        import gradio as gr
+    except ImportError as e:
+        raise ImportError("The demo requires gradio (pip install gradio).") from e
+    return gr
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gradio demo with a bounded request queue")
+    parser.add_argument("--offline", action="store_true")   # stub models + in-memory example graph
+    parser.add_argument("--example_dir", type=str, default="../example")
+    parser.add_argument("--compact", action="store_true")   # --offline: serve from the CompactGraph
+    parser.add_argument("--llm_latency", type=float, default=0.5)   # --offline: seconds per stub model call
+    parser.add_argument("--embed_latency", type=float, default=0.05)
+    parser.add_argument("--model", type=str, default="gpt-4o-mini", choices=GEN_MODELS)
+    parser.add_argument("--cap_model", type=str, default="florence-2-large")
+    parser.add_argument("--embed_model", type=str, default="text-embedding-3-large", choices=EMBED_MODELS)
+    parser.add_argument("--max_hops", type=int, default=0)   # capped hop-wise expansion (opt-in); 0 = original unbounded [*1..]
+    parser.add_argument("--max_neighbors", type=int, default=8)
+    parser.add_argument("--supernode_fanout", type=int, default=2)
+    parser.add_argument("--max_concurrency", type=int, default=2)   # generations in flight
+    parser.add_argument("--max_queue", type=int, default=32)   # waiting requests before "busy"
+    parser.add_argument("--history", type=int, default=1000)   # recent requests behind the timing percentiles
+    parser.add_argument("--profile", type=str, default=None, choices=PROFILERS)   # enables the per-request checkbox
+    parser.add_argument("--profile_dir", type=str, default="../example/generation/profiles")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--trace", type=str, default=None)
+    args = parser.parse_args()
+    if args.trace:
+        tracer.enable()
+    main(args)
+    finish_trace(args.trace)
@@ -1,21 +1,171 @@
-import base64
-from neo4j import GraphDatabase, Record
+import base64, json, re
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import GraphDatabase, Record, RoutingControl
 from neo4j_graphrag.generation.prompts import PromptTemplate
 from neo4j_graphrag.retrievers import VectorCypherRetriever
-from neo4j_graphrag.types import RetrieverResultItem
+from neo4j_graphrag.types import RetrieverResult, RetrieverResultItem
 
+from generation.rerank import PathCandidates, PathReranker, top_paths
+from utils.compact_graph import CompactGraph, CompactContext
+from utils.graph import InMemoryGraph, AliasIndex, ExpansionLimits
 from utils.llm import BaseLLM, BaseEmbedder
-from utils.prompts import CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT, RETRIEVAL_CYPHER, GENERATE_SYSTEM_PROMPT, GENERATE_USER_PROMPT
+from utils.tracing import tracer, traced
+from utils.prompts import (
+    CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT, RETRIEVAL_CYPHER, SEED_SEARCH_CYPHER, SEED_EXPANSION_CYPHER, ALIAS_INDEX_CYPHER,
+    CANDIDATE_PATHS_CYPHER, NEIGHBORS_CYPHER, PATH_DETAILS_CYPHER,
+    GENERATE_SYSTEM_PROMPT, GENERATE_USER_PROMPT,
+)
 
 
 # ---------------- RETRIEVER ----------------
-def create_retriever(driver: GraphDatabase.driver, index_name: str) -> VectorCypherRetriever:
-    return VectorCypherRetriever(
+# Besides search(), both retrievers expose its two halves: seed_search() (vector search only) and
+# expand_seeds() (path expansion from given seeds), so seeds from several searches can be fused first.
+# Each also keeps an AliasIndex over Form names/aliases; call refresh_aliases() after ingesting.
+# With a PathReranker, expand_seeds() ranks all candidate paths client-side instead of by score / length;
+# with ExpansionLimits, paths are enumerated hop by hop with per-node neighbour caps (utils/graph.py).
+# CompactRetriever serves a read-only CompactGraph and returns integer ids (CompactContext) instead of
+# formatted records; serialize_context() renders them only when the prompt is built.
+def create_retriever(driver: GraphDatabase.driver, index_name: str) -> "GraphRetriever":
+    retriever = GraphRetriever(
         driver=driver,
         index_name=index_name,
         retrieval_query=RETRIEVAL_CYPHER,
         result_formatter=formatter,
     )
+    retriever.refresh_aliases()
+    return retriever
+
+class GraphRetriever(VectorCypherRetriever):
+    aliases = AliasIndex()
+
+    def refresh_aliases(self) -> None:
+        records, _, _ = self.driver.execute_query(ALIAS_INDEX_CYPHER, database_=self.neo4j_database, routing_=RoutingControl.READ)
+        self.aliases = AliasIndex([(rec["id"], rec["name"], rec["aliases"]) for rec in records])
+
+    def seed_search(self, query_vector: list[float], top_k: int = 5) -> list[tuple[str, float]]:
+        records, _, _ = self.driver.execute_query(
+            SEED_SEARCH_CYPHER,
+            index_name=self.index_name,
+            top_k=top_k,
+            query_vector=query_vector,
+            database_=self.neo4j_database,
+            routing_=RoutingControl.READ,
+        )
+        return [(rec["id"], rec["score"]) for rec in records]
+
+    def expand_seeds(self, seeds: list[tuple[str, float]], per_seed_limit: int = 10, reranker: PathReranker | None = None, limits: ExpansionLimits | None = None) -> RetrieverResult:
+        if reranker or limits:
+            return self._expand_client_side(seeds, per_seed_limit, reranker, limits)
+        records, _, _ = self.driver.execute_query(
+            SEED_EXPANSION_CYPHER,
+            seeds=[{"id": node_id, "score": score} for node_id, score in seeds],
+            per_seed_limit=per_seed_limit,
+            database_=self.neo4j_database,
+            routing_=RoutingControl.READ,
+        )
+        return RetrieverResult(items=[formatter(rec) for rec in records])
+
+    def _expand_client_side(self, seeds: list[tuple[str, float]], per_seed_limit: int, reranker: PathReranker | None, limits: ExpansionLimits | None) -> RetrieverResult:
+        paths, degrees = self._capped_paths(seeds, limits) if limits else self._candidate_paths(seeds)
+        cands = PathCandidates(paths, lambda ids: [degrees.get(i, 0) for i in ids])
+        kept = reranker.select(cands) if reranker else top_paths(cands, per_seed_limit)
+        if not kept:
+            return RetrieverResult(items=[])
+        records, _, _ = self.driver.execute_query(
+            PATH_DETAILS_CYPHER,
+            node_ids=sorted({cands.node_ids[c] for p in kept for c in cands.node_codes[cands.node_ptr[p] : cands.node_ptr[p + 1]]}),
+            rel_ids=sorted({rel_id for p in kept for rel_id in cands.rel_ids[p]}),
+            database_=self.neo4j_database,
+            routing_=RoutingControl.READ,
+        )
+        return RetrieverResult(items=[formatter(rec) for rec in records])
+
+    def _candidate_paths(self, seeds: list[tuple[str, float]]) -> tuple[list[tuple], dict]:
+        records, _, _ = self.driver.execute_query(
+            CANDIDATE_PATHS_CYPHER,
+            seeds=[{"id": node_id, "score": score} for node_id, score in seeds],
+            database_=self.neo4j_database,
+            routing_=RoutingControl.READ,
+        )
+        degrees = {node_id: degree for rec in records for node_id, degree in zip(rec["node_ids"], rec["degrees"])}
+        return [(rec["seed"], rec["score"], rec["node_ids"], rec["rel_ids"]) for rec in records], degrees
+
+    def _capped_paths(self, seeds: list[tuple[str, float]], limits: ExpansionLimits) -> tuple[list[tuple], dict]:
+        # Hop-wise walk: each round expands the whole frontier in one query, capped per node by NEIGHBORS_CYPHER
+        found, degrees = [], {}
+        frontier = [(seed_id, score, [seed_id], []) for seed_id, score in seeds]
+        for _ in range(limits.max_hops):
+            if not frontier:
+                break
+            records, _, _ = self.driver.execute_query(
+                NEIGHBORS_CYPHER,
+                node_ids=sorted({path_nodes[-1] for _, _, path_nodes, _ in frontier}),
+                max_neighbors=limits.max_neighbors,
+                supernode_fanout=limits.supernode_fanout,
+                database_=self.neo4j_database,
+                routing_=RoutingControl.READ,
+            )
+            neighbors = {rec["node_id"]: rec["neighbors"] for rec in records}
+            degrees.update({rec["node_id"]: rec["degree"] for rec in records})
+            next_frontier = []
+            for seed_id, score, path_nodes, path_rels in frontier:
+                for nb in neighbors.get(path_nodes[-1], []):
+                    if nb["rel_id"] in path_rels:
+                        continue
+                    path = (seed_id, score, path_nodes + [nb["node_id"]], path_rels + [nb["rel_id"]])
+                    degrees[nb["node_id"]] = nb["degree"]
+                    if nb["myth"]:
+                        found.append(path)
+                    next_frontier.append(path)
+            frontier = next_frontier
+        tracer.current().add(expanded_paths=len(found))
+        return found, degrees
+
+class MemoryRetriever:
+    # Drop-in for GraphRetriever over an InMemoryGraph (offline benchmarks and demos)
+    def __init__(self, graph: InMemoryGraph):
+        self.graph = graph
+        self.refresh_aliases()
+
+    def refresh_aliases(self) -> None:
+        self.aliases = AliasIndex.from_graph(self.graph)
+
+    def search(self, query_vector: list[float], top_k: int = 5, query_params: dict | None = None) -> RetrieverResult:
+        return self.expand_seeds(self.seed_search(query_vector, top_k), (query_params or {}).get("per_seed_limit", 10))
+
+    def seed_search(self, query_vector: list[float], top_k: int = 5) -> list[tuple[int, float]]:
+        return self.graph.vector_search(query_vector, top_k)
+
+    def expand_seeds(self, seeds: list[tuple[int, float]], per_seed_limit: int = 10, reranker: PathReranker | None = None, limits: ExpansionLimits | None = None) -> RetrieverResult:
+        if reranker:
+            cands = PathCandidates(self.graph.candidate_paths(seeds, limits), lambda ids: self.graph.degrees()[ids])
+            kept = reranker.select(cands)
+            record = self.graph.subgraph([cands.rel_ids[p] for p in kept]) if kept else None
+        else:
+            record = self.graph.expand(seeds, per_seed_limit, limits)
+        return RetrieverResult(items=[formatter(record)] if record else [])
+
+class CompactRetriever:
+    # MemoryRetriever's interface over a CompactGraph (utils/compact_graph.py)
+    def __init__(self, graph: CompactGraph):
+        self.graph = graph
+        self.aliases = graph.aliases
+
+    def refresh_aliases(self) -> None:
+        # Read-only: rebuild the CompactGraph after ingesting instead
+        pass
+
+    def search(self, query_vector: list[float], top_k: int = 5, query_params: dict | None = None) -> CompactContext:
+        return self.expand_seeds(self.seed_search(query_vector, top_k), (query_params or {}).get("per_seed_limit", 10))
+
+    def seed_search(self, query_vector: list[float], top_k: int = 5) -> list[tuple[int, float]]:
+        return self.graph.vector_search(query_vector, top_k)
+
+    def expand_seeds(self, seeds: list[tuple[int, float]], per_seed_limit: int = 10, reranker: PathReranker | None = None, limits: ExpansionLimits | None = None) -> CompactContext:
+        if reranker:
+            cands = PathCandidates(self.graph.candidate_paths(seeds, limits), lambda ids: self.graph.degrees()[ids])
+            return self.graph.subgraph([cands.rel_ids[p] for p in reranker.select(cands)])
+        return self.graph.expand(seeds, per_seed_limit, limits)
 
 def formatter(rec: Record) -> RetrieverResultItem:
     def clean_text(s):
@@ -59,7 +209,10 @@ def formatter(rec: Record) -> RetrieverResultItem:
 
     return RetrieverResultItem(content=str(data), metadata=data)
 
-def retrieve_context(retriever: VectorCypherRetriever, query_vector: list[float], top_k: int=5, per_seed_limit: int=10) -> list[str]:
+@traced("retrieve_context")
+def retrieve_context(retriever: GraphRetriever | MemoryRetriever | CompactRetriever, query_vector: list[float], top_k: int=5, per_seed_limit: int=10, reranker: PathReranker | None=None, limits: ExpansionLimits | None=None) -> dict:
+    if reranker or limits:
+        return _combine(retriever.expand_seeds(retriever.seed_search(query_vector, top_k), per_seed_limit, reranker, limits))
     results = retriever.search(
         query_vector=query_vector,
         top_k=top_k,
@@ -68,7 +221,64 @@ def retrieve_context(retriever: VectorCypherRetriever, query_vector: list[float]
         },
     )
     # print(f"Retrieved {len(results.items)} items from retriever.")
+    return _combine(results)
+
+@traced("retrieve_motif_context")
+def retrieve_motif_context(retriever: GraphRetriever | MemoryRetriever | CompactRetriever, embedder: BaseEmbedder, motifs: list[str], top_k: int=5, per_seed_limit: int=10, per_motif_cap: int=2, fusion: str="rrf", fast_path: bool=True, motif_vectors: list[list[float]] | None=None, reranker: PathReranker | None=None, limits: ExpansionLimits | None=None) -> dict:
+    # One seed search per caption motif, fused into `top_k` seeds, then a single expansion. Motifs that
+    # name a Form (or alias) exactly are resolved by the alias index at similarity 1.0; only the rest are
+    # embedded (one batch, skipped when `motif_vectors` are precomputed) and searched (in parallel).
+    # The cap keeps one dominant motif from taking every seed.
+    rankings = [[(form_id, 1.0) for form_id in retriever.aliases.lookup(motif)[:per_motif_cap]] if fast_path else [] for motif in motifs]
+    unmatched = [i for i, ranking in enumerate(rankings) if not ranking]
+    if unmatched:
+        vectors = [motif_vectors[i] for i in unmatched] if motif_vectors else embedder.embed_batch([motifs[i] for i in unmatched])
+        with ThreadPoolExecutor(max_workers=len(unmatched)) as pool:
+            for i, ranking in zip(unmatched, pool.map(lambda vector: retriever.seed_search(vector, per_motif_cap), vectors)):
+                rankings[i] = ranking
+    seeds = fuse_seeds(rankings, top_k, fusion)
+
+    fast_ids = {node_id for i, ranking in enumerate(rankings) if i not in unmatched for node_id, _ in ranking}
+    tracer.current().add(
+        motifs=len(motifs),
+        fast_path_motifs=len(motifs) - len(unmatched),
+        embeddings_avoided=len(motifs) if motif_vectors else len(motifs) - len(unmatched),
+        embed_calls_avoided=int(bool(motifs) and (not unmatched or bool(motif_vectors))),
+        candidates=sum(len(ranking) for ranking in rankings),
+        seeds=len(seeds),
+        fast_path_seeds=sum(node_id in fast_ids for node_id, _ in seeds),
+    )
+    return _combine(retriever.expand_seeds(seeds, per_seed_limit, reranker, limits))
+
+def fuse_seeds(rankings: list[list[tuple]], top_k: int = 5, fusion: str = "rrf", rrf_k: int = 60) -> list[tuple]:
+    # "rrf": sum of 1 / (rrf_k + rank) over the motifs that found a node; "max": its best similarity.
+    # Ties (e.g. several rank-1 hits under rrf) go to the higher similarity.
+    fused, best = {}, {}
+    for ranking in rankings:
+        for rank, (node_id, score) in enumerate(ranking, 1):
+            if fusion == "rrf":
+                fused[node_id] = fused.get(node_id, 0.0) + 1.0 / (rrf_k + rank)
+            elif fusion == "max":
+                fused[node_id] = max(fused.get(node_id, 0.0), score)
+            else:
+                raise ValueError(f"Unsupported fusion: {fusion}")
+            best[node_id] = max(best.get(node_id, 0.0), score)
+    return sorted(fused.items(), key=lambda item: (item[1], best[item[0]]), reverse=True)[:top_k]
+
+def split_motifs(caption: str) -> list[str]:
+    # "tiger, rabbit, tree, smoke pipe" → one motif per tag; a caption without separators stays whole
+    motifs, seen = [], set()
+    for motif in re.split(r"[,;\n]+", caption):
+        motif = motif.strip(" .")
+        if motif and motif.lower() not in seen:
+            seen.add(motif.lower())
+            motifs.append(motif)
+    return motifs or [caption]
 
+def _combine(results: RetrieverResult | CompactContext) -> dict | CompactContext:
+    if isinstance(results, CompactContext):
+        tracer.current().add(items=1, entities=len(results.node_ids), relations=len(results.rel_ids))
+        return results
     combined = {
         "entities": [],
         "relations": [],
@@ -77,34 +287,53 @@ def retrieve_context(retriever: VectorCypherRetriever, query_vector: list[float]
         item_data = item.metadata
         combined["entities"].extend(item_data.get("entities", []))
         combined["relations"].extend(item_data.get("relations", []))
-        
+    tracer.current().add(items=len(results.items), entities=len(combined["entities"]), relations=len(combined["relations"]))
     return combined
 
 
 # ---------------- GENERATION ----------------
-def generate_response(query: str, image_path: str, cap_model: BaseLLM, gen_model: BaseLLM, embedder: BaseEmbedder, retriever: VectorCypherRetriever=None) -> tuple[str, str, dict]:
+@traced("generate_response")
+def generate_response(query: str, image_path: str, cap_model: BaseLLM, gen_model: BaseLLM, embedder: BaseEmbedder, retriever: GraphRetriever | MemoryRetriever | CompactRetriever=None, motifs: bool=False, vision_index=None, reranker: PathReranker | None=None, limits: ExpansionLimits | None=None) -> tuple[str, str, dict]:
+    prompt, caption, context_graph = build_prompt(query, image_path, cap_model, embedder, retriever, motifs, vision_index, reranker, limits)
+    response = gen_model.generate(prompt, GENERATE_SYSTEM_PROMPT, image_path)
+    return (response, caption, context_graph)
+
+def build_prompt(query: str, image_path: str, cap_model: BaseLLM, embedder: BaseEmbedder, retriever: GraphRetriever | MemoryRetriever | CompactRetriever=None, motifs: bool=False, vision_index=None, reranker: PathReranker | None=None, limits: ExpansionLimits | None=None) -> tuple[str, str, dict]:
+    # Everything before the final generation call; shared with the batch path in generation/main.py.
+    # Images found in `vision_index` (generation/vision_index.py) reuse their precomputed caption and vectors.
     if retriever is None:
         # print("Generating response without retrieval.")
         caption = ""
         context_graph = ""
     else:
         # print("Generating response with retrieval.")
-        caption = cap_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, image_path)
+        indexed = vision_index.lookup(image_path) if vision_index else None
+        caption = indexed["caption"] if indexed else cap_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, image_path)
         # print(f"Generated caption: {caption}")
-        caption_vector = embedder.embed(caption)
-        context_graph = retrieve_context(retriever, caption_vector)
+        if motifs:
+            tags = indexed["tags"] if indexed else split_motifs(caption)
+            context_graph = retrieve_motif_context(retriever, embedder, tags, motif_vectors=indexed["tag_vectors"] if indexed else None, reranker=reranker, limits=limits)
+        else:
+            caption_vector = indexed["caption_vector"] if indexed else embedder.embed(caption)
+            context_graph = retrieve_context(retriever, caption_vector, reranker=reranker, limits=limits)
         # print(f"Retrieved context: {context_graph}")
     
     prompt = PromptTemplate(
         template=GENERATE_USER_PROMPT,
         expected_inputs=["context", "query"],
-    ).format(context=str(context_graph), query=query)
-
-    response = gen_model.generate(prompt, GENERATE_SYSTEM_PROMPT, image_path)
-    return (response, caption, context_graph)
+    ).format(context=serialize_context(context_graph), query=query)
+    return (prompt, caption, context_graph)
 
 
 # ---------------- UTILS ----------------
+def serialize_context(context_graph: dict | str | CompactContext) -> str:
+    # Deterministic and compact, so the same retrieval always yields byte-identical prompts (cacheable)
+    if isinstance(context_graph, CompactContext):
+        return context_graph.render()
+    if not context_graph:
+        return ""
+    return json.dumps(context_graph, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
 def encode_image(image_path: str) -> str:
     with open(image_path, "rb") as img_file:
         img_str = base64.b64encode(img_file.read()).decode("utf-8")
@@ -4,8 +4,12 @@ from tqdm import tqdm
 from neo4j import GraphDatabase
 from neo4j_graphrag.retrievers import VectorCypherRetriever
 
-from generation.handle_query import create_retriever, generate_response
-from utils.llm import OpenAILLM, LocalLLM, OpenAIEmbedder
+from generation.handle_query import create_retriever, generate_response, build_prompt
+from utils.prompts import GENERATE_SYSTEM_PROMPT
+from utils.ratelimit import budget, BudgetExceeded
+from utils.registry import registry, GEN_MODELS, EMBED_MODELS
+from utils.graph import ExpansionLimits
+from utils.tracing import tracer, finish_trace
 from utils.utils import load_json_file
 
 
@@ -28,29 +32,34 @@ def main(args):
         print("❗ Retriever creation failed.")
         return
     
-    match args.model:
-        case "gpt-4o-mini" | "gpt-4o":
-            gen_model = OpenAILLM(model=args.model, api_key=os.getenv("OPENAI_API_KEY"))
-        case "qwen2.5-vl":
-            gen_model = LocalLLM(model="Qwen/Qwen2.5-VL-7B-Instruct")
-        case "qwen3-vl":
-            gen_model = LocalLLM(model="Qwen/Qwen3-VL-8B-Instruct")
+    # Models load on first use: captioner and embedder are never touched without retrieval
+    gen_model = registry.lazy(args.model)
     
     # TODO: SELECT MODEL FOR IMAGE TAGGING / CAPTIONING
-    # cap_model = OpenAILLM(model="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY"))
-    # cap_model = LocalLLM(model="microsoft/Florence-2-base")
-    cap_model = LocalLLM(model="microsoft/Florence-2-large")
+    # cap_name = "gpt-4o-mini"
+    # cap_name = "florence-2-base"
+    cap_name = "florence-2-large"
     # END TODO
+    cap_model = registry.lazy(cap_name)
 
-    embedder = OpenAIEmbedder(
-        model="text-embedding-3-large",
-        model_dim=3072,
-        api_key=os.getenv("OPENAI_API_KEY"),
-    )
+    embed_name = args.embed_model   # must match the model the graph was ingested with
+    embedder = registry.lazy(embed_name)
+
+    # Precomputed captions/vectors (python -m generation.vision_index); the captioner only loads on a miss
+    vision_index = None
+    if args.vision_index:
+        from generation.vision_index import VisionIndex
+        vision_index = VisionIndex(args.vision_index, cap_name, embed_name)
+    limits = None if args.max_hops <= 0 else ExpansionLimits(args.max_hops, args.max_neighbors, args.supernode_fanout)
+    reranker = None
+    if args.rerank:
+        from generation.rerank import PathReranker
+        reranker = PathReranker(max_nodes=args.max_context_nodes)
     
-    query_generations = [args.with_retrieval, args.without_retrieval].count("y")
+    query_generations = [args.with_retrieval, args.without_retrieval].count(True)
     total_generations = sum(len(input["query"]) for input in all_input) * query_generations
     pbar = tqdm(total=total_generations, desc="Processing generations")
+    requests = []  # --batch: final generation calls are deferred and submitted together
 
     for input in all_input:
         img_path = input["image"]
@@ -59,8 +68,14 @@ def main(args):
         for query in input["query"]:
             def generate(retriever: VectorCypherRetriever | None):
                 start_time = time.time()
-                response, caption, context_graph = generate_response(query, img_path, cap_model, gen_model, embedder, retriever)
-                elapsed_time = time.time() - start_time
+                if args.batch:
+                    from utils.batch import make_request
+                    prompt, caption, context_graph = build_prompt(query, img_path, cap_model, embedder, retriever, args.motifs, vision_index, reranker, limits)
+                    requests.append(make_request(f"{len(all_output)}-{len(qa_pairs)}", prompt, GENERATE_SYSTEM_PROMPT, img_path))
+                    response = None  # filled in from the batch results below
+                else:
+                    response, caption, context_graph = generate_response(query, img_path, cap_model, gen_model, embedder, retriever, args.motifs, vision_index, reranker, limits)
+                elapsed_time = None if args.batch else time.time() - start_time
 
                 qa_pairs.append({
                     "query": query,
@@ -71,10 +86,10 @@ def main(args):
                 })
                 pbar.update(1)
             
-            if args.with_retriever:
+            if args.with_retrieval:
                 pbar.set_postfix_str("with retrieval")
                 generate(retriever)
-            if args.without_retriever:
+            if args.without_retrieval:
                 pbar.set_postfix_str("without retrieval")
                 generate(None)
             break  # TEMP: ONLY FIRST QUERY
@@ -87,6 +102,14 @@ def main(args):
     
     pbar.close()
     driver.close()
+
+    if requests:
+        from utils.batch import make_batch_backend, run_batch
+        backend = make_batch_backend(args.batch, args.model, args.batch_dir)
+        results = run_batch(backend, requests, args.batch_dir, args.poll_interval)
+        for request in requests:
+            i, j = map(int, request["custom_id"].split("-"))
+            all_output[i]["output"][j]["response"] = results.get(request["custom_id"], {}).get("content")
     
     with open(args.dst, "w", encoding="utf-8") as dst_file:
         json.dump(all_output, dst_file, ensure_ascii=False, indent=4)
@@ -96,8 +119,30 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Data Extraction and Ingestion into Neo4j")
     parser.add_argument("--with_retrieval", action="store_true")
     parser.add_argument("--without_retrieval", action="store_true")
-    parser.add_argument("--model", type=str, default="gpt-4o-mini", choices=["gpt-4o-mini", "gpt-4o", "qwen2.5", "qwen3"])
+    parser.add_argument("--model", type=str, default="gpt-4o-mini", choices=GEN_MODELS)
+    parser.add_argument("--embed_model", type=str, default="text-embedding-3-large", choices=EMBED_MODELS)
     parser.add_argument("--src", type=str, default="../example/generation/input.json")
     parser.add_argument("--dst", type=str, default="../example/generation/output.json")
+    parser.add_argument("--vision_index", type=str, default=None)   # directory built by generation.vision_index
+    parser.add_argument("--max_hops", type=int, default=0)   # capped hop-wise expansion (opt-in, untested on Neo4j); 0 = original unbounded [*1..]
+    parser.add_argument("--max_neighbors", type=int, default=8)
+    parser.add_argument("--supernode_fanout", type=int, default=2)   # neighbours kept through a supernode; 0 prunes
+    parser.add_argument("--rerank", action="store_true")   # rank candidate paths client-side (generation/rerank.py)
+    parser.add_argument("--max_context_nodes", type=int, default=24)
+    parser.add_argument("--motifs", action="store_true")   # one vector search per caption tag, fused before expansion
+    parser.add_argument("--batch", type=str, default=None, choices=["openai", "local"])   # offline batch generation
+    parser.add_argument("--batch_dir", type=str, default="../example/generation/batch")
+    parser.add_argument("--poll_interval", type=float, default=30.0)
+    parser.add_argument("--trace", type=str, default=None)     # .json (Chrome trace) or .jsonl
+    parser.add_argument("--budget_usd", type=float, default=None)   # halt once OpenAI spend reaches this
+    parser.add_argument("--budget_tokens", type=int, default=None)
     args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    if args.trace:
+        tracer.enable()
+    budget.configure(args.budget_usd, args.budget_tokens)
+    try:
+        main(args)
+    except BudgetExceeded as e:
+        print(f"🛑 {e}")
+    print(f"💰 {budget.report()}")
+    finish_trace(args.trace)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import numpy as np
+
+from utils.tracing import tracer
+
+
+# ---------------- CANDIDATE PATHS ----------------
+# All Form→Myth paths from the seeds, flattened into arrays (node ids interned to codes):
+#   seed[p], score[p], length[p] (hops), myth[p]     one entry per path
+#   node_ptr[p]:node_ptr[p+1] slices node_codes       the path's nodes, seed first, Myth last
+#   degree[c]                                         degree of node code c
+class PathCandidates:
+    def __init__(self, paths: list[tuple], degree_of):
+        # paths: (seed id, seed score, node ids, rel ids); degree_of(node ids) -> degrees
+        self.node_ids: list = []
+        self.rel_ids = [rel_ids for *_, rel_ids in paths]
+        codes: dict = {}
+        flat = []
+        for _, _, path_nodes, _ in paths:
+            for node_id in path_nodes:
+                if node_id not in codes:
+                    codes[node_id] = len(self.node_ids)
+                    self.node_ids.append(node_id)
+                flat.append(codes[node_id])
+        seed_codes: dict = {}
+        self.seed = np.array([seed_codes.setdefault(seed_id, len(seed_codes)) for seed_id, *_ in paths], dtype=np.int64)
+        self.n_seeds = len(seed_codes)
+        self.score = np.array([score for _, score, *_ in paths], dtype=np.float64)
+        lengths = np.array([len(path_nodes) for _, _, path_nodes, _ in paths], dtype=np.int64)
+        self.node_ptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.node_codes = np.array(flat, dtype=np.int64)
+        self.length = lengths - 1
+        self.myth = self.node_codes[self.node_ptr[1:] - 1] if len(paths) else np.zeros(0, dtype=np.int64)
+        self.degree = np.asarray(degree_of(self.node_ids), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+
+# ---------------- RERANKER ----------------
+class PathReranker:
+    # Scores every candidate path at once, then keeps the best ones within a node budget:
+    #   w_sim * seed similarity            how well the seed matched the query
+    #   + w_len / hops                     short explanations first
+    #   + w_support * myth support         share of seeds that reach the same Myth (agreement)
+    #   - w_degree * mean log degree       hub nodes (generic concepts) say little about this image
+    # Selection is greedy by score; a path is taken while the nodes it adds fit in `max_nodes`.
+    def __init__(self, w_sim: float = 1.0, w_len: float = 0.5, w_support: float = 1.0, w_degree: float = 0.1, max_paths: int = 10, max_nodes: int = 24):
+        self.w_sim = w_sim
+        self.w_len = w_len
+        self.w_support = w_support
+        self.w_degree = w_degree
+        self.max_paths = max_paths
+        self.max_nodes = max_nodes
+
+    def scores(self, cands: PathCandidates) -> np.ndarray:
+        if not len(cands):
+            return np.zeros(0)
+        # Distinct (myth, seed) pairs → number of seeds per Myth
+        pairs = np.unique(cands.myth * cands.n_seeds + cands.seed)
+        support = np.bincount(pairs // cands.n_seeds, minlength=len(cands.node_ids))[cands.myth] / cands.n_seeds
+        log_degree = np.log1p(cands.degree[cands.node_codes])
+        mean_degree = np.add.reduceat(log_degree, cands.node_ptr[:-1]) / (cands.length + 1)
+        return (
+            self.w_sim * cands.score
+            + self.w_len / cands.length
+            + self.w_support * support
+            - self.w_degree * mean_degree
+        )
+
+    def select(self, cands: PathCandidates) -> list[int]:
+        scores = self.scores(cands)
+        kept, nodes = [], set()
+        for p in np.argsort(-scores, kind="stable"):
+            path_nodes = cands.node_codes[cands.node_ptr[p] : cands.node_ptr[p + 1]]
+            new_nodes = set(path_nodes.tolist()) - nodes
+            if len(nodes) + len(new_nodes) > self.max_nodes:
+                continue
+            kept.append(int(p))
+            nodes |= new_nodes
+            if len(kept) >= self.max_paths or len(nodes) >= self.max_nodes:
+                break
+        tracer.current().add(candidate_paths=len(cands), kept_paths=len(kept), kept_nodes=len(nodes))
+        return kept
+
+
+def top_paths(cands: PathCandidates, per_seed_limit: int = 10) -> list[int]:
+    # RETRIEVAL_CYPHER's own ranking (seed score / hops, best `per_seed_limit` overall) on candidate arrays
+    if not len(cands):
+        return []
+    return np.argsort(-(cands.score / cands.length), kind="stable")[:per_seed_limit].tolist()
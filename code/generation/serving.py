@@ -0,0 +1,147 @@
+import itertools, os, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from utils.tracing import tracer
+
+
+# ---------------- REQUEST QUEUE ----------------
+# Runs a handler (e.g. generate_response) for concurrent users with at most `max_concurrency` requests in
+# service and at most `max_queue` waiting; beyond that submit() raises QueueFull instead of piling up.
+# Every request records its queue wait (submit → start) and service time (start → finish), and can be
+# profiled on its own: profile="cprofile" writes <profile_dir>/<id>.prof (pstats / snakeviz),
+# "pyinstrument" <id>.html. Profilers only see the worker thread the request ran on, and only one can be
+# active in the process at a time, so profiled requests run one after another (the wait counts as service).
+# Only the last `history` finished requests are kept (stats() percentiles are over that window), so a
+# long-running server does not grow; request/error totals cover its whole lifetime.
+PROFILERS = ("cprofile", "pyinstrument")
+_profile_lock = threading.Lock()   # shared by every queue: the profiling hooks are process-wide
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class RequestQueue:
+    def __init__(self, handler: Callable, max_concurrency: int = 2, max_queue: int = 64, profile_dir: str | None = None, history: int = 1000):
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.profile_dir = profile_dir
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="request")
+        self.records: deque[dict] = deque(maxlen=history)
+        self.totals = {"requests": 0, "errors": 0}
+        self.waiting = 0
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+
+    def submit(self, *args, profile: str | None = None, **kwargs) -> Future:
+        if profile and profile not in PROFILERS:
+            raise ValueError(f"Unsupported profiler: {profile}")
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                tracer.count("serving.rejected")
+                raise QueueFull(f"{self.waiting} requests already waiting")
+            self.waiting += 1
+            record = {"id": next(self.ids), "submitted": time.perf_counter(), "profile": None, "error": None}
+        future = self.pool.submit(self._run, record, profile, args, kwargs)
+        future.record = record   # wait/service/profile path, filled in once the request finishes
+        return future
+
+    def call(self, *args, profile: str | None = None, **kwargs):
+        return self.submit(*args, profile=profile, **kwargs).result()
+
+    def _run(self, record: dict, profile: str | None, args: tuple, kwargs: dict):
+        record["started"] = time.perf_counter()
+        with self.lock:
+            self.waiting -= 1
+        try:
+            with tracer.span("serving.request", wait=record["started"] - record["submitted"]):
+                if profile:
+                    return self._profiled(record, profile, args, kwargs)
+                return self.handler(*args, **kwargs)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["finished"] = time.perf_counter()
+            record["wait"] = record["started"] - record["submitted"]
+            record["service"] = record["finished"] - record["started"]
+            with self.lock:
+                self.records.append(record)
+                self.totals["requests"] += 1
+                self.totals["errors"] += bool(record["error"])
+
+    def _profiled(self, record: dict, profile: str, args: tuple, kwargs: dict):
+        with _profile_lock:
+            return self._run_profiler(record, profile, args, kwargs)
+
+    def _run_profiler(self, record: dict, profile: str, args: tuple, kwargs: dict):
+        os.makedirs(self.profile_dir or ".", exist_ok=True)
+        path = os.path.join(self.profile_dir or ".", f"request_{record['id']}")
+        if profile == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(self.handler, *args, **kwargs)
+            finally:
+                record["profile"] = f"{path}.prof"
+                profiler.dump_stats(record["profile"])
+        profiler = _import_pyinstrument().Profiler()
+        profiler.start()
+        try:
+            return self.handler(*args, **kwargs)
+        finally:
+            profiler.stop()
+            record["profile"] = f"{path}.html"
+            with open(record["profile"], "w", encoding="utf-8") as html_file:
+                html_file.write(profiler.output_html())
+
+    def stats(self) -> dict:
+        # Lifetime totals, then percentiles over the last `history` finished requests, seconds
+        with self.lock:
+            records = list(self.records)
+            summary = {**self.totals, "waiting": self.waiting, "window": len(records)}
+        for key in ("wait", "service"):
+            values = sorted(r[key] for r in records)
+            for q in (50, 95, 99):
+                summary[f"{key}_p{q}"] = values[min(len(values) - 1, len(values) * q // 100)] if values else 0.0
+            summary[f"{key}_mean"] = sum(values) / len(values) if values else 0.0
+        return summary
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+
+# ---------------- OFFLINE BACKEND ----------------
+def offline_backend(example_dir: str, llm_latency: float = 0.0, embed_latency: float = 0.0, compact: bool = False, seed: int = 0) -> dict:
+    # Stub models and the example graph in memory, so the demo and the load test run without network:
+    # {"cap_model", "gen_model", "embedder", "retriever"} for generate_response
+    import json, tempfile
+    from construction.manage_database import add_to_graph
+    from generation.handle_query import MemoryRetriever, CompactRetriever
+    from utils.compact_graph import CompactGraph
+    from utils.fakes import FakeLLM, FakeEmbedder
+    from utils.graph import InMemoryGraph
+    from utils.synthetic import make_graph_data
+
+    graph_data = make_graph_data(os.path.join(example_dir, "construction", "extracted.json"), scale=1, seed=seed)
+    llm = FakeLLM(graph_data, latency=llm_latency, seed=seed)
+    embedder = FakeEmbedder(latency=embed_latency)
+    graph = InMemoryGraph()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        graph_path = os.path.join(tmp_dir, "graph.json")
+        with open(graph_path, "w", encoding="utf-8") as graph_file:
+            json.dump(graph_data, graph_file, ensure_ascii=False)
+        add_to_graph(graph, graph_path, embedder)
+    retriever = CompactRetriever(CompactGraph.from_graph(graph)) if compact else MemoryRetriever(graph)
+    return {"cap_model": llm, "gen_model": llm, "embedder": embedder, "retriever": retriever}
+
+
+# ---------------- UTILS ----------------
+def _import_pyinstrument():
+    try:
+        import pyinstrument
+    except ImportError as e:
+        raise ImportError("profile='pyinstrument' requires pyinstrument (pip install pyinstrument).") from e
+    return pyinstrument
@@ -0,0 +1,174 @@
+import argparse, glob, hashlib, json, os, threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+from generation.handle_query import split_motifs
+from utils.llm import BaseLLM, BaseEmbedder
+from utils.prompts import CAPTION_SYSTEM_PROMPT, CAPTION_USER_PROMPT
+from utils.tracing import tracer, traced
+
+
+# ---------------- VISION INDEX ----------------
+# Captions, tags and their embeddings for a fixed image corpus, computed once and keyed by the
+# SHA-1 of the image bytes (so renamed or copied files still hit). On disk:
+#   manifest.json    captioner and embedder names; an index is only valid for that pair
+#   entries.jsonl    {"hash", "path", "caption", "tags", "shard", "caption_row", "tag_rows"}, append-only
+#   vectors_<k>.npy  float32 rows of one flush, referenced by (shard, caption_row/tag_rows)
+# Each flush writes a new shard (atomically) before the matching entries are appended, so build I/O is
+# linear in the corpus and an interrupted build leaves at most an unreferenced shard behind (overwritten
+# by the next flush). Shards are memory-mapped on load. Entries without "shard" (older indexes) refer to
+# rows of a single vectors.npy.
+EMBED_BATCH = 256
+LEGACY_SHARD = "vectors.npy"
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+class VisionIndex:
+    def __init__(self, index_dir: str, cap_model: str, embed_model: str):
+        self.index_dir = index_dir
+        self.entries: dict[str, dict] = {}
+        self.shards: dict[str, np.ndarray] = {}
+        self.lock = threading.Lock()
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        manifest = {"cap_model": cap_model, "embed_model": embed_model}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                stored = json.load(manifest_file)
+            if stored != manifest:
+                raise ValueError(f"Vision index {index_dir} was built with {stored}, not {manifest}")
+            self._load()
+        else:
+            os.makedirs(index_dir, exist_ok=True)
+            with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+                json.dump(manifest, manifest_file, indent=4)
+
+    def lookup(self, image_path: str) -> dict | None:
+        # {"caption", "tags", "caption_vector", "tag_vectors"} for an indexed image, else None
+        entry = self.entries.get(image_hash(image_path))
+        tracer.count("vision_index.hit" if entry else "vision_index.miss")
+        if entry is None:
+            return None
+        vectors = self.shards[entry.get("shard", LEGACY_SHARD)]
+        return {
+            "caption": entry["caption"],
+            "tags": entry["tags"],
+            "caption_vector": vectors[entry["caption_row"]].tolist(),
+            "tag_vectors": [vectors[row].tolist() for row in entry["tag_rows"]],
+        }
+
+    def add(self, records: list[dict], vectors: np.ndarray) -> None:
+        # records carry row offsets into `vectors`, which becomes a shard of its own
+        with self.lock:
+            k = len(self.shards)
+            while f"vectors_{k:05d}.npy" in self.shards:
+                k += 1
+            shard = f"vectors_{k:05d}.npy"
+            self.shards[shard] = np.asarray(vectors, dtype=np.float32)
+            tmp_path = os.path.join(self.index_dir, "vectors.tmp.npy")
+            np.save(tmp_path, self.shards[shard])
+            os.replace(tmp_path, os.path.join(self.index_dir, shard))
+            with open(os.path.join(self.index_dir, "entries.jsonl"), "a", encoding="utf-8") as entries_file:
+                for record in records:
+                    record = {**record, "shard": shard}
+                    self.entries[record["hash"]] = record
+                    entries_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _load(self) -> None:
+        entries_path = os.path.join(self.index_dir, "entries.jsonl")
+        if not os.path.exists(entries_path):
+            return
+        with open(entries_path, encoding="utf-8") as entries_file:
+            for line in entries_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    shard = entry.get("shard", LEGACY_SHARD)
+                    if shard not in self.shards:
+                        if not os.path.exists(shard_path := os.path.join(self.index_dir, shard)):
+                            continue
+                        self.shards[shard] = np.load(shard_path, mmap_mode="r")
+                    if max([entry["caption_row"], *entry["tag_rows"]]) < len(self.shards[shard]):
+                        self.entries[entry["hash"]] = entry
+
+
+# ---------------- BUILD ----------------
+@traced("build_vision_index")
+def build_vision_index(index: VisionIndex, image_paths: list[str], cap_model: BaseLLM, embedder: BaseEmbedder, workers: int | None = None, flush_every: int = 64) -> int:
+    # Captions every image not yet in the index across `workers` threads (default: the model's batch size,
+    # i.e. 1 for a plain LocalLLM; raise it for API captioners), embeds captions and tags in batches, and
+    # flushes every `flush_every` images so an interrupted run keeps its progress. Returns the images added.
+    workers = workers or getattr(cap_model, "max_batch_size", 1)
+    todo, seen = [], set()
+    for path in image_paths:
+        digest = image_hash(path)
+        if digest not in index and digest not in seen:
+            seen.add(digest)
+            todo.append((digest, path))
+    print(f"🖼️  {len(image_paths) - len(todo)}/{len(image_paths)} images already indexed; captioning {len(todo)}")
+
+    pending: list[dict] = []
+    def caption(item: tuple[str, str]) -> dict:
+        digest, path = item
+        text = cap_model.generate(CAPTION_USER_PROMPT, CAPTION_SYSTEM_PROMPT, path)
+        return {"hash": digest, "path": path, "caption": text, "tags": split_motifs(text)}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(caption, item) for item in todo]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="🔄 Captioning images"):
+            pending.append(future.result())
+            if len(pending) >= flush_every:
+                _flush(index, pending, embedder)
+                pending = []
+    if pending:
+        _flush(index, pending, embedder)
+    return len(todo)
+
+def _flush(index: VisionIndex, records: list[dict], embedder: BaseEmbedder) -> None:
+    texts = []
+    for record in records:
+        record["caption_row"] = len(texts)
+        texts.append(record["caption"])
+        record["tag_rows"] = list(range(len(texts), len(texts) + len(record["tags"])))
+        texts.extend(record["tags"])
+    with tracer.span("vision_index.embed", texts=len(texts)):
+        vectors = [vector for start in range(0, len(texts), EMBED_BATCH) for vector in embedder.embed_batch(texts[start : start + EMBED_BATCH])]
+    index.add(records, np.asarray(vectors, dtype=np.float32))
+
+
+# ---------------- UTILS ----------------
+_hash_cache: dict[tuple[str, float, int], str] = {}
+
+def image_hash(image_path: str) -> str:
+    # Content hash, memoized per (path, mtime, size) so repeated lookups do not re-read the file
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime, stat.st_size)
+    if key not in _hash_cache:
+        with open(image_path, "rb") as img_file:
+            _hash_cache[key] = hashlib.sha1(img_file.read()).hexdigest()
+    return _hash_cache[key]
+
+def list_images(dirs: list[str]) -> list[str]:
+    return sorted(path for d in dirs for path in glob.glob(os.path.join(d, "**", "*"), recursive=True) if path.lower().endswith(IMAGE_EXTS))
+
+
+def main(args):
+    from utils.registry import registry
+    index = VisionIndex(args.index_dir, args.cap_model, args.embed_model)
+    added = build_vision_index(index, list_images(args.images), registry.get(args.cap_model), registry.get(args.embed_model), args.workers)
+    print(f"✅ Vision index: {len(index)} images ({added} new) in {args.index_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute captions, tags and embeddings for an image corpus")
+    parser.add_argument("--images", type=str, nargs="+", default=["../example/dataset/images", "../example/generation/paintings"])
+    parser.add_argument("--index_dir", type=str, default="../example/generation/vision_index")
+    parser.add_argument("--cap_model", type=str, default="florence-2-large")
+    parser.add_argument("--embed_model", type=str, default="text-embedding-3-large")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    main(args)
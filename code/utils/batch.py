@@ -0,0 +1,201 @@
+import json, os, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.llm import BaseLLM, _build_messages, json_response_format
+from utils.ratelimit import get_client, budget
+from utils.tracing import tracer
+
+
+# ---------------- BATCH REQUESTS ----------------
+# A request is {"custom_id", "user_prompt", "system_prompt", "img_path", "kwargs"}; each backend
+# serialises it to its own JSONL input and returns {custom_id: {"content": str} | {"error": str}}.
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+MAX_REQUESTS = 50_000  # per OpenAI batch file
+
+def make_request(custom_id: str, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> dict:
+    return {
+        "custom_id": custom_id,
+        "user_prompt": user_prompt,
+        "system_prompt": system_prompt,
+        "img_path": img_path,
+        "kwargs": kwargs,
+    }
+
+def run_batch(backend: "BaseBatchBackend", requests: list[dict], work_dir: str, poll_interval: float = 30.0) -> dict[str, dict]:
+    # Submits in chunks of MAX_REQUESTS, then polls every batch until it reaches a terminal state
+    os.makedirs(work_dir, exist_ok=True)
+    batch_ids = []
+    with tracer.span("batch.submit", requests=len(requests)):
+        for start in range(0, len(requests), MAX_REQUESTS):
+            input_path = os.path.join(work_dir, f"batch_{uuid.uuid4().hex[:8]}.input.jsonl")
+            backend.write_input(requests[start : start + MAX_REQUESTS], input_path)
+            batch_ids.append(backend.submit(input_path))
+            print(f"📤 Submitted batch {batch_ids[-1]} ({min(MAX_REQUESTS, len(requests) - start)} requests)")
+
+    results = {}
+    with tracer.span("batch.wait", batches=len(batch_ids)):
+        pending = list(batch_ids)
+        while pending:
+            for batch_id in list(pending):
+                status = backend.status(batch_id)
+                if status not in TERMINAL_STATES:
+                    continue
+                pending.remove(batch_id)
+                print(f"📥 Batch {batch_id} {status}")
+                results.update(backend.results(batch_id))
+            if pending:
+                time.sleep(poll_interval)
+
+    n_failed = sum("error" in result for result in results.values())
+    n_missing = len(requests) - len(results)
+    tracer.current().add(failed=n_failed, missing=n_missing)
+    if n_failed or n_missing:
+        print(f"⚠️ Warning: {n_failed} requests failed and {n_missing} returned no result")
+    return results
+
+
+# ---------------- BACKENDS ----------------
+class BaseBatchBackend:
+    def write_input(self, requests: list[dict], path: str) -> None:
+        raise NotImplementedError
+
+    def submit(self, input_path: str) -> str:
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> dict[str, dict]:
+        raise NotImplementedError
+
+    def json_kwargs(self, schema: dict | None = None) -> dict:
+        # Request kwargs asking for structured output, where the backend supports it
+        return {}
+
+
+class OpenAIBatchBackend(BaseBatchBackend):
+    # Batch API: half the price of synchronous calls, results within 24h, separate (much higher) quota
+    def __init__(self, model: str, api_key: str|None, base_url: str|None=None):
+        self.client = get_client(api_key, base_url).client
+        self.model = model
+
+    def write_input(self, requests: list[dict], path: str) -> None:
+        with open(path, "w", encoding="utf-8") as input_file:
+            for request in requests:
+                input_file.write(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.model,
+                        "messages": _build_messages(request["user_prompt"], request["system_prompt"], request["img_path"]),
+                        **request["kwargs"],
+                    },
+                }, ensure_ascii=False) + "\n")
+
+    def json_kwargs(self, schema: dict | None = None) -> dict:
+        return {"response_format": json_response_format(schema)}
+
+    def submit(self, input_path: str) -> str:
+        budget.check()
+        with open(input_path, "rb") as input_file:
+            uploaded = self.client.files.create(file=input_file, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> dict[str, dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    results[record["custom_id"]] = {"error": str(record.get("error") or response.get("body"))}
+                    continue
+                body = response["body"]
+                if usage := body.get("usage"):
+                    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+                    budget.charge(self.model, usage["prompt_tokens"], usage.get("completion_tokens", 0), factor=0.5, cached_tokens=cached_tokens)
+                results[record["custom_id"]] = {"content": body["choices"][0]["message"]["content"].strip()}
+        if batch.error_file_id:
+            for line in self.client.files.content(batch.error_file_id).text.splitlines():
+                record = json.loads(line)
+                results[record["custom_id"]] = {"error": str(record.get("error") or record.get("response"))}
+        return results
+
+
+class LocalBatchBackend(BaseBatchBackend):
+    # File-based stand-in with the same lifecycle: submit() records the input file, the first status()
+    # call runs every request through `llm` and writes <batch_id>.output.jsonl in the Batch API layout.
+    # Requests are issued concurrently when the model batches internally (BatchedLocalLLM).
+    def __init__(self, llm: BaseLLM, work_dir: str, workers: int | None = None):
+        self.llm = llm
+        self.work_dir = work_dir
+        self.workers = workers or getattr(llm, "max_batch_size", 1)
+
+    def write_input(self, requests: list[dict], path: str) -> None:
+        with open(path, "w", encoding="utf-8") as input_file:
+            for request in requests:
+                input_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+    def submit(self, input_path: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex[:12]}"
+        with open(self._path(batch_id, "json"), "w", encoding="utf-8") as meta_file:
+            json.dump({"id": batch_id, "input_file": input_path}, meta_file)
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if not os.path.exists(self._path(batch_id, "output.jsonl")):
+            self._process(batch_id)
+        return "completed"
+
+    def results(self, batch_id: str) -> dict[str, dict]:
+        results = {}
+        with open(self._path(batch_id, "output.jsonl"), encoding="utf-8") as output_file:
+            for line in output_file:
+                record = json.loads(line)
+                if record["error"]:
+                    results[record["custom_id"]] = {"error": record["error"]}
+                else:
+                    results[record["custom_id"]] = {"content": record["response"]["body"]["choices"][0]["message"]["content"]}
+        return results
+
+    def _process(self, batch_id: str) -> None:
+        with open(self._path(batch_id, "json"), encoding="utf-8") as meta_file:
+            input_path = json.load(meta_file)["input_file"]
+        with open(input_path, encoding="utf-8") as input_file:
+            requests = [json.loads(line) for line in input_file]
+        tmp_path = self._path(batch_id, "output.jsonl.tmp")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool, open(tmp_path, "w", encoding="utf-8") as output_file:
+            for record in pool.map(self._respond, requests):
+                output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._path(batch_id, "output.jsonl"))
+
+    def _respond(self, request: dict) -> dict:
+        record = {"custom_id": request["custom_id"], "response": None, "error": None}
+        try:
+            content = self.llm.generate(request["user_prompt"], request["system_prompt"], request["img_path"], **request["kwargs"])
+            record["response"] = {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    def _path(self, batch_id: str, suffix: str) -> str:
+        return os.path.join(self.work_dir, f"{batch_id}.{suffix}")
+
+
+def make_batch_backend(kind: str, model: str, work_dir: str) -> BaseBatchBackend:
+    if kind == "openai":
+        return OpenAIBatchBackend(model, os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL"))
+    if kind == "local":
+        from utils.registry import registry
+        return LocalBatchBackend(registry.get(model), work_dir)
+    raise ValueError(f"Unsupported batch backend: {kind}")
@@ -0,0 +1,203 @@
+import json
+import numpy as np
+
+from utils.graph import NODE_TYPES, InMemoryGraph, AliasIndex, ExpansionLimits
+from utils.vector_store import VectorStore
+
+
+# ---------------- COMPACT GRAPH ----------------
+# Read-only serving snapshot of an InMemoryGraph. Node and rel ids are dense integers; everything a query
+# touches is an array or a shared table built once:
+#   node_type[n], supernode[n]                       type code (into types) / supernode flag per node
+#   names[name_id[n]]                                interned node names
+#   indptr[n]:indptr[n+1] slices dst, rel_type       CSR out-adjacency; a rel id is its CSR position
+#   desc_table[desc_ptr[n]:desc_ptr[n+1]]            node descriptions, one string
+#   *_json / *_json_ptr                              each node/rel pre-rendered as its context JSON object
+#   vectors (row i = node form_ids[i])               Form embeddings, optionally int8/binary (utils/vector_store.py)
+# Retrieval returns integer ids (CompactContext); text is only produced by render() at prompt time, and
+# render() is byte-identical to serialize_context() of the formatter output for the same paths.
+class CompactGraph:
+    def __init__(self):
+        self.types = sorted(NODE_TYPES)
+        self.rel_types: list[str] = []
+        self.names: list[str] = []
+        self.name_id = np.zeros(0, dtype=np.int32)
+        self.node_type = np.zeros(0, dtype=np.int8)
+        self.supernode = np.zeros(0, dtype=bool)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.dst = np.zeros(0, dtype=np.int32)
+        self.rel_type = np.zeros(0, dtype=np.int16)
+        self.desc_table, self.desc_ptr = "", np.zeros(1, dtype=np.int64)
+        self.node_json, self.node_json_ptr = "", np.zeros(1, dtype=np.int64)
+        self.rel_json, self.rel_json_ptr = "", np.zeros(1, dtype=np.int64)
+        self.form_ids = np.zeros(0, dtype=np.int32)
+        self.vectors = VectorStore(np.zeros((0, 0), dtype=np.float32))
+        self.aliases = AliasIndex()
+        self._degrees = None
+        self._ranked_out: dict[int, list[int]] = {}
+        self._views()
+
+    @classmethod
+    def from_graph(cls, graph: InMemoryGraph, quantization: str = "float", rescore: int = 4) -> "CompactGraph":
+        cg = cls()
+        live = [node for node in graph.nodes if node]
+        remap = {node["id"]: i for i, node in enumerate(live)}
+        for node in live:
+            if node["labels"][-1] not in cg.types:
+                cg.types.append(node["labels"][-1])
+
+        interned: dict[str, int] = {}
+        names = [node["name"] or "(unnamed)" for node in live]
+        cg.name_id = np.array([interned.setdefault(name, len(interned)) for name in names], dtype=np.int32)
+        cg.names = list(interned)
+        cg.node_type = np.array([cg.types.index(node["labels"][-1]) for node in live], dtype=np.int8)
+        cg.supernode = np.array([bool(node.get("supernode")) for node in live], dtype=bool)
+
+        rel_codes: dict[str, int] = {}
+        out_rels = [[graph.rels[rel_id] for rel_id in graph.out[node["id"]]] for node in live]
+        cg.indptr = np.concatenate([[0], np.cumsum([len(rels) for rels in out_rels])]).astype(np.int64)
+        cg.dst = np.array([remap[rel["end"]] for rels in out_rels for rel in rels], dtype=np.int32)
+        cg.rel_type = np.array([rel_codes.setdefault(rel["type"], len(rel_codes)) for rels in out_rels for rel in rels], dtype=np.int16)
+        cg.rel_types = list(rel_codes)
+
+        descriptions = [_clean_text(node["description"]) for node in live]
+        cg.desc_table, cg.desc_ptr = _string_table(descriptions)
+        cg.node_json, cg.node_json_ptr = _string_table([
+            _dumps({"type": node["labels"][-1], "name": name, "description": description})
+            for node, name, description in zip(live, names, descriptions)
+        ])
+        cg.rel_json, cg.rel_json_ptr = _string_table([
+            _dumps({"type": rel["type"], "source": names[remap[rel["start"]]], "target": names[remap[rel["end"]]], "description": _clean_text(rel["description"])})
+            for rels in out_rels for rel in rels
+        ])
+
+        embedded = [node_id for node_id in graph.embeddings if node_id in remap]
+        cg.form_ids = np.array([remap[node_id] for node_id in embedded], dtype=np.int32)
+        if embedded:
+            cg.vectors = VectorStore(np.stack([graph.embeddings[node_id] for node_id in embedded]).astype(np.float32), quantization, rescore)
+        cg.aliases = AliasIndex([(remap[node["id"]], node["name"], node.get("aliases")) for node in live if node["labels"][-1] == "Form"])
+
+        cg._views()
+        return cg
+
+    def __len__(self) -> int:
+        return len(self.node_type)
+
+    def nbytes(self) -> int:
+        # Array and string-table payload (the name list and alias index not included)
+        arrays = [self.name_id, self.node_type, self.supernode, self.indptr, self.dst, self.rel_type,
+                  self.desc_ptr, self.node_json_ptr, self.rel_json_ptr, self.form_ids]
+        return sum(a.nbytes for a in arrays) + self.vectors.nbytes() + sum(len(s.encode("utf-8")) for s in (self.desc_table, self.node_json, self.rel_json))
+
+    def _views(self) -> None:
+        # memoryviews for the path walk: indexing yields Python ints without copying the arrays
+        self._indptr = memoryview(self.indptr)
+        self._dst = memoryview(self.dst)
+        self._myth = memoryview(self.node_type == self.types.index("Myth"))
+        self._form = memoryview(self.node_type == self.types.index("Form"))
+
+    # --- Reads ---
+    def vector_search(self, query_vector, top_k: int = 5) -> list[tuple[int, float]]:
+        # Neo4j reports cosine similarity rescaled to [0, 1]
+        return [(int(self.form_ids[row]), (score + 1) / 2) for row, score in self.vectors.search(query_vector, top_k)]
+
+    def expand(self, seeds: list[tuple[int, float]], per_seed_limit: int = 10, limits: ExpansionLimits | None = None) -> "CompactContext":
+        # Same paths and ranking as InMemoryGraph.expand, as id arrays
+        paths = []
+        for seed_id, score in seeds:
+            for rel_ids in self._paths_to_myths(seed_id, limits):
+                paths.append((score / len(rel_ids), rel_ids))
+        paths.sort(key=lambda path: path[0], reverse=True)
+        return self.subgraph([rel_ids for _, rel_ids in paths[:per_seed_limit]])
+
+    def candidate_paths(self, seeds: list[tuple[int, float]], limits: ExpansionLimits | None = None) -> list[tuple[int, float, list[int], list[int]]]:
+        return [
+            (seed_id, score, [seed_id] + [self._dst[rel_id] for rel_id in rel_ids], rel_ids)
+            for seed_id, score in seeds
+            for rel_ids in self._paths_to_myths(seed_id, limits)
+        ]
+
+    def degrees(self) -> np.ndarray:
+        # Undirected degree per node id
+        if self._degrees is None:
+            self._degrees = np.diff(self.indptr) + np.bincount(self.dst, minlength=len(self))
+        return self._degrees
+
+    def subgraph(self, paths: list[list[int]]) -> "CompactContext":
+        # Unique node/rel ids of the given rel-id paths, in first-seen order (as InMemoryGraph.subgraph)
+        node_ids, rel_ids = {}, {}
+        for path in paths:
+            node_ids.setdefault(self._src(path[0]), None)
+            for rel_id in path:
+                node_ids.setdefault(self._dst[rel_id], None)
+                rel_ids.setdefault(rel_id, None)
+        return CompactContext(self, np.fromiter(node_ids, dtype=np.int32, count=len(node_ids)), np.fromiter(rel_ids, dtype=np.int32, count=len(rel_ids)))
+
+    def name(self, node_id: int) -> str:
+        return self.names[self.name_id[node_id]]
+
+    def description(self, node_id: int) -> str:
+        return self.desc_table[self.desc_ptr[node_id] : self.desc_ptr[node_id + 1]]
+
+    def _src(self, rel_id: int) -> int:
+        return int(np.searchsorted(self.indptr, rel_id, side="right")) - 1
+
+    def _paths_to_myths(self, start: int, limits: ExpansionLimits | None = None) -> list[list[int]]:
+        if not self._form[start]:
+            return []
+        indptr, dst, myth = self._indptr, self._dst, self._myth
+        found, stack = [], [(start, [])]
+        while stack:
+            node_id, path = stack.pop()
+            if limits and len(path) >= limits.max_hops:
+                continue
+            for rel_id in (self._capped_out(node_id, limits) if limits else range(indptr[node_id], indptr[node_id + 1])):
+                if rel_id in path:
+                    continue
+                new_path = path + [rel_id]
+                if myth[dst[rel_id]]:
+                    found.append(new_path)
+                stack.append((dst[rel_id], new_path))
+        return found
+
+    def _capped_out(self, node_id: int, limits: ExpansionLimits) -> list[int]:
+        if node_id not in self._ranked_out:
+            self._ranked_out[node_id] = sorted(range(self._indptr[node_id], self._indptr[node_id + 1]), key=lambda rel_id: (
+                not self._myth[self._dst[rel_id]],
+                self._indptr[self._dst[rel_id] + 1] - self._indptr[self._dst[rel_id]],
+            ))
+        return self._ranked_out[node_id][:limits.supernode_fanout if self.supernode[node_id] else limits.max_neighbors]
+
+
+class CompactContext:
+    # Retrieved node/rel ids; text only on render() (prompt) or to_dict() (saved outputs)
+    def __init__(self, graph: CompactGraph, node_ids: np.ndarray, rel_ids: np.ndarray):
+        self.graph = graph
+        self.node_ids = node_ids
+        self.rel_ids = rel_ids
+
+    def render(self) -> str:
+        # == serialize_context(to_dict()): the pre-rendered objects joined into the sorted, compact layout
+        g = self.graph
+        entities = _join(g.node_json, g.node_json_ptr, self.node_ids)
+        relations = _join(g.rel_json, g.rel_json_ptr, self.rel_ids)
+        return f'{{"entities":[{entities}],"relations":[{relations}]}}'
+
+    def to_dict(self) -> dict:
+        return json.loads(self.render())
+
+
+# ---------------- UTILS ----------------
+def _clean_text(s) -> str:
+    # As formatter's clean_text
+    return "" if not s else str(s).replace("\n", " ").replace("\r", " ").strip()
+
+def _dumps(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+def _join(table: str, ptr: np.ndarray, ids: np.ndarray) -> str:
+    return ",".join([table[start:end] for start, end in zip(ptr[ids].tolist(), ptr[ids + 1].tolist())])
+
+def _string_table(strings: list[str]) -> tuple[str, np.ndarray]:
+    # One string plus offsets; entry i is table[ptr[i]:ptr[i+1]]
+    return "".join(strings), np.concatenate([[0], np.cumsum([len(s) for s in strings])]).astype(np.int64)
@@ -0,0 +1,83 @@
+import hashlib, json, random, re, time, zlib
+import numpy as np
+
+from utils.llm import BaseLLM, BaseEmbedder
+from utils.prompts import EXTRACT_SYSTEM_PROMPT, CAPTION_SYSTEM_PROMPT
+
+
+# ---------------- FAKE MODELS ----------------
+# Deterministic stand-ins for the OpenAI/local wrappers: same interface, no network, configurable latency.
+
+class FakeLLM(BaseLLM):
+    def __init__(self, graph_data: dict, latency: float = 0.0, jitter: float = 0.0, tokens_per_second: float = 0.0, malformed_rate: float = 0.0, seed: int = 0):
+        self.model = "fake-llm"
+        self.malformed_rate = malformed_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.rng = random.Random(seed)
+        self.entities = graph_data["entities"]
+        self.relations = graph_data["relations"]
+        self.forms = [e["name"] for e in self.entities if e["type"] == "Form"]
+
+    def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
+        digest = int(hashlib.sha1(f"{system_prompt}{user_prompt}{img_path}".encode("utf-8")).hexdigest()[:8], 16)
+        if system_prompt == EXTRACT_SYSTEM_PROMPT:
+            response = self._extraction(digest)
+            if self.rng.random() < self.malformed_rate:
+                # Simulates a reply cut off mid-stream or wrapped in prose
+                response = self.rng.choice([response[: self.rng.randrange(len(response))], f"Here is the JSON:\n```json\n{response}\n```"])
+        elif system_prompt == CAPTION_SYSTEM_PROMPT:
+            response = ", ".join(self._pick(self.forms, digest, 6)).lower()
+        else:
+            response = " ".join(["interpretation"] * 150)
+        self._sleep(len(response.split()))
+        return response
+
+    def _extraction(self, digest: int) -> str:
+        # A coherent slice of the reference graph: a few relations plus every entity they mention
+        rels = self._pick(self.relations, digest, 4)
+        names = {rel.get("source") for rel in rels} | {rel["target"] for rel in rels}
+        names |= {name for rel in rels for name in rel.get("source_concepts", [])}
+        entities = [entity for entity in self.entities if entity["name"] in names]
+        return json.dumps({"entities": entities, "relations": rels}, ensure_ascii=False)
+
+    def _pick(self, items: list, digest: int, k: int) -> list:
+        if not items:
+            return []
+        start = digest % len(items)
+        return [items[(start + i) % len(items)] for i in range(min(k, len(items)))]
+
+    def _sleep(self, n_tokens: int) -> None:
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if self.tokens_per_second:
+            delay += n_tokens / self.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeEmbedder(BaseEmbedder):
+    # Bag-of-words hashing embedder: shared words give similar vectors, so retrieval is meaningful
+    def __init__(self, dimension: int = 256, latency: float = 0.0):
+        self.model = "fake-embedder"
+        self.dimension = dimension
+        self.latency = latency
+        self._cache: dict[str, np.ndarray] = {}
+
+    def embed(self, text: str) -> list[float]:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", re.sub(r"([a-z])([A-Z])", r"\1 \2", text).lower()):
+            vector += self._word_vector(word)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_dimension(self) -> int:
+        return self.dimension
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        if word not in self._cache:
+            rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+            self._cache[word] = rng.standard_normal(self.dimension).astype(np.float32)
+        return self._cache[word]
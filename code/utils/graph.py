@@ -0,0 +1,392 @@
+import hashlib, re, unicodedata
+import numpy as np
+
+from utils.tracing import tracer
+
+
+NODE_TYPES = {"Form", "Concept", "Myth", "JointConcept"}
+
+
+# ---------------- NORMALIZATION ----------------
+def sanitize_label(raw: str) -> str:
+    tokens = re.split(r'[^A-Za-z0-9]+', raw)
+    tokens = [t for t in tokens if t]
+    label = ''.join(t[:1].upper() + t[1:] for t in tokens)
+    if not label or not label[0].isalpha():
+        label = "Entity" + label  # ensure starts with a letter
+    return label
+
+def plan_relation(rel: dict) -> tuple[dict | None, list[tuple[str, str, str, str, str]]]:
+    # Maps an extracted relation to (optional JointConcept entity, [(src_type, src, rel_type, tgt_type, tgt)]).
+    # Shared by the Neo4j writer and the in-memory graph so both build the same structure.
+    rel_type = rel["type"].upper().replace(" ", "_")
+    if rel_type == "CONNOTES":
+        # Edge from Form to Concept
+        return None, [("Form", sanitize_label(rel["source"]), rel_type, "Concept", sanitize_label(rel["target"]))]
+    if rel_type == "GENERATES_MYTH":
+        target = sanitize_label(rel["target"])
+        if len(rel["source_concepts"]) == 1:
+            # Edge from Concept to Myth
+            return None, [("Concept", sanitize_label(rel["source_concepts"][0]), rel_type, "Myth", target)]
+        # Intermediate JointConcept node: Concepts -PART_OF-> JointConcept -GENERATES_MYTH-> Myth
+        joint_concept = {
+            "type": "JointConcept",
+            "name": sanitize_label("+".join(sorted(rel["source_concepts"]))),
+            "description": f"Joint form of concepts: {', '.join(rel['source_concepts'])}",
+        }
+        edges = [("Concept", sanitize_label(source), "PART_OF", "JointConcept", joint_concept["name"]) for source in rel["source_concepts"]]
+        edges.append(("JointConcept", joint_concept["name"], rel_type, "Myth", target))
+        return joint_concept, edges
+    raise ValueError(f"Unsupported relationship type: {rel_type}")
+
+def form_embed_text(entity: dict) -> str:
+    embed_text = entity['name']
+    if entity.get("aliases"):
+        embed_text += ". " + ". ".join(entity['aliases'])
+    # embed_text += ". " + entity['description']
+    return embed_text
+
+
+# ---------------- DESIRED STATE & DIFF ----------------
+# Extraction output → the graph it should produce, keyed the way MERGE keys it:
+#   nodes[(type, name)] = {"type", "name", "description", "aliases", "sources", "embed_text", "embed_hash"}
+#   edges[(src_type, src, rel_type, tgt_type, tgt)] = {"description", "sources"}
+# Both graph backends are written only through diffs between two such states.
+EdgeKey = tuple[str, str, str, str, str]
+
+def plan_graph(data: dict) -> tuple[dict, dict]:
+    nodes: dict[tuple[str, str], dict] = {}
+    edges: dict[EdgeKey, dict] = {}
+    for entity in data["entities"]:
+        _merge_node(nodes, entity)
+    for rel in data["relations"]:
+        joint_concept, planned = plan_relation(rel)
+        if joint_concept:
+            _merge_node(nodes, {**joint_concept, "sources": rel.get("sources", [])})
+        for key in planned:
+            if (key[0], key[1]) not in nodes or (key[3], key[4]) not in nodes:
+                print(f"⚠️ Warning: could not create edge {key[1]}-[{key[2]}]->{key[4]}")
+                tracer.count("graph.dangling_edges")
+                continue
+            edge = edges.setdefault(key, {"description": rel.get("description"), "sources": []})
+            edge["description"] = edge["description"] or rel.get("description")
+            edge["sources"] = sorted(set(edge["sources"]) | set(rel.get("sources", [])))
+    for node in nodes.values():
+        if node["type"] == "Form":
+            node["embed_text"] = form_embed_text({"name": node.pop("display_name"), "aliases": node["aliases"]})
+            node["embed_hash"] = hashlib.sha1(node["embed_text"].encode("utf-8")).hexdigest()[:16]
+        else:
+            node.pop("display_name")
+    return nodes, edges
+
+def _merge_node(nodes: dict, entity: dict) -> None:
+    if entity["type"] not in NODE_TYPES:
+        raise ValueError(f"Unsupported entity type: {entity['type']}")
+    key = (entity["type"], sanitize_label(entity["name"]))
+    node = nodes.setdefault(key, {
+        "type": key[0],
+        "name": key[1],
+        "display_name": entity["name"],
+        "description": entity.get("description"),
+        "aliases": [],
+        "sources": [],
+    })
+    node["description"] = node["description"] or entity.get("description")
+    node["aliases"] = sorted(set(node["aliases"]) | set(entity.get("aliases") or []))
+    node["sources"] = sorted(set(node["sources"]) | set(entity.get("sources") or []))
+
+def diff_graph(current: tuple[dict, dict], desired: tuple[dict, dict], remove: bool = True) -> dict:
+    # What to write to turn `current` into `desired`; with remove=False nothing is deleted (plain upsert)
+    cur_nodes, cur_edges = current
+    new_nodes, new_edges = desired
+    node_props = lambda n: (n.get("description"), list(n.get("aliases") or []), list(n.get("sources") or []))
+    diff = {
+        "upsert_nodes": [n for k, n in new_nodes.items() if k not in cur_nodes or node_props(cur_nodes[k]) != node_props(n)],
+        "embed_nodes":  [n for k, n in new_nodes.items() if n["type"] == "Form" and (cur_nodes.get(k) or {}).get("embed_hash") != n["embed_hash"]],
+        "upsert_edges": [(k, e) for k, e in new_edges.items() if k not in cur_edges or (cur_edges[k].get("description"), list(cur_edges[k].get("sources") or [])) != (e["description"], e["sources"])],
+        "remove_edges": [k for k in cur_edges if k not in new_edges] if remove else [],
+        "remove_nodes": [k for k in cur_nodes if k not in new_nodes] if remove else [],
+    }
+    for name, changes in diff.items():
+        tracer.current().add(**{name: len(changes)})
+    return diff
+
+def diff_summary(diff: dict) -> str:
+    return ", ".join(f"{len(changes)} {name.replace('_', ' ')}" for name, changes in diff.items())
+
+def _merged_props(current: dict, new: dict) -> dict:
+    # Plain-upsert semantics: a stored description wins, list properties are unioned in stored order
+    merged = {"description": current.get("description") or new.get("description")}
+    for prop in ("aliases", "sources"):
+        if prop in new:
+            stored = list(current.get(prop) or [])
+            merged[prop] = stored + [x for x in new[prop] or [] if x not in stored]
+    return merged
+
+
+# ---------------- ALIAS INDEX ----------------
+class AliasIndex:
+    # Normalized Form name/alias → Form ids, so caption motifs that name a Form exactly skip the
+    # embedding call and the ANN query. Whole-motif matches only, so a dict is all it needs.
+    # Stored names are sanitize_label output, which is ASCII only: a Korean name is stored as the
+    # "Entity" placeholder, so placeholders are never indexed and Korean text matches via the raw aliases.
+    def __init__(self, forms: list[tuple] = ()):
+        self.index: dict[str, list] = {}
+        for form_id, name, aliases in forms:
+            texts = ([] if PLACEHOLDER_RE.match(name) else [name]) + list(aliases or [])
+            for key in {normalize_motif(text) for text in texts} - {""}:
+                ids = self.index.setdefault(key, [])
+                if form_id not in ids:
+                    ids.append(form_id)
+
+    @classmethod
+    def from_graph(cls, graph: "InMemoryGraph") -> "AliasIndex":
+        return cls([(node["id"], node["name"], node.get("aliases")) for node in graph.nodes if node and node["labels"][-1] == "Form"])
+
+    def lookup(self, motif: str) -> list:
+        key = normalize_motif(motif)
+        return self.index.get(key, []) if key else []
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+# sanitize_label's fallback for names with no ASCII letter first ("호랑이" → "Entity", "1900" → "Entity1900")
+PLACEHOLDER_RE = re.compile(r"Entity(\d|$)")
+
+def normalize_motif(text: str) -> str:
+    # Unicode-aware: NFKC, casefold, letters and digits only ("pine tree" == "PineTree", "호랑이 " == "호랑이")
+    return "".join(ch for ch in unicodedata.normalize("NFKC", text).casefold() if ch.isalnum())
+
+
+# ---------------- EXPANSION LIMITS ----------------
+# Generic Concepts ("Power", "Protection") reach many Myths, so unbounded [*1..] expansion fans out through
+# them. After ingestion every node stores out_degree/in_degree and a `supernode` flag (out-degree at or above
+# the threshold below); retrieval with ExpansionLimits then walks hop by hop, keeps at most `max_neighbors`
+# out-neighbours per node (Myths first, then the most specific, i.e. lowest out-degree) and only
+# `supernode_fanout` through a supernode (0 prunes them).
+SUPERNODE_QUANTILE = 0.99
+SUPERNODE_MIN_DEGREE = 20
+
+class ExpansionLimits:
+    def __init__(self, max_hops: int = 4, max_neighbors: int = 8, supernode_fanout: int = 2):
+        self.max_hops = max_hops
+        self.max_neighbors = max_neighbors
+        self.supernode_fanout = supernode_fanout
+
+    def fanout(self, node: dict) -> int:
+        return self.supernode_fanout if node.get("supernode") else self.max_neighbors
+
+def supernode_threshold(out_degrees, quantile: float = SUPERNODE_QUANTILE, min_degree: int = SUPERNODE_MIN_DEGREE) -> int:
+    if not len(out_degrees):
+        return min_degree
+    return max(min_degree, int(np.ceil(np.quantile(out_degrees, quantile))))
+
+
+# ---------------- IN-MEMORY GRAPH ----------------
+class InMemoryGraph:
+    # Embedded stand-in for the Neo4j graph: written through the same diffs as the Neo4j writer,
+    # cosine vector search over Form embeddings, and the path expansion of RETRIEVAL_CYPHER.
+    # Deleted nodes/rels leave a None slot so ids stay stable.
+    def __init__(self):
+        self.nodes: list[dict | None] = []
+        self.node_index: dict[tuple[str, str], int] = {}
+        self.rels: list[dict | None] = []
+        self.rel_index: dict[EdgeKey, int] = {}
+        self.out: list[list[int]] = []
+        self.embeddings: dict[int, np.ndarray] = {}
+        self._matrix = None
+        self._degrees = None
+        self._ranked_out: dict[int, list[int]] = {}
+
+    # --- Writes ---
+    def state(self) -> tuple[dict, dict]:
+        nodes = {(n["labels"][-1], n["name"]): {**n, "type": n["labels"][-1]} for n in self.nodes if n}
+        edges = {key: self.rels[rel_id] for key, rel_id in self.rel_index.items()}
+        return nodes, edges
+
+    def apply(self, diff: dict, replace: bool = True) -> None:
+        # replace=False merges into existing nodes/edges like a plain Neo4j upsert (see upsert_nodes)
+        self._degrees = None
+        self._ranked_out = {}
+        for key in diff["remove_edges"]:
+            rel_id = self.rel_index.pop(key)
+            self.out[self.rels[rel_id]["start"]].remove(rel_id)
+            self.rels[rel_id] = None
+        for key in diff["remove_nodes"]:
+            node_id = self.node_index.pop(key)
+            for rel_id in list(self.out[node_id]) + [r for r, rel in enumerate(self.rels) if rel and rel["end"] == node_id]:
+                if self.rels[rel_id]:
+                    self._remove_rel(rel_id)
+            self.nodes[node_id] = None
+            self.embeddings.pop(node_id, None)
+            self._matrix = None
+        for node in diff["upsert_nodes"]:
+            self._upsert_node(node, replace)
+        for key, edge in diff["upsert_edges"]:
+            self._upsert_edge(key, edge, replace)
+
+    def set_embeddings(self, ids: list[int], vectors: list, hashes: list[str] | None = None) -> None:
+        for i, (node_id, vector) in enumerate(zip(ids, vectors)):
+            self.embeddings[node_id] = np.asarray(vector, dtype=np.float32)
+            if hashes:
+                self.nodes[node_id]["embed_hash"] = hashes[i]
+        self._matrix = None
+
+    def compute_degree_stats(self, quantile: float = SUPERNODE_QUANTILE, min_degree: int = SUPERNODE_MIN_DEGREE) -> int:
+        in_degrees = np.zeros(len(self.nodes), dtype=np.int64)
+        for rel in self.rels:
+            if rel:
+                in_degrees[rel["end"]] += 1
+        live = [node for node in self.nodes if node]
+        threshold = supernode_threshold([len(self.out[node["id"]]) for node in live], quantile, min_degree)
+        for node in live:
+            node["out_degree"] = len(self.out[node["id"]])
+            node["in_degree"] = int(in_degrees[node["id"]])
+            node["supernode"] = node["out_degree"] >= threshold
+        self._ranked_out = {}
+        return threshold
+
+    def _upsert_node(self, node: dict, replace: bool = True) -> int:
+        key = (node["type"], node["name"])
+        props = {"description": node.get("description"), "aliases": node.get("aliases", []), "sources": node.get("sources", [])}
+        if (node_id := self.node_index.get(key)) is not None:
+            self.nodes[node_id].update(props if replace else _merged_props(self.nodes[node_id], props))
+            return node_id
+        node_id = len(self.nodes)
+        self.nodes.append({"id": node_id, "labels": [node["type"]], "name": node["name"], "embed_hash": None, **props})
+        self.node_index[key] = node_id
+        self.out.append([])
+        return node_id
+
+    def _upsert_edge(self, key: EdgeKey, edge: dict, replace: bool = True) -> None:
+        if (rel_id := self.rel_index.get(key)) is not None:
+            props = {"description": edge["description"], "sources": edge["sources"]}
+            self.rels[rel_id].update(props if replace else _merged_props(self.rels[rel_id], props))
+            return
+        start = self.node_index[(key[0], key[1])]
+        end = self.node_index[(key[3], key[4])]
+        self.rel_index[key] = len(self.rels)
+        self.out[start].append(len(self.rels))
+        self.rels.append({"type": key[2], "start": start, "end": end, "description": edge["description"], "sources": edge["sources"]})
+
+    def _remove_rel(self, rel_id: int) -> None:
+        rel = self.rels[rel_id]
+        start, end = self.nodes[rel["start"]], self.nodes[rel["end"]]
+        self.rel_index.pop((start["labels"][-1], start["name"], rel["type"], end["labels"][-1], end["name"]), None)
+        self.out[rel["start"]].remove(rel_id)
+        self.rels[rel_id] = None
+
+    # --- Reads ---
+    def vector_search(self, query_vector, top_k: int = 5) -> list[tuple[int, float]]:
+        if not self.embeddings:
+            return []
+        if self._matrix is None:
+            ids = np.fromiter(self.embeddings, dtype=np.int64)
+            mat = np.stack([self.embeddings[i] for i in ids])
+            self._matrix = (ids, mat / np.maximum(np.linalg.norm(mat, axis=1, keepdims=True), 1e-12))
+        ids, mat = self._matrix
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = mat @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        top = np.argsort(-scores)[:top_k]
+        # Neo4j reports cosine similarity rescaled to [0, 1]
+        return [(int(ids[i]), float((scores[i] + 1) / 2)) for i in top]
+
+    def expand(self, seeds: list[tuple[int, float]], per_seed_limit: int = 10, limits: ExpansionLimits | None = None) -> dict | None:
+        # Paths (Form)-[*1..]->(Myth) from every seed, ranked by score / length, top `per_seed_limit` overall
+        paths = []
+        for seed_id, score in seeds:
+            for rel_ids in self._paths_to_myths(seed_id, limits):
+                paths.append((score / len(rel_ids), rel_ids))
+        if not paths:
+            return None
+        paths.sort(key=lambda path: path[0], reverse=True)
+        return self.subgraph([rel_ids for _, rel_ids in paths[:per_seed_limit]])
+
+    def candidate_paths(self, seeds: list[tuple[int, float]], limits: ExpansionLimits | None = None) -> list[tuple[int, float, list[int], list[int]]]:
+        # Every (seed id, seed score, node ids, rel ids) path from the seeds to a Myth, unranked
+        return [
+            (seed_id, score, [self.rels[rel_ids[0]]["start"]] + [self.rels[rel_id]["end"] for rel_id in rel_ids], rel_ids)
+            for seed_id, score in seeds
+            for rel_ids in self._paths_to_myths(seed_id, limits)
+        ]
+
+    def expansion_hotspots(self, top_n: int = 20, limits: ExpansionLimits | None = None) -> list[dict]:
+        # Nodes that the most Form→Myth paths pass through (excluding endpoints), i.e. where expansion
+        # from any seed spends its time; compare with and without `limits`
+        through = np.zeros(len(self.nodes), dtype=np.int64)
+        n_paths = 0
+        for node in self.nodes:
+            if node and node["labels"][-1] == "Form":
+                for rel_ids in self._paths_to_myths(node["id"], limits):
+                    n_paths += 1
+                    for rel_id in rel_ids[:-1]:
+                        through[self.rels[rel_id]["end"]] += 1
+        return [{
+            "type": self.nodes[i]["labels"][-1],
+            "name": self.nodes[i]["name"],
+            "out_degree": len(self.out[i]),
+            "supernode": bool(self.nodes[i].get("supernode")),
+            "paths": int(through[i]),
+            "share": float(through[i] / n_paths) if n_paths else 0.0,
+        } for i in np.argsort(-through)[:top_n] if through[i]]
+
+    def degrees(self) -> np.ndarray:
+        # Undirected degree per node id, cached until the next write
+        if self._degrees is None:
+            degrees = np.zeros(len(self.nodes), dtype=np.int64)
+            for rel in self.rels:
+                if rel:
+                    degrees[rel["start"]] += 1
+                    degrees[rel["end"]] += 1
+            self._degrees = degrees
+        return self._degrees
+
+    def subgraph(self, paths: list[list[int]]) -> dict:
+        # Unique nodes/rels of the given rel-id paths, in RETRIEVAL_CYPHER's record layout
+        node_ids, rel_ids = {}, {}
+        for path in paths:
+            node_ids.setdefault(self.rels[path[0]]["start"], None)
+            for rel_id in path:
+                node_ids.setdefault(self.rels[rel_id]["end"], None)
+                rel_ids.setdefault(rel_id, None)
+        return {
+            "nodes": [{
+                "id": self.nodes[n]["id"],
+                "labels": self.nodes[n]["labels"],
+                "name": self.nodes[n]["name"] or "(unnamed)",
+                "description": self.nodes[n]["description"] or "",
+            } for n in node_ids],
+            "rels": [{
+                "type": self.rels[r]["type"],
+                "start": self.rels[r]["start"],
+                "end": self.rels[r]["end"],
+                "description": self.rels[r]["description"] or "",
+            } for r in rel_ids],
+        }
+
+    def _paths_to_myths(self, start: int, limits: ExpansionLimits | None = None) -> list[list[int]]:
+        if self.nodes[start]["labels"][-1] != "Form":
+            return []
+        found, stack = [], [(start, [])]
+        while stack:
+            node_id, path = stack.pop()
+            if limits and len(path) >= limits.max_hops:
+                continue
+            for rel_id in (self._capped_out(node_id, limits) if limits else self.out[node_id]):
+                if rel_id in path:
+                    continue
+                end = self.rels[rel_id]["end"]
+                new_path = path + [rel_id]
+                if self.nodes[end]["labels"][-1] == "Myth":
+                    found.append(new_path)
+                stack.append((end, new_path))
+        return found
+
+    def _capped_out(self, node_id: int, limits: ExpansionLimits) -> list[int]:
+        # Out-rels ordered Myths first, then by ascending target out-degree; cut to the node's fanout
+        if node_id not in self._ranked_out:
+            self._ranked_out[node_id] = sorted(self.out[node_id], key=lambda rel_id: (
+                self.nodes[self.rels[rel_id]["end"]]["labels"][-1] != "Myth",
+                len(self.out[self.rels[rel_id]["end"]]),
+            ))
+        return self._ranked_out[node_id][:limits.fanout(self.nodes[node_id])]
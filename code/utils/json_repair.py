@@ -0,0 +1,128 @@
+import json, re
+from typing import Any
+
+from utils.tracing import tracer
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+# ---------------- PARSING ----------------
+FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+def parse_json(text: str) -> Any:
+    # Fast path first; repair only runs on the rare malformed or truncated reply
+    try:
+        return json.loads(text, strict=False)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    candidate = _json_span(text or "")
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = json.loads(repair_json(candidate), strict=False)
+        tracer.count("json.repaired")
+        return value
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"Unrecoverable JSON ({e.msg} at {e.pos}): {candidate[:80]!r}") from e
+
+def repair_json(text: str) -> str:
+    # Single pass over the text tracking strings and open containers. Fixes trailing commas, ignores
+    # trailing prose, and on truncation drops the incomplete last element before closing every container,
+    # so a reply cut off by max_tokens keeps all of its complete entities and relations.
+    out: list[str] = []
+    stack: list[list] = []  # [closer, output length after the last complete member, output length at open]
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            out.append(ch)
+            stack.append(["}" if ch == "{" else "]", len(out), len(out)])
+        elif ch in "}]":
+            if not stack:
+                break
+            _strip_trailing_comma(out)
+            out.append(stack.pop()[0])
+            if not stack:
+                break  # top-level value complete: anything after it is prose
+            stack[-1][1] = len(out)
+        elif ch == ",":
+            if stack:
+                stack[-1][1] = len(out)
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if stack:
+        while len(stack) > 1 and stack[-1][1] == stack[-1][2]:
+            stack.pop()  # nothing complete inside: drop the partial container itself
+        del out[stack[-1][1]:]
+        _strip_trailing_comma(out)
+        out.extend(frame[0] for frame in reversed(stack))
+    return "".join(out)
+
+def _json_span(text: str) -> str:
+    text = FENCE_RE.sub("", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):] if starts else text
+
+def _strip_trailing_comma(out: list[str]) -> None:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+# ---------------- VALIDATION ----------------
+# The subset of JSON Schema our output schemas use: type, enum, properties, required, items, anyOf, minLength
+TYPES = {"object": dict, "array": list, "string": str, "integer": int, "number": (int, float), "boolean": bool, "null": type(None)}
+
+def validate(instance: Any, schema: dict, path: str = "$") -> list[str]:
+    if "anyOf" in schema:
+        branches = [validate(instance, branch, path) for branch in schema["anyOf"]]
+        if any(not errors for errors in branches):
+            return []
+        return [f"{path}: matches no allowed shape ({min(branches, key=len)[0]})"]
+
+    errors = []
+    if (expected := schema.get("type")) and not isinstance(instance, TYPES[expected]):
+        return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} not in {schema['enum']}")
+    if isinstance(instance, str) and len(instance) < schema.get("minLength", 0):
+        errors.append(f"{path}: shorter than {schema['minLength']}")
+    if isinstance(instance, dict):
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{path}: missing {key!r}")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in instance:
+                errors.extend(validate(instance[key], subschema, f"{path}.{key}"))
+    if isinstance(instance, list) and "items" in schema:
+        for i, item in enumerate(instance):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+def filter_valid(items: list, schema: dict) -> tuple[list, list[str]]:
+    # Keeps the items that satisfy `schema`; returns the rest as error messages
+    kept, errors = [], []
+    for i, item in enumerate(items):
+        if item_errors := validate(item, schema, f"[{i}]"):
+            errors.extend(item_errors)
+        else:
+            kept.append(item)
+    return kept, errors
@@ -1,21 +1,52 @@
-import base64, ollama, torch
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+import base64, copy, hashlib
+from typing import Any
 
+from utils.json_repair import parse_json
+from utils.ratelimit import get_client, estimate_tokens
+from utils.scheduler import BatchScheduler
+from utils.tracing import tracer, traced_method
+
+
+# Heavy backends (openai, ollama, torch, transformers, sentence_transformers) are imported in the
+# constructors so that importing this module stays cheap; see utils/registry.py.
 
 # ---------------- BASE CLASSES ----------------
 class BaseLLM:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "generate" in cls.__dict__:
+            cls.generate = traced_method("llm.generate", cls.generate)
+
     def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
         raise NotImplementedError
 
+    def generate_json(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, schema: dict|None=None, **kwargs) -> Any:
+        # Backends that can constrain decoding to `schema` do so through json_kwargs(); the reply is
+        # parsed tolerantly either way, so a truncated or fenced reply still yields its complete parts.
+        response = self.generate(user_prompt, system_prompt, img_path, **self.json_kwargs(schema), **kwargs)
+        return parse_json(response)
+
+    def json_kwargs(self, schema: dict|None=None) -> dict:
+        return {}
+
 class BaseClassifier:
     def classify(self, sequences: list[str], labels: list[str], template: str|None=None) -> list[str]:
         raise NotImplementedError
 
 class BaseEmbedder:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "embed" in cls.__dict__:
+            cls.embed = traced_method("embedder.embed", cls.embed)
+        if "embed_batch" in cls.__dict__:
+            cls.embed_batch = traced_method("embedder.embed_batch", cls.embed_batch)
+
     def embed(self, text: str) -> list[float]:
         raise NotImplementedError
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        # One call per text unless the backend accepts a list
+        return [self.embed(text) for text in texts]
     
     def get_dimension(self) -> int:
         return NotImplementedError
@@ -23,29 +54,48 @@ class BaseEmbedder:
 
 # ---------------- LLM WRAPPER ----------------
 class OpenAILLM(BaseLLM):
-    def __init__(self, model: str, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, model: str, api_key: str, base_url: str|None=None):
+        # Rate limiting, retries and the cost budget live in the shared client (utils/ratelimit.py)
+        self.client = get_client(api_key, base_url)
         self.model = model
+        self.base_url = base_url
 
     def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
         messages = _build_messages(user_prompt, system_prompt, img_path)
-        response = self.client.chat.completions.create(
+        est_tokens = estimate_tokens(messages) + kwargs.get("max_tokens", 512)
+        if system_prompt and self.base_url is None:
+            # Routes calls sharing a system prompt to the same cache shard; OpenAI-only, so compatible
+            # servers behind base_url that reject unknown parameters never see it
+            kwargs.setdefault("prompt_cache_key", _prefix_key(system_prompt))
+        response = self.client.create(
+            self.client.client.chat.completions,
+            self.model,
+            est_tokens,
             messages=messages,
-            model=self.model,
             **kwargs,
         )
         return response.choices[0].message.content.strip()
 
+    def json_kwargs(self, schema: dict|None=None) -> dict:
+        return {"response_format": json_response_format(schema)}
+
 class LocalLLM(BaseLLM):
-    def __init__(self, model: str):
+    def __init__(self, model: str, prefix_cache: bool = False):
+        import torch
+        from transformers import pipeline
+        self.model = model
         self.pipe = pipeline(
             task="image-text-to-text",
             model=model,
             device="cuda" if torch.cuda.is_available() else "cpu",
             torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
         )
+        # system prompt → (token ids, KV cache) of the rendered system turn
+        self.prefix_cache: dict[str, tuple] | None = {} if prefix_cache else None
 
     def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
+        if self.prefix_cache is not None and system_prompt and not img_path:
+            return self._generate_cached(user_prompt, system_prompt, **kwargs)
         messages = _build_messages(user_prompt, system_prompt, img_path)
         response = self.pipe(
             text=messages,
@@ -54,10 +104,125 @@ class LocalLLM(BaseLLM):
         )
         return response[0]['generated_text'].strip()
 
+    def _generate_cached(self, user_prompt: str, system_prompt: str, **kwargs) -> str:
+        # Text-only path that starts decoding from a copy of the precomputed system-prompt KV state,
+        # so only the short user turn is prefilled on each call (e.g. every chunk in extract_data)
+        import torch
+        tokenizer = self.pipe.tokenizer or self.pipe.processor.tokenizer
+        input_ids = tokenizer.apply_chat_template(
+            _build_messages(user_prompt, system_prompt),
+            add_generation_prompt=True,
+            return_tensors="pt",
+        ).to(self.pipe.model.device)
+        prefix_ids, prefix_kv = self._prefix(system_prompt)
+        n_prefix = prefix_ids.shape[1]
+        if input_ids.shape[1] > n_prefix and torch.equal(input_ids[0, :n_prefix], prefix_ids[0]):
+            tracer.count("prefix_cache.hit")
+            past_key_values = copy.deepcopy(prefix_kv)
+        else:
+            tracer.count("prefix_cache.miss")  # template renders the system turn differently in context
+            past_key_values = None
+        with torch.no_grad():
+            output_ids = self.pipe.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                **kwargs,
+            )
+        tracer.current().add(prompt_tokens=input_ids.shape[1], cached_tokens=n_prefix if past_key_values is not None else 0)
+        return tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+    def _prefix(self, system_prompt: str) -> tuple:
+        if system_prompt not in self.prefix_cache:
+            import torch
+            from transformers import DynamicCache
+            tokenizer = self.pipe.tokenizer or self.pipe.processor.tokenizer
+            prefix_ids = tokenizer.apply_chat_template(
+                [{"role": "system", "content": system_prompt}],
+                return_tensors="pt",
+            ).to(self.pipe.model.device)
+            prefix_kv = DynamicCache()
+            with torch.no_grad():
+                self.pipe.model(input_ids=prefix_ids, past_key_values=prefix_kv, use_cache=True)
+            self.prefix_cache[system_prompt] = (prefix_ids, prefix_kv)
+        return self.prefix_cache[system_prompt]
+
+class BatchedLocalLLM(BaseLLM):
+    # LocalLLM behind a BatchScheduler: concurrent generate() calls are served by one batched pipeline call.
+    # task="text-generation" with a tiny causal LM (e.g. sshleifer/tiny-gpt2) runs the same path on CPU.
+    def __init__(self, model: str, task: str = "image-text-to-text", max_batch_size: int = 8, max_wait: float = 0.02):
+        import torch
+        from transformers import pipeline
+        self.model = model
+        self.task = task
+        self.max_batch_size = max_batch_size
+        self.pipe = pipeline(
+            task=task,
+            model=model,
+            device="cuda" if torch.cuda.is_available() else "cpu",
+            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        )
+        tokenizer = self.pipe.tokenizer or self.pipe.processor.tokenizer
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"  # decoder-only models continue from the right edge
+        self.chat = bool(getattr(tokenizer, "chat_template", None))
+        self.scheduler = BatchScheduler(self._run_batch, max_batch_size, max_wait)
+
+    def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
+        return self.scheduler.submit(user_prompt, system_prompt, img_path, **kwargs).result()
+
+    def _run_batch(self, requests: list[dict]) -> list[str]:
+        if self.chat:
+            inputs = [_build_messages(r["user_prompt"], r["system_prompt"], r["img_path"]) for r in requests]
+        else:
+            inputs = ["\n\n".join(filter(None, [r["system_prompt"], r["user_prompt"]])) for r in requests]
+        key = "text" if self.task == "image-text-to-text" else "text_inputs"
+        responses = self.pipe(
+            **{key: inputs},
+            batch_size=len(inputs),
+            return_full_text=False,
+            **requests[0]["kwargs"],
+        )
+        return [response[0]['generated_text'].strip() for response in responses]
+
+class OllamaLLM(BaseLLM):
+    # Client for an Ollama server, which serves concurrent requests in parallel (OLLAMA_NUM_PARALLEL)
+    # and reuses the KV cache of the longest shared prompt prefix, i.e. our fixed system prompts.
+    def __init__(self, model: str, host: str|None=None, keep_alive: str = "30m", num_ctx: int = 8192):
+        import ollama
+        self.client = ollama.Client(host=host)
+        self.model = model
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+
+    def generate(self, user_prompt: str, system_prompt: str|None=None, img_path: str|None=None, **kwargs) -> str:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": user_prompt, **({"images": [img_path]} if img_path else {})})
+        options = {"num_ctx": self.num_ctx, **kwargs.pop("options", {})}
+        if "max_tokens" in kwargs:
+            options["num_predict"] = kwargs.pop("max_tokens")
+        response = self.client.chat(
+            model=self.model,
+            messages=messages,
+            options=options,
+            keep_alive=self.keep_alive,
+            **kwargs,
+        )
+        tracer.current().add(prompt_tokens=response.get("prompt_eval_count"), completion_tokens=response.get("eval_count"))
+        return response["message"]["content"].strip()
+
+    def json_kwargs(self, schema: dict|None=None) -> dict:
+        # Ollama constrains decoding with a grammar compiled from the schema
+        return {"format": schema or "json"}
+
 
 # ---------------- CLASSIFIER WRAPPER ----------------
 class LocalClassifier(BaseClassifier):
     def __init__(self, model: str):
+        from transformers import pipeline
         self.pipe = pipeline(
             task="zero-shot-classification",
             model=model,
@@ -80,24 +245,51 @@ class LocalClassifier(BaseClassifier):
 
 # ---------------- EMBEDDER WRAPPER ----------------
 class OpenAIEmbedder(BaseEmbedder):
-    def __init__(self, model: str, model_dim: int, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    # `dimensions` truncates text-embedding-3-* vectors server-side (Matryoshka training keeps the leading
+    # dimensions meaningful; the API renormalizes). The Neo4j index takes its size from get_dimension().
+    def __init__(self, model: str, model_dim: int, api_key: str, base_url: str|None=None, dimensions: int|None=None):
+        self.client = get_client(api_key, base_url)
         self.model = model
-        self.dimension = model_dim
+        self.base_url = base_url
+        self.dimension = dimensions or model_dim
+        self.kwargs = {"dimensions": dimensions} if dimensions else {}
 
     def embed(self, text: str) -> list[float]:
-        response = self.client.embeddings.create(input=text, model=self.model)
+        response = self.client.create(
+            self.client.client.embeddings,
+            self.model,
+            estimate_tokens(text),
+            input=text,
+            **self.kwargs,
+        )
         return response.data[0].embedding
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        response = self.client.create(
+            self.client.client.embeddings,
+            self.model,
+            sum(estimate_tokens(text) for text in texts),
+            input=texts,
+            **self.kwargs,
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
     
     def get_dimension(self) -> int:
         return self.dimension
 
 class LocalEmbedder(BaseEmbedder):
     def __init__(self, model: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = model
         self.embedder = SentenceTransformer(model_name_or_path=model)
 
     def embed(self, text: str) -> list[float]:
         return self.embedder.encode(text)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return list(self.embedder.encode(texts))
     
     def get_dimension(self) -> int:
         return self.embedder.get_sentence_embedding_dimension()
@@ -110,6 +302,9 @@ def _encode_image(image_path: str) -> str:
         return f"data:image/png;base64,{img_str}"
 
 def _build_messages(user_prompt: str, system_prompt: str|None=None, img_path: str|None=None) -> list:
+    # Cache-friendly layout: longest-lived content first, so identical leading tokens are reused
+    # by OpenAI prompt caching and local prefix caches. The static system prompt comes first, then
+    # the image (shared by every query about a painting), then the per-call text.
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
@@ -117,7 +312,23 @@ def _build_messages(user_prompt: str, system_prompt: str|None=None, img_path: st
         messages.append({"role": "user", "content": user_prompt})
     else:
         messages.append({"role": "user", "content": [
+            {"type": "image_url", "image_url": {"url": _encode_image(img_path)}},
             {"type": "text", "text": user_prompt},
-            {"type": "image_url", "image_url": {"url": _encode_image(img_path)}}
         ]})
-    return messages
\ No newline at end of file
+    return messages
+
+def json_response_format(schema: dict|None=None) -> dict:
+    if not schema:
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": schema.get("title", "output"), "schema": _strict_schema(schema), "strict": True}}
+
+def _strict_schema(schema):
+    # Drops keywords strict mode rejects; they are still enforced locally by utils.json_repair.validate
+    if isinstance(schema, dict):
+        return {k: _strict_schema(v) for k, v in schema.items() if k not in ("title", "minLength")}
+    if isinstance(schema, list):
+        return [_strict_schema(v) for v in schema]
+    return schema
+
+def _prefix_key(system_prompt: str) -> str:
+    return hashlib.sha1(system_prompt.encode("utf-8")).hexdigest()[:16]
\ No newline at end of file
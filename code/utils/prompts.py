@@ -70,6 +70,60 @@ Passage:
 Produce the JSON now.
 """
 
+# Output contract of EXTRACT_SYSTEM_PROMPT, in the strict subset OpenAI structured outputs accept
+# (every property required, no additional properties); also used to validate replies from other backends.
+EXTRACT_SCHEMA = {
+    "title": "semiotic_extraction",
+    "type": "object",
+    "properties": {
+        "entities": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["Form", "Concept", "Myth"]},
+                    "name": {"type": "string", "minLength": 1},
+                    "aliases": {"type": "array", "items": {"type": "string"}},
+                    "description": {"type": "string"},
+                },
+                "required": ["type", "name", "aliases", "description"],
+                "additionalProperties": False,
+            },
+        },
+        "relations": {
+            "type": "array",
+            "items": {
+                "anyOf": [
+                    {
+                        "type": "object",
+                        "properties": {
+                            "type": {"type": "string", "enum": ["Connotes"]},
+                            "source": {"type": "string", "minLength": 1},
+                            "target": {"type": "string", "minLength": 1},
+                            "description": {"type": "string"},
+                        },
+                        "required": ["type", "source", "target", "description"],
+                        "additionalProperties": False,
+                    },
+                    {
+                        "type": "object",
+                        "properties": {
+                            "type": {"type": "string", "enum": ["Generates_Myth"]},
+                            "source_concepts": {"type": "array", "items": {"type": "string"}},
+                            "target": {"type": "string", "minLength": 1},
+                            "description": {"type": "string"},
+                        },
+                        "required": ["type", "source_concepts", "target", "description"],
+                        "additionalProperties": False,
+                    },
+                ],
+            },
+        },
+    },
+    "required": ["entities", "relations"],
+    "additionalProperties": False,
+}
+
 # ---------------- handle_query.py ----------------
 CAPTION_SYSTEM_PROMPT = """
 You are an expert visual analyst trained to identify concrete subjects, objects, and features depicted in artworks. Your task is to output a clean, retrieval-ready query consisting only of the entities visible in the image.
@@ -150,4 +204,68 @@ RETURN [
         description: coalesce(r.description, "")
     }
 ] AS rels
-"""
\ No newline at end of file
+"""
+
+# Multi-seed retrieval: seeds from several vector searches are fused client-side, then expanded once
+SEED_SEARCH_CYPHER = """
+CALL db.index.vector.queryNodes($index_name, $top_k, $query_vector)
+YIELD node, score
+RETURN elementId(node) AS id, score
+"""
+
+ALIAS_INDEX_CYPHER = """
+MATCH (n:Form)
+RETURN elementId(n) AS id, n.name AS name, n.aliases AS aliases
+"""
+
+SEED_EXPANSION_CYPHER = """
+UNWIND $seeds AS seed
+MATCH (node:Form) WHERE elementId(node) = seed.id
+WITH node, seed.score AS score
+""" + RETRIEVAL_CYPHER
+
+# Reranked retrieval: the server only enumerates paths (ids + degrees); ranking happens client-side
+# (generation/rerank.py) and properties are fetched for the kept paths alone
+CANDIDATE_PATHS_CYPHER = """
+UNWIND $seeds AS seed
+MATCH (srcNode:Form) WHERE elementId(srcNode) = seed.id
+MATCH p = (srcNode)-[*1..]->(:Myth)
+RETURN seed.id AS seed, seed.score AS score,
+       [n IN nodes(p) | elementId(n)] AS node_ids,
+       [n IN nodes(p) | COUNT { (n)--() }] AS degrees,
+       [r IN relationships(p) | elementId(r)] AS rel_ids
+"""
+
+# Capped expansion (ExpansionLimits), one round trip per hop over the whole frontier
+NEIGHBORS_CYPHER = """
+UNWIND $node_ids AS nodeId
+MATCH (n) WHERE elementId(n) = nodeId
+MATCH (n)-[r]->(m)
+WITH nodeId, n, r, m
+ORDER BY m:Myth DESC, coalesce(m.out_degree, 0) ASC
+WITH nodeId, n, collect({
+    rel_id: elementId(r),
+    node_id: elementId(m),
+    myth: m:Myth,
+    degree: coalesce(m.out_degree, 0) + coalesce(m.in_degree, 0)
+}) AS neighbors
+RETURN nodeId AS node_id, coalesce(n.out_degree, 0) + coalesce(n.in_degree, 0) AS degree,
+       neighbors[..CASE WHEN coalesce(n.supernode, false) THEN $supernode_fanout ELSE $max_neighbors END] AS neighbors
+"""
+
+PATH_DETAILS_CYPHER = """
+MATCH (n) WHERE elementId(n) IN $node_ids
+WITH collect({
+    id: elementId(n),
+    labels: labels(n),
+    name: coalesce(n.name, "(unnamed)"),
+    description: coalesce(n.description, "")
+}) AS nodes
+MATCH ()-[r]->() WHERE elementId(r) IN $rel_ids
+RETURN nodes, collect({
+    type: type(r),
+    start: elementId(startNode(r)),
+    end: elementId(endNode(r)),
+    description: coalesce(r.description, "")
+}) AS rels
+"""
@@ -0,0 +1,258 @@
+import random, threading, time
+from contextlib import contextmanager
+
+from utils.tracing import tracer
+
+
+# ---------------- PRICING & LIMITS ----------------
+# USD per 1M tokens (input, output)
+PRICES = {
+    "gpt-4o-mini":            (0.15, 0.60),
+    "gpt-4o":                 (2.50, 10.00),
+    "text-embedding-3-large": (0.13, 0.00),
+}
+# Starting (requests/min, tokens/min); refined at runtime from x-ratelimit-* response headers
+LIMITS = {
+    "gpt-4o-mini":            (500, 200_000),
+    "gpt-4o":                 (500, 30_000),
+    "text-embedding-3-large": (3_000, 1_000_000),
+}
+DEFAULT_LIMITS = (500, 30_000)
+CACHED_PRICE_RATIO = 0.5  # cached input tokens cost half on the gpt-4o family
+IMAGE_TOKENS = 765  # a 1024px image at detail=auto
+
+
+class BudgetExceeded(RuntimeError):
+    pass
+
+
+# ---------------- TOKEN BUCKET ----------------
+class TokenBucket:
+    # Continuous refill at `per_minute`; take() reserves immediately and returns how long to wait,
+    # so concurrent callers queue up behind each other instead of all polling the same refill.
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n: float) -> float:
+        with self.lock:
+            self._refill()
+            self.tokens -= n
+            return max(0.0, -self.tokens / self.rate)
+
+    def sync(self, remaining: float | None = None, per_minute: float | None = None) -> None:
+        # The server's view wins: never believe we have more headroom than it reports
+        with self.lock:
+            self._refill()
+            if per_minute and per_minute != self.capacity:
+                if self.tokens < 0:
+                    self.tokens *= per_minute / self.capacity  # keep outstanding waits the same length
+                self.capacity = float(per_minute)
+                self.rate = per_minute / 60
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+# ---------------- RATE LIMITER ----------------
+class RateLimiter:
+    # Request and token buckets plus an AIMD concurrency window: +1 slot per window of successes,
+    # halved on every 429, and shrunk when the headers say less than 10% of the quota is left.
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int = 16):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(min(4, max_concurrency))
+        self.active = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, est_tokens: int):
+        wait = max(self.requests.take(1), self.tokens.take(est_tokens))
+        if wait > 0:
+            tracer.count("ratelimit.wait_ms", int(wait * 1000))
+            time.sleep(wait)
+        with self.cond:
+            while self.active >= int(self.concurrency):
+                self.cond.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                self.cond.notify()
+
+    def on_success(self, headers, est_tokens: int, used_tokens: int | None) -> None:
+        if used_tokens is not None:
+            self.tokens.take(used_tokens - est_tokens)  # refund or charge the estimation error
+        remaining_req = _header_number(headers, "x-ratelimit-remaining-requests")
+        remaining_tok = _header_number(headers, "x-ratelimit-remaining-tokens")
+        limit_req = _header_number(headers, "x-ratelimit-limit-requests")
+        limit_tok = _header_number(headers, "x-ratelimit-limit-tokens")
+        self.requests.sync(remaining_req, limit_req)
+        self.tokens.sync(remaining_tok, limit_tok)
+
+        low = (remaining_req is not None and limit_req and remaining_req < 0.1 * limit_req) or \
+              (remaining_tok is not None and limit_tok and remaining_tok < 0.1 * limit_tok)
+        with self.cond:
+            if low:
+                self.concurrency = max(1.0, self.concurrency - 1)
+            else:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.cond.notify_all()
+
+    def on_rate_limited(self, headers, retry_after: float | None) -> None:
+        tracer.count("ratelimit.429")
+        self.requests.sync(per_minute=_header_number(headers, "x-ratelimit-limit-requests"))
+        self.tokens.sync(per_minute=_header_number(headers, "x-ratelimit-limit-tokens"))
+        with self.cond:
+            self.concurrency = max(1.0, self.concurrency / 2)
+        if retry_after:
+            self.requests.pause(retry_after)
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None, base: float = 0.5, cap: float = 30.0) -> float:
+    # Honour Retry-After when given, otherwise exponential backoff with full jitter
+    if retry_after is not None:
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+# ---------------- COST BUDGET ----------------
+class CostBudget:
+    def __init__(self, max_usd: float | None = None, max_tokens: int | None = None):
+        self.max_usd = max_usd
+        self.max_tokens = max_tokens
+        self.spent_usd = 0.0
+        self.used_tokens = 0
+        self.cached_tokens = 0
+        self.lock = threading.Lock()
+
+    def configure(self, max_usd: float | None = None, max_tokens: int | None = None) -> None:
+        self.max_usd = max_usd
+        self.max_tokens = max_tokens
+
+    def check(self) -> None:
+        # Called before every request, so a run stops at the first call past the limit
+        if self.max_usd is not None and self.spent_usd >= self.max_usd:
+            raise BudgetExceeded(f"Cost budget of ${self.max_usd:.2f} exhausted ({self.report()})")
+        if self.max_tokens is not None and self.used_tokens >= self.max_tokens:
+            raise BudgetExceeded(f"Token budget of {self.max_tokens} exhausted ({self.report()})")
+
+    def charge(self, model: str, prompt_tokens: int, completion_tokens: int = 0, factor: float = 1.0, cached_tokens: int = 0) -> float:
+        # `factor` discounts the list price, e.g. 0.5 for Batch API results; cached prompt tokens are billed at half
+        price_in, price_out = PRICES.get(model, (0.0, 0.0))
+        billed_prompt = prompt_tokens - cached_tokens * (1 - CACHED_PRICE_RATIO)
+        cost = (billed_prompt * price_in + completion_tokens * price_out) / 1e6 * factor
+        with self.lock:
+            self.spent_usd += cost
+            self.used_tokens += prompt_tokens + completion_tokens
+            self.cached_tokens += cached_tokens
+        return cost
+
+    def report(self) -> str:
+        return f"${self.spent_usd:.4f} spent, {self.used_tokens} tokens used ({self.cached_tokens} prompt tokens from cache)"
+
+
+budget = CostBudget()
+
+
+# ---------------- SHARED OPENAI CLIENT ----------------
+class OpenAIClient:
+    # One per (api_key, base_url), shared by every OpenAI wrapper so limits and budget apply across them.
+    # The SDK's own retries are off: all retrying happens here, where the limiter can see it.
+    def __init__(self, api_key: str | None, base_url: str | None = None, max_attempts: int = 6, budget: CostBudget = budget):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.limiters: dict[str, RateLimiter] = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, model: str) -> RateLimiter:
+        with self.lock:
+            if model not in self.limiters:
+                self.limiters[model] = RateLimiter(*LIMITS.get(model, DEFAULT_LIMITS))
+            return self.limiters[model]
+
+    def create(self, resource, model: str, est_tokens: int, **kwargs):
+        # `resource` is e.g. client.chat.completions or client.embeddings
+        import openai
+        limiter = self.limiter(model)
+        for attempt in range(self.max_attempts):
+            self.budget.check()
+            retry_after = None
+            with limiter.slot(est_tokens):
+                try:
+                    raw = resource.with_raw_response.create(model=model, **kwargs)
+                except openai.RateLimitError as e:
+                    if e.code == "insufficient_quota":
+                        raise
+                    retry_after = _retry_after(e.response.headers)
+                    limiter.on_rate_limited(e.response.headers, retry_after)
+                except (openai.APIConnectionError, openai.InternalServerError):
+                    tracer.count("openai.retry")
+                else:
+                    response = raw.parse()
+                    usage = response.usage
+                    limiter.on_success(raw.headers, est_tokens, usage.total_tokens if usage else None)
+                    if usage:
+                        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+                        details = getattr(usage, "prompt_tokens_details", None)
+                        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+                        self.budget.charge(model, usage.prompt_tokens, completion_tokens, cached_tokens=cached_tokens)
+                        tracer.current().add(prompt_tokens=usage.prompt_tokens, completion_tokens=completion_tokens or None, cached_tokens=cached_tokens or None)
+                    return response
+            if attempt == self.max_attempts - 1:
+                break
+            time.sleep(backoff_delay(attempt, retry_after))
+        raise RuntimeError(f"OpenAI request for {model} failed after {self.max_attempts} attempts")
+
+
+_clients: dict[tuple, OpenAIClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: str | None, base_url: str | None = None) -> OpenAIClient:
+    with _clients_lock:
+        if (api_key, base_url) not in _clients:
+            _clients[(api_key, base_url)] = OpenAIClient(api_key, base_url)
+        return _clients[(api_key, base_url)]
+
+
+# ---------------- UTILS ----------------
+def estimate_tokens(messages: list | str) -> int:
+    # ~4 bytes of UTF-8 per token (≈ 1 token per Hangul syllable); images at a flat rate
+    if isinstance(messages, str):
+        return len(messages.encode("utf-8")) // 4 + 1
+    total = 0
+    for message in messages:
+        content = message["content"]
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            total += IMAGE_TOKENS if part["type"] == "image_url" else estimate_tokens(part["text"])
+        total += 4  # role and message framing
+    return total
+
+def _header_number(headers, name: str) -> float | None:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+def _retry_after(headers) -> float | None:
+    if (ms := _header_number(headers, "retry-after-ms")) is not None:
+        return ms / 1000
+    return _header_number(headers, "retry-after")
@@ -0,0 +1,92 @@
+import os
+from typing import Any, Callable
+
+from utils.llm import OpenAILLM, LocalLLM, BatchedLocalLLM, OllamaLLM, LocalClassifier, OpenAIEmbedder, LocalEmbedder
+
+
+# ---------------- MODEL FACTORIES ----------------
+# Nothing here imports a backend or loads weights until the factory is called.
+MODELS: dict[str, Callable[[], Any]] = {
+    # --- Generation ---
+    "gpt-4o-mini":      lambda: OpenAILLM(model="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL")),
+    "gpt-4o":           lambda: OpenAILLM(model="gpt-4o", api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL")),
+    # prefix_cache stays off until benchmark/prefix_cache.py shows identical greedy outputs for the model
+    "qwen2.5-vl":       lambda: LocalLLM(model="Qwen/Qwen2.5-VL-7B-Instruct"),
+    "qwen3-vl":         lambda: LocalLLM(model="Qwen/Qwen3-VL-8B-Instruct"),
+    "qwen2.5-vl-batched": lambda: BatchedLocalLLM(model="Qwen/Qwen2.5-VL-7B-Instruct"),
+    "qwen2.5-vl-ollama":  lambda: OllamaLLM(model="qwen2.5vl:7b", host=os.getenv("OLLAMA_HOST")),
+    # --- Captioning ---
+    "florence-2-base":  lambda: LocalLLM(model="microsoft/Florence-2-base"),
+    "florence-2-large": lambda: LocalLLM(model="microsoft/Florence-2-large"),
+    # --- Embedding ---
+    "text-embedding-3-large": lambda: OpenAIEmbedder(
+        model="text-embedding-3-large",
+        model_dim=3072,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+    ),
+    "text-embedding-3-large-1024": lambda: OpenAIEmbedder(
+        model="text-embedding-3-large",
+        model_dim=3072,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        dimensions=1024,
+    ),
+    "text-embedding-3-large-256": lambda: OpenAIEmbedder(
+        model="text-embedding-3-large",
+        model_dim=3072,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        dimensions=256,
+    ),
+    # --- Classification ---
+    "mdeberta-xnli":    lambda: LocalClassifier(model="MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7"),
+    "xlm-roberta-xnli": lambda: LocalClassifier(model="joeddav/xlm-roberta-large-xnli"),
+}
+
+GEN_MODELS = ["gpt-4o-mini", "gpt-4o", "qwen2.5-vl", "qwen3-vl", "qwen2.5-vl-batched", "qwen2.5-vl-ollama"]
+EMBED_MODELS = ["text-embedding-3-large", "text-embedding-3-large-1024", "text-embedding-3-large-256"]
+
+
+# ---------------- REGISTRY ----------------
+class ModelRegistry:
+    def __init__(self, factories: dict[str, Callable[[], Any]] = MODELS):
+        self.factories = dict(factories)
+        self.instances: dict[str, Any] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self.factories[name] = factory
+        self.instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        # Instantiates on first use; later calls share the same instance
+        if name not in self.instances:
+            if name not in self.factories:
+                raise KeyError(f"Unknown model: {name}")
+            self.instances[name] = self.factories[name]()
+        return self.instances[name]
+
+    def lazy(self, name: str) -> "LazyModel":
+        if name not in self.factories:
+            raise KeyError(f"Unknown model: {name}")
+        return LazyModel(self, name)
+
+    def loaded(self) -> list[str]:
+        return list(self.instances)
+
+
+class LazyModel:
+    # Stand-in that can be passed wherever a model is expected; loads on first attribute access
+    def __init__(self, registry: ModelRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._name in self._registry.instances else "not loaded"
+        return f"LazyModel({self._name!r}, {state})"
+
+
+registry = ModelRegistry()
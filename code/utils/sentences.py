@@ -0,0 +1,95 @@
+import dbm, hashlib, json, re
+
+from utils.tracing import tracer
+
+
+# ---------------- KOREAN-AWARE SPLITTER ----------------
+SPLITTER_VERSION = "ko-2"  # bump when the rules change so cached splits are invalidated
+
+# Candidate boundary: terminal punctuation, optional closing quotes/brackets, then whitespace
+BOUNDARY_RE = re.compile(r"[.?!…。]+[\"'”’」』)\]]*\s+")
+# Tokens whose trailing period is not a sentence end: initials, abbreviations
+NO_SPLIT_RE = re.compile(r"(?:^|\s|\()(?:[A-Za-z]|e\.g|i\.e|etc|vs|cf|no|vol|pp?|st|mr|mrs|dr|ca)\.$", re.IGNORECASE)
+# A number does end a sentence ("made in 1900. It shows…", "제작 연도는 1795. 작가는…") unless it is part
+# of a dotted run ("1920. 3. 1.") or the next token continues it (a digit or a lowercase word)
+NUMBER_END_RE = re.compile(r"(?:^|\s|\()\d{1,4}\.$")
+DOTTED_RUN_RE = re.compile(r"(?:^|\s|\()\d{1,4}\.\s+\d{1,4}\.$")
+CONTINUES_RE = re.compile(r"[0-9a-z]")
+JUNK_RE = re.compile(r"^[\W_]*$")
+
+def split_sentences(text: str | None) -> list[str]:
+    sents = []
+    for para in (text or "").split("\n"):
+        start = 0
+        for match in BOUNDARY_RE.finditer(para):
+            head = para[start : match.start() + 1]
+            if NO_SPLIT_RE.search(head[-8:]):
+                continue
+            if NUMBER_END_RE.search(head[-6:]) and (DOTTED_RUN_RE.search(head[-13:]) or CONTINUES_RE.match(para, match.end())):
+                continue
+            sents.append(para[start : match.end()])
+            start = match.end()
+        sents.append(para[start:])
+    return [sent.strip() for sent in sents if not JUNK_RE.match(sent.strip())]
+
+def split_batch(texts: list[str | None], cache: "SentenceCache | None" = None) -> list[list[str]]:
+    if cache is None:
+        return [split_sentences(text) for text in texts]
+    results = []
+    for text in texts:
+        if (sents := cache.get(text)) is None:
+            sents = split_sentences(text)
+            cache.put(text, sents)
+        results.append(sents)
+    return results
+
+def chunk_sentences(sents: list[str], chunk_size: int) -> list[str]:
+    # Packs whole sentences into chunks of at most `chunk_size` characters;
+    # a single oversized sentence is hard-split rather than dropped.
+    chunks, current = [], ""
+    for sent in sents:
+        if current and len(current) + 1 + len(sent) > chunk_size:
+            chunks.append(current)
+            current = ""
+        if len(sent) > chunk_size:
+            chunks.extend(sent[i : i + chunk_size] for i in range(0, len(sent), chunk_size))
+            continue
+        current = f"{current} {sent}" if current else sent
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------- PERSISTENT CACHE ----------------
+class SentenceCache:
+    # Disk-backed (dbm) map from desc hash to its segmentation, so memory does not grow with the corpus
+    def __init__(self, path: str):
+        self.db = dbm.open(path, "c")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str | None) -> list[str] | None:
+        key = self._key(text)
+        if key in self.db:
+            self.hits += 1
+            tracer.count("sentence_cache.hit")
+            return json.loads(self.db[key])
+        self.misses += 1
+        tracer.count("sentence_cache.miss")
+        return None
+
+    def put(self, text: str | None, sents: list[str]) -> None:
+        self.db[self._key(text)] = json.dumps(sents, ensure_ascii=False)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def _key(text: str | None) -> str:
+        return hashlib.sha1(f"{SPLITTER_VERSION}\0{text or ''}".encode("utf-8")).hexdigest()
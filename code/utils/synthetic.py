@@ -0,0 +1,48 @@
+import random
+
+from utils.utils import load_json_file
+
+
+# ---------------- SYNTHETIC GRAPH ----------------
+def make_graph_data(base_path: str, scale: int = 1, cross_links: float = 0.2, hubs: int = 0, hub_fanout: float = 0.1, seed: int = 0) -> dict:
+    # Replicates the reference extraction `scale` times (copy c renames "Tiger" → "Tiger C<c>")
+    # and adds random cross-copy Connotes edges so copies do not form disjoint islands.
+    # `hubs` generic Concepts (like "Power") each generate `hub_fanout` of all Myths and are connoted
+    # by the same share of Forms: the supernodes that make unbounded expansion fan out.
+    base = load_json_file(base_path) or {"entities": [], "relations": []}
+    rng = random.Random(seed)
+
+    def rename(name: str, copy: int) -> str:
+        return name if copy == 0 else f"{name} C{copy}"
+
+    entities, relations = [], []
+    for copy in range(scale):
+        for entity in base["entities"]:
+            entities.append({**entity, "name": rename(entity["name"], copy)})
+        for rel in base["relations"]:
+            new_rel = {**rel, "target": rename(rel["target"], copy)}
+            if "source" in rel:
+                new_rel["source"] = rename(rel["source"], copy)
+            if "source_concepts" in rel:
+                new_rel["source_concepts"] = sorted(rename(name, copy) for name in rel["source_concepts"])
+            relations.append(new_rel)
+
+    forms = [e["name"] for e in entities if e["type"] == "Form"]
+    concepts = [e["name"] for e in entities if e["type"] == "Concept"]
+    if scale > 1 and forms and concepts:
+        for _ in range(int(len(relations) * cross_links)):
+            relations.append({
+                "type": "Connotes",
+                "source": rng.choice(forms),
+                "target": rng.choice(concepts),
+                "description": "Synthetic cross-copy connotation.",
+            })
+    myths = [e["name"] for e in entities if e["type"] == "Myth"]
+    for h in range(hubs if myths and forms else 0):
+        hub = f"Generic Concept {h}"
+        entities.append({"type": "Concept", "name": hub, "aliases": [], "description": "Synthetic generic concept."})
+        for myth in rng.sample(myths, max(1, int(len(myths) * hub_fanout))):
+            relations.append({"type": "Generates_Myth", "source_concepts": [hub], "target": myth, "description": "Synthetic hub myth."})
+        for form in rng.sample(forms, max(1, int(len(forms) * hub_fanout))):
+            relations.append({"type": "Connotes", "source": form, "target": hub, "description": "Synthetic hub connotation."})
+    return {"entities": entities, "relations": relations}
@@ -0,0 +1,155 @@
+import contextvars, functools, json, os, threading, time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+# ---------------- SPANS ----------------
+class Span:
+    __slots__ = ("name", "start", "end", "attrs", "parent", "thread")
+
+    def __init__(self, name: str, parent: "Span | None", attrs: dict):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attrs = attrs
+        self.parent = parent
+        self.thread = threading.get_ident()
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, **counts) -> None:
+        # Accumulates numeric attributes, e.g. span.add(prompt_tokens=120, bytes=2048)
+        for key, value in counts.items():
+            if value is not None:
+                self.attrs[key] = self.attrs.get(key, 0) + value
+
+
+class _NullSpan:
+    # Returned when tracing is off so call sites never need to check
+    def set(self, **attrs) -> None: pass
+    def add(self, **counts) -> None: pass
+
+
+_NULL_SPAN = _NullSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+# ---------------- TRACER ----------------
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.spans: list[Span] = []
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, _current.get(), attrs)
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            _current.reset(token)
+            with self.lock:
+                self.spans.append(span)
+
+    def current(self) -> Span | _NullSpan:
+        return _current.get() or _NULL_SPAN
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    # --- Export ---
+    def export(self, path: str) -> None:
+        # .jsonl → one span per line; anything else → Chrome trace (chrome://tracing, Perfetto)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as dst_file:
+            if path.endswith(".jsonl"):
+                for span in self.spans:
+                    dst_file.write(json.dumps({
+                        "name":     span.name,
+                        "start":    span.start - self.origin,
+                        "duration": span.duration,
+                        "parent":   span.parent.name if span.parent else None,
+                        "thread":   span.thread,
+                        **span.attrs,
+                    }, ensure_ascii=False, default=str) + "\n")
+                for name, value in self.counters.items():
+                    dst_file.write(json.dumps({"counter": name, "value": value}) + "\n")
+            else:
+                events = [{
+                    "name": span.name,
+                    "cat":  span.name.split(".")[0],
+                    "ph":   "X",
+                    "ts":   (span.start - self.origin) * 1e6,
+                    "dur":  span.duration * 1e6,
+                    "pid":  os.getpid(),
+                    "tid":  span.thread,
+                    "args": span.attrs,
+                } for span in self.spans]
+                json.dump({"traceEvents": events, "otherData": dict(self.counters)}, dst_file, ensure_ascii=False, default=str)
+
+    def summary(self) -> str:
+        by_name = defaultdict(list)
+        for span in self.spans:
+            by_name[span.name].append(span)
+        lines = [f"{'stage':28s} {'calls':>6s} {'total s':>9s} {'mean ms':>9s} {'p95 ms':>9s}  totals"]
+        for name, spans in sorted(by_name.items(), key=lambda item: -sum(s.duration for s in item[1])):
+            durations = sorted(s.duration for s in spans)
+            totals = Counter()
+            for span in spans:
+                totals.update({k: v for k, v in span.attrs.items() if isinstance(v, (int, float)) and not isinstance(v, bool)})
+            lines.append(
+                f"{name:28s} {len(spans):6d} {sum(durations):9.2f} {sum(durations) / len(durations) * 1000:9.1f} "
+                f"{durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000:9.1f}  "
+                + ", ".join(f"{k}={v:g}" for k, v in sorted(totals.items()))
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:28s} {value:6d}")
+        return "\n".join(lines)
+
+
+tracer = Tracer()
+
+def traced(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def traced_method(name: str, func):
+    # Like traced(), but tags the span with the instance's model name
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with tracer.span(name, model=getattr(self, "model", type(self).__name__)):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+def finish_trace(path: str | None) -> None:
+    # Called at the end of a run by the entry points
+    if not tracer.enabled:
+        return
+    print(f"📊 Trace summary\n{tracer.summary()}")
+    if path:
+        tracer.export(path)
+        print(f"📊 Trace written to {path}")
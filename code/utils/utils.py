@@ -1,4 +1,5 @@
 import json, os
+from typing import Iterator
 
 def load_json_file(file_path: str) -> dict | None:
     if not os.path.exists(file_path):
@@ -7,4 +8,148 @@ def load_json_file(file_path: str) -> dict | None:
         with open(file_path, "r", encoding="utf-8") as file:
             return json.load(file)
     except json.JSONDecodeError:
-        return None
\ No newline at end of file
+        return None
+
+def save_json(data, file_path: str) -> None:
+    # Write-then-rename, so an interrupted run never leaves a truncated file behind
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as tmp_file:
+        json.dump(data, tmp_file, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, file_path)
+
+def iter_json_items(file_path: str, chunk_size: int = 1 << 20) -> Iterator[tuple[str, dict]]:
+    # Yields (key, item) pairs one at a time from a JSONL file, a top-level JSON object
+    # keyed by index, or a top-level JSON array, without loading the whole file.
+    with open(file_path, "r", encoding="utf-8") as file:
+        if file_path.endswith(".jsonl"):
+            for line_no, line in enumerate(file, 1):
+                if not (line := line.strip()):
+                    continue
+                item = json.loads(line)
+                yield str(item.pop("id", line_no)), item
+            return
+
+        stream = _JsonStream(file, chunk_size)
+        opener = stream.peek()
+        stream.pos += 1
+        if opener == "{":
+            while (char := stream.peek(" \t\r\n,")) and char != "}":
+                key = stream.decode()
+                stream.peek(" \t\r\n:")
+                yield key, stream.decode()
+        elif opener == "[":
+            idx = 1
+            while (char := stream.peek(" \t\r\n,")) and char != "]":
+                yield str(idx), stream.decode()
+                idx += 1
+        else:
+            raise ValueError(f"Unsupported top-level JSON in {file_path}")
+
+
+class _JsonStream:
+    # Minimal incremental reader: keeps at most one chunk plus the current value in memory.
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        if not (chunk := self.file.read(self.chunk_size)):
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self, skip: str = " \t\r\n") -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in skip:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def decode(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer edge may be truncated (e.g. numbers)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+# ---------------- COLUMNAR STORAGE ----------------
+def load_table_file(file_path: str, columns: list[str] | None = None, filters: list | None = None, memory_map: bool = True):
+    # Loads a Parquet (.parquet) or Arrow IPC (.arrow/.feather) artefact as a pyarrow.Table.
+    # `filters` uses the pyarrow DNF form, e.g. [("era", "=", "조선"), ("label_meaning", "=", True)].
+    if not os.path.exists(file_path):
+        return None
+    pa, pq = _import_pyarrow()
+    if file_path.endswith(".parquet"):
+        return pq.read_table(file_path, columns=columns, filters=filters, memory_map=memory_map)
+
+    source = pa.memory_map(file_path, "r") if memory_map else pa.OSFile(file_path, "r")
+    table = pa.ipc.open_file(source).read_all()  # zero-copy when memory-mapped
+    if filters:
+        table = table.filter(pq.filters_to_expression(filters))
+    if columns:
+        table = table.select(columns)
+    return table
+
+def convert_json_to_table(src_path: str, dst_path: str) -> list[str]:
+    # Converts fetched_*.json, dataset_*.json or extracted.json into columnar files.
+    # extracted.json is split into "<stem>.entities<ext>" and "<stem>.relations<ext>".
+    if (data := load_json_file(src_path)) is None:
+        raise ValueError(f"File {src_path} is not valid JSON.")
+    pa, _ = _import_pyarrow()
+
+    if isinstance(data, dict) and "entities" in data:
+        stem, ext = os.path.splitext(dst_path)
+        tables = {
+            f"{stem}.entities{ext}":  pa.Table.from_pylist(data["entities"]),
+            f"{stem}.relations{ext}": pa.Table.from_pylist(data["relations"]),
+        }
+    else:
+        items = data.items() if isinstance(data, dict) else enumerate(data, 1)
+        tables = {dst_path: pa.Table.from_pylist([_item_to_row(str(key), item) for key, item in items])}
+
+    for path, table in tables.items():
+        write_table_file(table, path)
+    return list(tables)
+
+def write_table_file(table, dst_path: str) -> None:
+    pa, pq = _import_pyarrow()
+    if dst_path.endswith(".parquet"):
+        pq.write_table(table, dst_path, compression="zstd")
+    else:
+        # Uncompressed IPC so that reads can be memory-mapped without decoding
+        with pa.OSFile(dst_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def _item_to_row(key: str, item: dict) -> dict:
+    row = {"key": key, **item}
+    sents = item.get("sentences") or []
+    if sents and isinstance(sents[0], dict):
+        # Flag columns for the top label of any sentence, so label filters become predicates
+        top_labels = {sent["labels"][0] for sent in sents if sent.get("labels")}
+        for label in ["meaning", "composition", "technique", "context", "metadata"]:
+            row[f"label_{label}"] = label in top_labels
+    return row
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa, pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Columnar storage requires pyarrow (pip install pyarrow).") from e
+    return pa, pq
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+# ---------------- VECTOR STORE ----------------
+# Local cosine search over Form embeddings with an optional quantized first pass:
+#   "float"    normalized float32 matrix, exact
+#   "int8"     per-vector symmetric int8 codes + one float32 scale each (4x smaller)
+#   "binary"   sign bits packed 8 per byte, ranked by Hamming distance (32x smaller)
+# Quantized searches take the best `rescore * top_k` candidates and rescore them exactly against the
+# float vectors, which are only read for those rows, so they can stay on disk (np.load(mmap_mode="r"),
+# e.g. a snapshot's embeddings.npy). rescore=0 returns the approximate ranking as is.
+# `dimensions` keeps only the leading dimensions (Matryoshka truncation) before normalizing.
+QUANTIZATIONS = ("float", "int8", "binary")
+BUILD_BLOCK = 8192     # rows quantized at a time
+SCAN_BYTES = 1 << 20   # int8 rows are upcast to float32 in cache-sized blocks (~1 MiB) for the matmul
+
+class VectorStore:
+    def __init__(self, vectors: np.ndarray, quantization: str = "float", rescore: int = 4, dimensions: int | None = None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.rescore = rescore
+        self.dimensions = dimensions or (vectors.shape[1] if len(vectors) else 0)
+        self.full = vectors
+        self.scales = None
+        if quantization == "float" or not len(vectors):
+            self.codes = _normalize(np.asarray(vectors[:, :self.dimensions], dtype=np.float32)) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+            return
+        self.codes = np.empty((len(vectors), self.dimensions if quantization == "int8" else (self.dimensions + 7) // 8), dtype=np.int8 if quantization == "int8" else np.uint8)
+        scales = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), BUILD_BLOCK):
+            block = _normalize(np.asarray(vectors[start : start + BUILD_BLOCK, :self.dimensions], dtype=np.float32))
+            if quantization == "int8":
+                scales[start : start + len(block)] = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127
+                self.codes[start : start + len(block)] = np.round(block / scales[start : start + len(block), None]).astype(np.int8)
+            else:
+                self.codes[start : start + len(block)] = np.packbits(block > 0, axis=1)
+        self.scales = scales if quantization == "int8" else None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def nbytes(self) -> int:
+        # Resident index size; the float vectors used for rescoring are not counted
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def search(self, query_vector, top_k: int = 5) -> list[tuple[int, float]]:
+        # (row, cosine similarity) best first; approximate scores are only returned with rescore=0
+        if not len(self.codes):
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)[:self.dimensions])
+        approx = self._approx_scores(query)
+        if self.quantization != "float" and self.rescore:
+            rows = np.sort(_top(approx, min(len(approx), self.rescore * top_k)))  # ascending rows read a memmap sequentially
+            exact = _normalize(np.asarray(self.full[rows, :self.dimensions], dtype=np.float32)) @ query
+            order = np.argsort(-exact, kind="stable")[:top_k]
+            return [(int(rows[i]), float(exact[i])) for i in order]
+        top = _top(approx, min(len(approx), top_k))
+        if self.quantization == "binary":
+            # approx = d - 2 * Hamming distance h; cos(pi * h / d) is the sign-projection estimate of the cosine
+            return [(int(row), float(np.cos(np.pi * (self.dimensions - approx[row]) / (2 * self.dimensions)))) for row in top]
+        return [(int(row), float(approx[row])) for row in top]
+
+    def _approx_scores(self, query: np.ndarray) -> np.ndarray:
+        if self.quantization == "float":
+            return self.codes @ query
+        if self.quantization == "int8":
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            block = max(64, SCAN_BYTES // (4 * self.dimensions))
+            for start in range(0, len(self.codes), block):
+                scores[start : start + block] = self.codes[start : start + block] @ query
+            return scores * self.scales
+        # binary: d - 2 * Hamming distance, i.e. matching minus differing bits (higher is closer)
+        hamming = _popcount(self.codes ^ np.packbits(query > 0)).sum(axis=1, dtype=np.int32)
+        return self.dimensions - 2 * hamming
+
+
+# ---------------- UTILS ----------------
+# Bits set per uint8 code: np.bitwise_count (NumPy >= 2.0), else a 256-entry lookup table
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_popcount = getattr(np, "bitwise_count", None) or _POPCOUNT.__getitem__
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    return mat / np.maximum(np.linalg.norm(mat, axis=-1, keepdims=True), 1e-12)
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k highest scores, best first
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+        return part[np.argsort(-scores[part], kind="stable")]
+    return np.argsort(-scores, kind="stable")